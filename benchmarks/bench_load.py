@@ -0,0 +1,322 @@
+""" End-to-end load benchmark of login, transfer and page view flows
+
+Runs the whole Flask app (routes, sessions, templates, mail queue) in process
+against in-memory storage (or a local mongod with --uri) and a stub SMTP
+server which records the 2 phase authorization codes. Every virtual user has
+its own cookie jar, logs in and then makes a random mix of page views,
+transfers and new logins.
+
+Latency percentiles of every route and requests per second are printed and
+saved as JSON, --baseline compares the run with a previous result file.
+
+usage: python -m benchmarks.bench_load [--users 16] [--requests 200] [--output results.json] [--baseline previous.json]
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email import message_from_string
+from threading import Condition, Thread
+import argparse
+import json
+import platform
+import random
+import re
+import socketserver
+import time
+from werkzeug.security import generate_password_hash
+from web import create_app
+from web.mail import mail_queue
+from web.repository import get_repository
+
+PASSWORD = "bench-password"
+
+# STUB SMTP SERVER
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host : str = "127.0.0.1", port : int = 0):
+        """plain SMTP server which accepts every message and keeps the last login code of every recipient
+
+        Args:
+            host (str, optional): listen address. Defaults to "127.0.0.1".
+            port (int, optional): listen port (0 -> any free port). Defaults to 0.
+        """
+        super().__init__((host, port), StubSMTPHandler)
+        self.codes = dict()
+        self.messages = 0
+        self._received = Condition()
+
+    def deliver(self, recipients : list, data : str) -> None:
+        body = message_from_string(data).get_payload()
+        match = re.search(r"code: (\d+)", body)
+        with self._received:
+            self.messages += 1
+            if match is not None:
+                for recipient in recipients:
+                    self.codes[recipient] = match.group(1)
+            self._received.notify_all()
+
+    def wait_code(self, email : str, timeout : float = 10) -> str:
+        """wait for login code sent to the e-mail (the code is consumed)
+
+        Args:
+            email (str): recipient
+            timeout (float, optional): seconds to wait. Defaults to 10.
+
+        Returns:
+            str: code or None if it did not come in time
+        """
+        with self._received:
+            self._received.wait_for(lambda: email in self.codes, timeout)
+            return self.codes.pop(email, None)
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line : str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.reply("220 stub ESMTP")
+        recipients = list()
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stub")
+            elif command.startswith("MAIL FROM"):
+                recipients = list()
+                self.reply("250 OK")
+            elif command.startswith("RCPT TO"):
+                recipients.append(line.decode().split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = list()
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line.decode(errors="replace"))
+                self.server.deliver(recipients, "".join(data))
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+# STATISTICS
+
+def percentile(values : list, p : float) -> float:
+    """nearest-rank percentile
+
+    Args:
+        values (list[float]): sorted values
+        p (float): percentile (0 - 100)
+
+    Returns:
+        float: value (0.0 for empty list)
+    """
+    if not values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+def summarize(samples : dict, elapsed : float) -> dict:
+    """latency statistics of every route and whole run
+
+    Args:
+        samples (dict): route -> list of (seconds, ok)
+        elapsed (float): wall time of the run in seconds
+
+    Returns:
+        dict: route -> count, errors, rps, mean/p50/p95/p99 in milliseconds
+    """
+    result = dict()
+    everything = [sample for route_samples in samples.values() for sample in route_samples]
+    for route, route_samples in list(samples.items()) + [("all", everything)]:
+        latencies = sorted(seconds * 1000 for seconds, _ in route_samples)
+        result[route] = {
+            "count": len(latencies),
+            "errors": sum(1 for _, ok in route_samples if not ok),
+            "rps": round(len(latencies) / elapsed, 1),
+            "mean-ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50-ms": round(percentile(latencies, 50), 3),
+            "p95-ms": round(percentile(latencies, 95), 3),
+            "p99-ms": round(percentile(latencies, 99), 3)
+        }
+    return result
+
+# VIRTUAL USERS
+
+class VirtualUser():
+    def __init__(self, app, smtp : StubSMTPServer, email : str, bids : list, seed : int):
+        """one client with its own cookie jar
+
+        Args:
+            app (Flask): application
+            smtp (StubSMTPServer): stub server with login codes
+            email (str): e-mail of the account
+            bids (list[str]): bank account ids used as transfer targets
+            seed (int): random seed
+        """
+        self.client = app.test_client()
+        self.smtp = smtp
+        self.email = email
+        self.bids = bids
+        self.random = random.Random(seed)
+        self.samples = dict()
+
+    def timed(self, route : str, call, expect : str = None) -> bool:
+        start = time.perf_counter()
+        response = call()
+        # routes redirect also on errors -> check the target
+        ok = response.status_code < 400 and (expect is None or response.headers.get("Location", "").endswith(expect))
+        self.samples.setdefault(route, list()).append((time.perf_counter() - start, ok))
+        return ok
+
+    def login(self) -> bool:
+        form = {"email_input": self.email, "password_input": PASSWORD}
+        if not self.timed("login_send_code", lambda: self.client.post("/login_send_code", data=form)):
+            return False
+        code = self.smtp.wait_code(self.email)
+        form = {"email_input": self.email, "code_input": code}
+        return self.timed("login_login", lambda: self.client.post("/login_login", data=form), "/index")
+
+    def transfer(self) -> bool:
+        form = {
+            "tobid_input": self.random.choice(self.bids),
+            "curr_input": self.random.choice(["CZK", "CZK", "EUR"]),
+            "amount_input": f"{self.random.uniform(0.5, 5):.2f}",
+            "trans_input": "1"
+        }
+        return self.timed("send_transaction", lambda: self.client.post("/send_transaction", data=form), "/index")
+
+    def view(self) -> bool:
+        return self.timed("index", lambda: self.client.get("/index"))
+
+    def run(self, requests : int, mix : dict) -> dict:
+        actions = {"login": self.login, "transfer": self.transfer, "view": self.view}
+        names, weights = list(mix), list(mix.values())
+        self.login()
+        for _ in range(requests):
+            actions[self.random.choices(names, weights)[0]]()
+        return self.samples
+
+# RUN
+
+def build_app(uri : str, smtp : StubSMTPServer, hash_method : str, mail_workers : int):
+    config = {
+        # errors are counted as 500 responses
+        "TESTING": False,
+        "RATES_SCHEDULER": False,
+        "SESSION_BACKEND": "memory",
+        # all virtual users share one client ip
+        "THROTTLE": False,
+        "MAIL_HOST": smtp.server_address[0],
+        "MAIL_PORT": smtp.server_address[1],
+        "MAIL_SSL": False,
+        "MAIL_WORKERS": mail_workers,
+        "PASSWORD_HASH_METHOD": hash_method
+    }
+    if uri is None:
+        config["STORAGE_BACKEND"] = "memory"
+    else:
+        config.update({"MONGO_URI": uri, "MONGO_DATABASE": "bench_load", "DB_TRANSACTIONS": False})
+    return create_app(config)
+
+def seed(users : int, hash_method : str) -> list:
+    repository = get_repository()
+    if hasattr(repository, "db"):
+        for name in ("account", "balance", "history", "exchange"):
+            repository.db.drop_collection(name)
+        repository.ensure_indexes()
+    # one hash for every account, hashing is measured by bench_login
+    password_hash = generate_password_hash(PASSWORD, hash_method)
+    accounts = list()
+    for i in range(users):
+        account = {"bid": f"{i + 1:04d}", "firstname": "bench", "surname": f"user{i}", "email": f"user{i}@bench.com", "password": password_hash}
+        balance = {"bid": account["bid"], "currency-balance": {"CZK": 1000000.0, "EUR": 100.0}, "version": 0}
+        if hasattr(repository, "db"):
+            repository.db.account.insert_one(account)
+            repository.db.balance.insert_one(balance)
+        else:
+            repository.insert_account(account)
+            repository.insert_balance(balance)
+        accounts.append(account)
+    repository.set_rates({"date": datetime(2023, 4, 3), "currency-rates": {"EUR": 23.5, "USD": 21.7, "GBP": 26.8}})
+    return accounts
+
+def run(uri : str, users : int, requests : int, mix : dict, hash_method : str, mail_workers : int) -> dict:
+    smtp = StubSMTPServer()
+    Thread(target=smtp.serve_forever, name="stub-smtp", daemon=True).start()
+    app = build_app(uri, smtp, hash_method, mail_workers)
+    accounts = seed(users, hash_method)
+    bids = [account["bid"] for account in accounts]
+
+    virtual_users = [VirtualUser(app, smtp, account["email"], bids, i) for i, account in enumerate(accounts)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(users) as pool:
+        results = list(pool.map(lambda user: user.run(requests, mix), virtual_users))
+    elapsed = time.perf_counter() - start
+
+    samples = dict()
+    for user_samples in results:
+        for route, route_samples in user_samples.items():
+            samples.setdefault(route, list()).extend(route_samples)
+    mail_queue.stop(5)
+    smtp.shutdown()
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "storage": "memory" if uri is None else "mongo",
+        "users": users,
+        "requests-per-user": requests,
+        "mix": mix,
+        "hash-method": hash_method,
+        "seconds": round(elapsed, 3),
+        "mails": smtp.messages,
+        "routes": summarize(samples, elapsed)
+    }
+
+def print_result(result : dict, baseline : dict = None) -> None:
+    print(f"{result['storage']} storage, {result['users']} users, {result['seconds']} s, {result['mails']} mails")
+    print(f"{'route':<18} {'count':>7} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in result["routes"].items():
+        line = f"{route:<18} {stats['count']:>7} {stats['errors']:>7} {stats['rps']:>9} {stats['p50-ms']:>9} {stats['p95-ms']:>9} {stats['p99-ms']:>9}"
+        previous = (baseline or {}).get("routes", {}).get(route, None)
+        if previous and previous["p95-ms"]:
+            line += f"   p95 {100 * (stats['p95-ms'] / previous['p95-ms'] - 1):+.1f} %, rps {100 * (stats['rps'] / previous['rps'] - 1):+.1f} %"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=None, help="local mongod (in-memory storage if not set)")
+    parser.add_argument("--users", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--requests", type=int, default=200, help="requests of every user after the first login")
+    parser.add_argument("--login", type=float, default=1, help="weight of new logins in the mix")
+    parser.add_argument("--transfer", type=float, default=4, help="weight of transfers in the mix")
+    parser.add_argument("--view", type=float, default=10, help="weight of page views in the mix")
+    parser.add_argument("--hash-method", default="scrypt:32768:8:1", help="werkzeug password hash method")
+    parser.add_argument("--mail-workers", type=int, default=2)
+    parser.add_argument("--output", default=None, help="save result as json")
+    parser.add_argument("--baseline", default=None, help="json result of previous run to compare with")
+    args = parser.parse_args()
+
+    mix = {"login": args.login, "transfer": args.transfer, "view": args.view}
+    result = run(args.uri, args.users, args.requests, mix, args.hash_method, args.mail_workers)
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+    print_result(result, baseline)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+    if any(stats["errors"] for stats in result["routes"].values()):
+        raise SystemExit("FAILED: some requests failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+""" Logins per second per core for password hash methods
+
+Compares the previous login flow (password verified in login_send_code and
+again in login_login) with the challenge flow (verified once). Runs on one
+thread, so the numbers are per core.
+
+usage: python -m benchmarks.bench_login [--seconds 3] [--method scrypt:32768:8:1 ...]
+"""
+
+import argparse
+import time
+from web.objects import BankAccount
+
+def logins_per_second(password_hash : str, checks_per_login : int, seconds : float) -> float:
+    account = BankAccount("bench", "bench", password_hash, "bench@bench.com", "0001")
+    logins = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for _ in range(checks_per_login):
+            account.check_password("bench-password")
+        logins += 1
+    return logins / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--method", action="append", help="werkzeug hash method (repeatable)")
+    args = parser.parse_args()
+    methods = args.method or ["scrypt:32768:8:1", "scrypt:16384:8:1", "pbkdf2:sha256:600000", "pbkdf2:sha256:260000"]
+
+    print(f"{'method':<24} {'2 checks/login':>16} {'1 check/login':>16}")
+    for method in methods:
+        password_hash = BankAccount.hash_password("bench-password", method)
+        before = logins_per_second(password_hash, 2, args.seconds)
+        after = logins_per_second(password_hash, 1, args.seconds)
+        print(f"{method:<24} {before:16.1f} {after:16.1f}")
+
+if __name__ == "__main__":
+    main()
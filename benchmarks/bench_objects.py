@@ -0,0 +1,71 @@
+""" Micro-benchmarks of TransactionList and CurrencyBalance formatting
+
+Compares the previous list-of-dicts implementation with the row iterator
+for 10k and 100k entries.
+
+usage: python -m benchmarks.bench_objects
+"""
+
+from datetime import datetime, timedelta
+from itertools import islice
+import math
+import timeit
+from web.objects import TransactionList, CurrencyBalance, format_date
+
+def old_transaction_output(transaction_list : list) -> list:
+    # implementation before TransactionRow
+    mod_transaction_list = list()
+    for obj in transaction_list:
+        mod_transaction_list.append(
+            {
+            "target-bid": obj["target-bid"],
+            "currency-code": obj["currency-code"],
+            "amount": obj["amount"],
+            "date": datetime.strftime(obj["date"].replace(tzinfo=None), "%d.%m.%Y %H:%M:%S")
+            }
+        )
+    mod_transaction_list.reverse()
+    return mod_transaction_list
+
+def old_balance_output(currency_balance : dict) -> dict:
+    # implementation before cached output
+    mod_currency_balance = dict()
+    for key, value in currency_balance.items():
+        mod_currency_balance[key] = f"{math.floor(value * 100) / 100:.2f}"
+    return mod_currency_balance
+
+def entries(n : int, stored_display : bool) -> list:
+    start = datetime(2023, 1, 1)
+    result = list()
+    for i in range(n):
+        date = start + timedelta(seconds=i)
+        obj = {"target-bid": "0002", "currency-code": "CZK", "amount": f"-{i}.00", "date": date}
+        if stored_display:
+            obj["date-display"] = format_date(date)
+        result.append(obj)
+    return result
+
+def bench(label : str, func, number : int) -> None:
+    seconds = min(timeit.repeat(func, number=number, repeat=3)) / number
+    print(f"{label:<48} {seconds * 1000:10.3f} ms")
+
+def main():
+    for n in (10_000, 100_000):
+        number = 10 if n == 10_000 else 2
+        raw = entries(n, False)
+        stored = entries(n, True)
+        print(f"--- {n} entries")
+        bench("old to_output (dicts, strftime, reverse)", lambda: old_transaction_output(raw), number)
+        bench("to_output (strftime)", lambda: TransactionList(raw).to_output(), number)
+        bench("to_output (display stored at write)", lambda: TransactionList(stored).to_output(), number)
+        bench("iterate rows (display stored at write)", lambda: [row.date_display for row in TransactionList(stored)], number)
+        bench("first page of 20 rows", lambda: [row.to_dict() for row in islice(TransactionList(raw), 20)], number)
+
+    balance = {f"C{i:02}": i * 1.2345 for i in range(30)}
+    cb = CurrencyBalance(balance)
+    print("--- 30 currencies, 1000 renders")
+    bench("old CurrencyBalance.to_output", lambda: [old_balance_output(balance) for _ in range(1000)], 10)
+    bench("cached CurrencyBalance.to_output", lambda: [cb.to_output() for _ in range(1000)], 10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+""" Concurrency benchmark of make_transaction debit path
+
+Many threads send money from one account at the same time. The account must
+never be overdrawn and the number of successful transfers must match the
+starting balance exactly.
+
+usage: python -m benchmarks.bench_transfer --uri mongodb://localhost:27017 [--no-transactions]
+       python -m benchmarks.bench_transfer --memory
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+from web.repository import MongoRepository, MemoryRepository
+from web.transfers import transfer
+
+def run(uri : str, threads : int, attempts : int, balance : float, use_transaction : bool) -> dict:
+    if uri is None:
+        repository = MemoryRepository()
+        repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": balance}})
+    else:
+        repository = MongoRepository(uri, "bench_transfer", maxPoolSize=threads)
+        repository.db.balance.drop()
+        repository.db.history.drop()
+        repository.db.balance.insert_one({"bid": "0001", "currency-balance": {"CZK": balance}})
+
+    def send(_):
+        return transfer("0001", "0002", "CZK", 1.0, use_transaction=use_transaction, repository=repository)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(send, range(attempts)))
+    elapsed = time.perf_counter() - start
+
+    final = repository.find_balance("0001")["currency-balance"]["CZK"]
+    succeeded = sum(results)
+    logged = len(repository.history_page("0001", limit=attempts + 1))
+    repository.close()
+    return {
+        "threads": threads,
+        "attempts": attempts,
+        "succeeded": succeeded,
+        "logged": logged,
+        "final-balance": final,
+        "seconds": round(elapsed, 3),
+        "transfers-per-second": round(attempts / elapsed, 1),
+        "overdraft": final < 0,
+        "consistent": succeeded == logged == min(attempts, int(balance)) and final == balance - succeeded
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--balance", type=float, default=1000)
+    parser.add_argument("--memory", action="store_true", help="in-memory storage instead of mongo")
+    parser.add_argument("--no-transactions", action="store_true", help="standalone mongod without replica set")
+    args = parser.parse_args()
+
+    result = run(None if args.memory else args.uri, args.threads, args.attempts, args.balance, not args.no_transactions)
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+    if result["overdraft"] or not result["consistent"]:
+        raise SystemExit("FAILED: balance and log do not match successful transfers")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+""" Gunicorn settings (read automatically by `gunicorn main:app`)
+
+WORKER_MODE=sync (default) - one request per worker process
+WORKER_MODE=gevent - cooperative worker, mongo, CNB download and SMTP sockets do not block the process,
+                     so one worker serves up to WORKER_CONNECTIONS requests at once (needs gevent)
+"""
+
+import os
+
+worker_mode = os.environ.get("WORKER_MODE", "sync")
+
+if worker_mode == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("WORKER_CONNECTIONS", "1000"))
+    # app must be imported after the worker patched the standard library (scheduler and mail threads)
+    preload_app = False
+elif worker_mode != "sync":
+    raise ValueError(f"Unknown WORKER_MODE ({worker_mode}).")
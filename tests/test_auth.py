@@ -0,0 +1,45 @@
+import pytest
+from flask import Flask, session
+from web.auth import start_challenge, verify_challenge
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def app():
+    app = Flask(__name__)
+    app.config.update({
+        "SECRET_KEY": "test",
+        "CHALLENGE_TTL": 300,
+        "CHALLENGE_ATTEMPTS": 2
+    })
+    return app
+
+# TESTS ------------------------------------------------------
+
+def test_verify_challenge_valid(app):
+    """test valid code - challenge can be used only once"""
+    with app.test_request_context():
+        start_challenge("test@test.com", "1234")
+        assert verify_challenge("test@test.com", "1234")
+        assert not verify_challenge("test@test.com", "1234")
+
+def test_verify_challenge_attempts_invalid(app):
+    """test challenge is removed after too many wrong codes"""
+    with app.test_request_context():
+        start_challenge("test@test.com", "1234")
+        assert not verify_challenge("test@test.com", "0000")
+        assert not verify_challenge("test@test.com", "0000")
+        assert "challenge" not in session
+        assert not verify_challenge("test@test.com", "1234")
+
+def test_verify_challenge_expired_invalid(app):
+    """test expired challenge is rejected"""
+    app.config["CHALLENGE_TTL"] = -1
+    with app.test_request_context():
+        start_challenge("test@test.com", "1234")
+        assert not verify_challenge("test@test.com", "1234")
+
+def test_verify_challenge_without_challenge_invalid(app):
+    """test code without previous password verification is rejected"""
+    with app.test_request_context():
+        assert not verify_challenge("test@test.com", "1234")
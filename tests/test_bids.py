@@ -0,0 +1,72 @@
+import pytest
+import mongomock
+from concurrent.futures import ThreadPoolExecutor
+from web.bids import BidAllocator, bid_allocator, format_bid
+from web.objects import BankAccount
+from web.repository import MongoRepository, MemoryRepository
+
+# FIXTURES ---------------------------------------------------
+
+class CountingRepository(MemoryRepository):
+    def __init__(self):
+        super().__init__()
+        self.reservations = 0
+
+    def reserve_ids(self, name : str, count : int) -> int:
+        self.reservations += 1
+        return super().reserve_ids(name, count)
+
+@pytest.fixture()
+def repository():
+    repository = CountingRepository()
+    repository.insert_account({"bid": "0005", "email": "a@a.com"})
+    repository.insert_account({"bid": "TEST", "email": "b@b.com"})
+    return repository
+
+# TESTS ------------------------------------------------------
+
+def test_format_bid_valid():
+    """test ids have at least 4 digits and are widened after 9999"""
+    assert format_bid(7) == "0007"
+    assert format_bid(12345) == "12345"
+
+def test_allocate_blocks_valid(repository):
+    """test ids continue after existing accounts and one counter update serves whole block"""
+    allocator = BidAllocator(block_size=3, repository=repository)
+    assert [allocator.allocate() for _ in range(4)] == ["0006", "0007", "0008", "0009"]
+    assert repository.reservations == 2
+
+def test_allocate_reserved_and_wide_valid(repository):
+    """test reserved id 9999 is skipped and ids continue with 5 digits"""
+    repository.raise_counter("bid", 9997)
+    allocator = BidAllocator(block_size=2, repository=repository)
+    assert [allocator.allocate() for _ in range(3)] == ["9998", "10000", "10001"]
+
+def test_allocate_workers_unique_valid(repository):
+    """test allocators of more workers sharing one counter never return the same id"""
+    allocators = [BidAllocator(block_size=7, repository=repository) for _ in range(4)]
+    with ThreadPoolExecutor(8) as pool:
+        bids = list(pool.map(lambda i: allocators[i % 4].allocate(), range(400)))
+    assert len(set(bids)) == 400
+
+def test_allocate_after_reset_valid(repository):
+    """test forked process (reset) does not continue in block of its parent"""
+    allocator = BidAllocator(block_size=10, repository=repository)
+    first = allocator.allocate()
+    allocator.reset()
+    assert int(allocator.allocate()) >= int(first) + 10
+
+def test_mongo_reserve_ids_valid():
+    """test atomic counter in mongo - blocks follow each other"""
+    repository = MongoRepository(client=mongomock.MongoClient())
+    repository.raise_counter("bid", 10)
+    assert repository.reserve_ids("bid", 5) == 11
+    assert repository.reserve_ids("bid", 5) == 16
+
+def test_bank_account_new_bid_valid(repository, monkeypatch):
+    """test account without bid gets new id from allocator"""
+    monkeypatch.setattr(bid_allocator, "repository", repository)
+    bid_allocator.reset()
+    account = BankAccount("test", "test", "hash", "c@c.com")
+    assert account.bid == "0006"
+    bid_allocator.reset()
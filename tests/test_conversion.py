@@ -0,0 +1,37 @@
+import pytest
+import numpy as np
+from web.conversion import ConversionEngine
+from datetime import datetime
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def engine():
+    return ConversionEngine({"date": datetime(2023, 4, 3), "currency-rates": {"EUR": 25.0, "USD": 20.0, "JPY": 0.16}})
+
+# TESTS ------------------------------------------------------
+
+def test_convert_to_main_currency_valid(engine : ConversionEngine):
+    """test conversion into main currency"""
+    assert engine.convert(2, "EUR") == pytest.approx(50.0)
+
+def test_convert_cross_rate_valid(engine : ConversionEngine):
+    """test conversion between two foreign currencies"""
+    assert engine.convert(10, "USD", "EUR") == pytest.approx(8.0)
+    assert engine.convert(1, "EUR", "JPY") == pytest.approx(156.25)
+
+def test_convert_unknown_invalid(engine : ConversionEngine):
+    """test conversion of unknown currency - raises KeyError"""
+    with pytest.raises(KeyError) as e_info:
+        engine.convert(1, "XYZ")
+
+def test_value_balance_valid(engine : ConversionEngine):
+    """test value of multi-currency balance, unknown currency is ignored"""
+    assert engine.value({"CZK": 100.0, "EUR": 2.0, "XYZ": 5.0}) == pytest.approx(150.0)
+    assert engine.value({"CZK": 100.0, "EUR": 2.0}, "EUR") == pytest.approx(6.0)
+
+def test_value_many_valid(engine : ConversionEngine):
+    """test value of many balances in one call"""
+    values = engine.value_many([{"CZK": 1.0}, {"USD": 1.0, "EUR": 1.0}, {}])
+    assert isinstance(values, np.ndarray)
+    assert values.tolist() == pytest.approx([1.0, 45.0, 0.0])
@@ -0,0 +1,87 @@
+import pytest
+import runpy
+import sys
+import threading
+import time
+from web.cooperative import is_cooperative, run_blocking
+from pathlib import Path
+
+# FIXTURES ---------------------------------------------------
+
+class FakeMonkey():
+    def __init__(self, patched : set):
+        self.patched = patched
+
+    def is_module_patched(self, name : str) -> bool:
+        return name in self.patched
+
+GUNICORN_CONF = str(Path(__file__).parent.parent / "gunicorn.conf.py")
+
+# TESTS ------------------------------------------------------
+
+def test_is_cooperative_valid(monkeypatch):
+    """test gevent worker is detected by patched socket module"""
+    monkeypatch.delitem(sys.modules, "gevent.monkey", raising=False)
+    assert not is_cooperative()
+    monkeypatch.setitem(sys.modules, "gevent.monkey", FakeMonkey({"thread"}))
+    assert not is_cooperative()
+    monkeypatch.setitem(sys.modules, "gevent.monkey", FakeMonkey({"socket", "thread"}))
+    assert is_cooperative()
+
+def test_run_blocking_sync_valid(monkeypatch):
+    """test sync worker calls the function directly"""
+    monkeypatch.delitem(sys.modules, "gevent.monkey", raising=False)
+    assert run_blocking(lambda a, b=0: a + b, 1, b=2) == 3
+
+def test_run_blocking_raises_invalid(monkeypatch):
+    """test exception of the function is raised in the caller"""
+    monkeypatch.delitem(sys.modules, "gevent.monkey", raising=False)
+    with pytest.raises(ValueError):
+        run_blocking(int, "x")
+
+def test_run_blocking_gevent_hub_valid(monkeypatch):
+    """test gevent worker runs the function in native thread pool of the hub, other greenlets continue meanwhile"""
+    gevent = pytest.importorskip("gevent")
+    import gevent.monkey
+    # process is not patched - only detection of the worker is faked
+    monkeypatch.setattr(gevent.monkey, "is_module_patched", lambda name: name == "socket")
+    ticks = []
+    def tick():
+        for _ in range(3):
+            ticks.append(True)
+            gevent.sleep(0.01)
+    def blocking():
+        time.sleep(0.2)
+        return threading.get_ident(), len(ticks)
+    gevent.spawn(tick)
+    thread_id, ticks_meanwhile = gevent.spawn(run_blocking, blocking).get(timeout=5)
+    assert thread_id != threading.get_ident()
+    assert ticks_meanwhile == 3
+
+def test_gunicorn_conf_sync_valid(monkeypatch):
+    """test default worker mode - gunicorn sync worker settings are kept"""
+    monkeypatch.delenv("WORKER_MODE", raising=False)
+    settings = runpy.run_path(GUNICORN_CONF)
+    assert settings["worker_mode"] == "sync"
+    assert "worker_class" not in settings
+    assert "worker_connections" not in settings
+    monkeypatch.setenv("WORKER_MODE", "sync")
+    assert "worker_class" not in runpy.run_path(GUNICORN_CONF)
+
+def test_gunicorn_conf_gevent_valid(monkeypatch):
+    """test gevent worker mode - worker class, connections and no preloading"""
+    monkeypatch.setenv("WORKER_MODE", "gevent")
+    monkeypatch.delenv("WORKER_CONNECTIONS", raising=False)
+    settings = runpy.run_path(GUNICORN_CONF)
+    assert settings["worker_class"] == "gevent"
+    assert settings["worker_connections"] == 1000
+    assert settings["preload_app"] is False
+    monkeypatch.setenv("WORKER_CONNECTIONS", "50")
+    assert runpy.run_path(GUNICORN_CONF)["worker_connections"] == 50
+
+def test_gunicorn_conf_worker_mode_invalid(monkeypatch):
+    """test unknown worker mode is rejected"""
+    monkeypatch.setenv("WORKER_MODE", "threads")
+    with pytest.raises(ValueError):
+        runpy.run_path(GUNICORN_CONF)
+
@@ -0,0 +1,65 @@
+import pytest
+import json
+import mongomock
+from web.export import parse_range, export_rows, csv_stream, json_stream, ndjson_stream
+from web.history import add_entry
+from web.repository import MongoRepository, MemoryRepository
+from datetime import datetime, timedelta
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture(params=["mongo", "memory"])
+def repository(request):
+    if request.param == "mongo":
+        repository = MongoRepository(client=mongomock.MongoClient())
+    else:
+        repository = MemoryRepository()
+    start = datetime(2023, 4, 1, 12, 0, 0)
+    for day in range(10):
+        currency = "EUR" if day % 2 else "CZK"
+        add_entry("0001", "0002", currency, f"-{day}.00", start + timedelta(days=day), repository=repository)
+    add_entry("0002", "0001", "CZK", "+1.00", start, repository=repository)
+    return repository
+
+ROWS = [
+    {"target-bid": "0002", "currency-code": "CZK", "amount": "-1.00", "date": "01.04.2023 12:00:00"},
+    {"target-bid": "0003", "currency-code": "EUR", "amount": "+2.00", "date": "02.04.2023 12:00:00"}
+]
+
+# TESTS ------------------------------------------------------
+
+def test_parse_range_valid():
+    """test both days of the range are included"""
+    assert parse_range("2023-04-01", "2023-04-02") == (datetime(2023, 4, 1), datetime(2023, 4, 3))
+    assert parse_range(None, "") == (None, None)
+
+def test_parse_range_invalid():
+    """test invalid date - raises ValueError"""
+    with pytest.raises(ValueError):
+        parse_range("01.04.2023", None)
+
+def test_export_rows_filters_valid(repository):
+    """test date range and currency filters, newest first"""
+    rows = list(export_rows("0001", datetime(2023, 4, 3), datetime(2023, 4, 8), "EUR", repository))
+    assert [row["amount"] for row in rows] == ["-5.00", "-3.00"]
+    assert rows[0]["date"] == "06.04.2023 12:00:00"
+
+def test_iter_history_batches_valid(repository):
+    """test reading history in small batches returns every entry once"""
+    entries = list(repository.iter_history("0001", batch_size=3))
+    assert [e["amount"] for e in entries] == [f"-{day}.00" for day in reversed(range(10))]
+
+def test_csv_stream_valid():
+    """test csv with header, empty export has only header"""
+    assert "".join(csv_stream(iter(ROWS))).splitlines() == [
+        "date,target-bid,currency-code,amount",
+        "01.04.2023 12:00:00,0002,CZK,-1.00",
+        "02.04.2023 12:00:00,0003,EUR,+2.00"
+    ]
+    assert "".join(csv_stream(iter([]))).strip() == "date,target-bid,currency-code,amount"
+
+def test_json_streams_valid():
+    """test json array and newline delimited json"""
+    assert json.loads("".join(json_stream(iter(ROWS)))) == ROWS
+    assert json.loads("".join(json_stream(iter([])))) == []
+    assert [json.loads(line) for line in "".join(ndjson_stream(iter(ROWS))).splitlines()] == ROWS
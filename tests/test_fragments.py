@@ -0,0 +1,44 @@
+import pytest
+from flask import Flask
+from jinja2 import DictLoader
+from web.fragments import FragmentCache
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def app():
+    app = Flask(__name__)
+    app.jinja_loader = DictLoader({"fragment.html": "{{ renders.append(name) or '' }}<b>{{ name }}</b>"})
+    # names of rendered fragments
+    app.jinja_env.globals["renders"] = list()
+    return app
+
+# TESTS ------------------------------------------------------
+
+def test_render_cached_valid(app):
+    """test fragment of the same key is rendered once"""
+    cache = FragmentCache()
+    with app.app_context():
+        html = [cache.render("fragment.html", ("a", 1), name="<a>") for _ in range(2)]
+        other = cache.render("fragment.html", ("a", 2), name="b")
+    assert html == ["<b>&lt;a&gt;</b>"] * 2
+    assert other == "<b>b</b>"
+    assert app.jinja_env.globals["renders"] == ["<a>", "b"]
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 2}
+
+def test_render_without_key_valid(app):
+    """test fragment without key is rendered every time and not stored"""
+    cache = FragmentCache()
+    with app.app_context():
+        for _ in range(2):
+            cache.render("fragment.html", None, name="a")
+    assert app.jinja_env.globals["renders"] == ["a", "a"]
+    assert cache.stats()["size"] == 0
+
+def test_render_maxsize_valid(app):
+    """test the least recently used fragment is dropped"""
+    cache = FragmentCache(2)
+    with app.app_context():
+        for key in ("a", "b", "a", "c", "a", "b"):
+            cache.render("fragment.html", (key,), name=key)
+    assert app.jinja_env.globals["renders"] == ["a", "b", "c", "b"]
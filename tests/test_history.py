@@ -0,0 +1,75 @@
+import pytest
+import mongomock
+from web.history import add_entry, load_page, load_newer, entries_version, decode_cursor, migrate_transactions
+from web.repository import MongoRepository, MemoryRepository
+from datetime import datetime, timedelta
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def db():
+    return mongomock.MongoClient().db
+
+@pytest.fixture(params=["mongo", "memory"])
+def history(request):
+    if request.param == "mongo":
+        repository = MongoRepository(client=mongomock.MongoClient())
+    else:
+        repository = MemoryRepository()
+    start = datetime(2023, 4, 1, 12, 0, 0)
+    for i in range(5):
+        add_entry("0001", "0002", "CZK", f"-{i}.00", start + timedelta(minutes=i), repository=repository, version=i + 1)
+    add_entry("0002", "0001", "CZK", "-9.00", start, repository=repository)
+    return repository
+
+# TESTS ------------------------------------------------------
+
+def test_load_page_newest_first_valid(history):
+    """test first page contains newest entries of the account"""
+    entries, cursor = load_page("0001", limit=2, repository=history)
+    assert [e["amount"] for e in entries] == ["-4.00", "-3.00"]
+    assert cursor is not None
+
+def test_load_page_cursor_valid(history):
+    """test walking through all pages with cursor"""
+    amounts = list()
+    cursor = None
+    while True:
+        entries, cursor = load_page("0001", cursor, limit=2, repository=history)
+        amounts += [e["amount"] for e in entries]
+        if cursor is None:
+            break
+    assert amounts == ["-4.00", "-3.00", "-2.00", "-1.00", "-0.00"]
+
+def test_load_newer_valid(history):
+    """test loading only entries newer than high-water mark"""
+    newer = load_newer("0001", 3, repository=history)
+    assert [e["amount"] for e in newer] == ["-4.00", "-3.00"]
+    assert load_newer("0001", 5, repository=history) == []
+
+def test_load_newer_older_date_valid(history):
+    """test entry committed later with older date (other worker, clock skew) is found by its version"""
+    add_entry("0001", "0002", "CZK", "-7.00", datetime(2023, 4, 1, 11, 0, 0), repository=history, version=6)
+    assert [e["amount"] for e in load_newer("0001", 5, repository=history)] == ["-7.00"]
+    assert entries_version(load_newer("0001", 0, repository=history)) == 6
+
+def test_decode_cursor_invalid():
+    """test invalid cursor - raises ValueError"""
+    with pytest.raises(ValueError) as e_info:
+        decode_cursor("not-a-cursor")
+
+def test_migrate_transactions_valid(db):
+    """test migration of transaction arrays - can be run twice without duplicates"""
+    db.transaction.insert_one({"bid": "0001", "transaction-list": [
+        {"target-bid": "0002", "currency-code": "EUR", "amount": "-1.00", "date": datetime(2023, 4, 1)},
+        {"target-bid": "0001", "currency-code": "CZK", "amount": "+5.00", "date": datetime(2023, 4, 2)}
+    ]})
+    assert migrate_transactions(db.transaction, db.history, batch=1) == 2
+    # unfinished run - array was not emptied
+    db.transaction.update_one({"bid": "0001"}, {"$set": {"transaction-list": [
+        {"target-bid": "0002", "currency-code": "EUR", "amount": "-1.00", "date": datetime(2023, 4, 1)},
+        {"target-bid": "0001", "currency-code": "CZK", "amount": "+5.00", "date": datetime(2023, 4, 2)}
+    ]}})
+    migrate_transactions(db.transaction, db.history)
+    assert db.history.count_documents({"bid": "0001"}) == 2
+    assert db.transaction.find_one({"bid": "0001"})["transaction-list"] == []
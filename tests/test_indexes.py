@@ -0,0 +1,71 @@
+import mongomock
+from web.indexes import INDEXES, QUERY_SHAPES, ensure_indexes, plan_stages, audit_queries
+
+# FIXTURES ---------------------------------------------------
+
+class FakeCursor():
+    def __init__(self, plan):
+        self.plan = plan
+
+    def limit(self, n):
+        return self
+
+    def sort(self, keys):
+        return self
+
+    def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+class FakeCollection():
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query):
+        return FakeCursor(self.plan)
+
+class FakeDatabase():
+    def __init__(self, plans):
+        self.plans = plans
+
+    def __getitem__(self, name):
+        return FakeCollection(self.plans.get(name, {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}))
+
+# TESTS ------------------------------------------------------
+
+def test_plan_stages_valid():
+    """test collecting stages of nested query plan"""
+    plan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}
+    assert plan_stages(plan) == ["LIMIT", "FETCH", "IXSCAN"]
+
+def test_plan_stages_or_valid():
+    """test collecting stages of query plan with more input stages"""
+    plan = {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]}
+    assert "COLLSCAN" in plan_stages(plan)
+
+def test_query_shapes_indexed_valid():
+    """test every query shape filters on prefix of declared index"""
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        if "_id" in query:
+            continue
+        prefixes = [keys[0][0] for keys, options in INDEXES.get(collection, [])]
+        assert any(field in prefixes for field in query), name
+
+def test_query_shapes_history_sorted_valid():
+    """test sorted history shapes use index with bid and sort keys (no in-memory sort)"""
+    declared = [keys for keys, options in INDEXES["history"]]
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        if collection == "history" and sort is not None:
+            assert [("bid", 1)] + sort in declared, name
+
+def test_audit_queries_collscan_invalid():
+    """test audit reports collection scan"""
+    result = audit_queries(FakeDatabase({"balance": {"stage": "COLLSCAN"}}))
+    assert result["balance by bid"] == ["COLLSCAN"]
+    assert "COLLSCAN" not in result["account by email"]
+
+def test_ensure_indexes_valid():
+    """test declared indexes are created"""
+    db = mongomock.MongoClient().db
+    assert ensure_indexes(db) == []
+    index_keys = [index["key"] for index in db.account.list_indexes()]
+    assert {"email": 1} in index_keys
@@ -0,0 +1,104 @@
+import pytest
+import smtplib
+from web.mail import MailQueue, SMTPTransport
+
+# FIXTURES ---------------------------------------------------
+
+class FakeTransport():
+    def __init__(self, fail : bool = False):
+        self.fail = fail
+        self.messages = list()
+        self.closed = 0
+
+    def send(self, sender, recipient, message):
+        if self.fail:
+            raise smtplib.SMTPException("rejected")
+        self.messages.append((sender, recipient, message))
+
+    def close(self):
+        self.closed += 1
+
+class FakeSMTP():
+    instances = list()
+
+    def __init__(self, host, port, timeout=None):
+        self.logins = 0
+        self.sent = list()
+        self.disconnect_next = False
+        FakeSMTP.instances.append(self)
+
+    def login(self, username, password):
+        self.logins += 1
+
+    def sendmail(self, sender, recipient, message):
+        if self.disconnect_next:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        self.sent.append(recipient)
+
+    def quit(self):
+        pass
+
+@pytest.fixture()
+def fake_smtp(monkeypatch):
+    FakeSMTP.instances = list()
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    return FakeSMTP
+
+# TESTS ------------------------------------------------------
+
+def test_mail_queue_send_valid():
+    """test queued messages are sent by worker thread"""
+    transport = FakeTransport()
+    queue = MailQueue(lambda: transport, workers=1)
+    assert queue.send("from@mail.com", "to@mail.com", "code 1234")
+    queue.join()
+    queue.stop(5)
+    assert transport.messages == [("from@mail.com", "to@mail.com", "code 1234")]
+    assert queue.stats()["sent"] == 1
+
+def test_mail_queue_smtp_span_valid():
+    """test SMTP time of every message is recorded, failed sends are counted as span errors"""
+    from web.metrics import span_duration, span_errors
+    before, errors = span_duration.count("smtp_send"), span_errors.value("smtp_send")
+    for transport in (FakeTransport(), FakeTransport(fail=True)):
+        queue = MailQueue(lambda: transport, workers=1)
+        queue.send("from@mail.com", "to@mail.com", "code 1234")
+        queue.join()
+        queue.stop(5)
+    assert span_duration.count("smtp_send") == before + 2
+    assert span_errors.value("smtp_send") == errors + 1
+
+def test_mail_queue_full_invalid():
+    """test message is dropped when the queue is full"""
+    queue = MailQueue(FakeTransport, workers=0, maxsize=1)
+    assert queue.send("from@mail.com", "to@mail.com", "first")
+    assert not queue.send("from@mail.com", "to@mail.com", "second")
+    assert queue.stats()["dropped"] == 1
+
+def test_mail_queue_failed_send_invalid():
+    """test failing transport - message is counted as failed and connection closed"""
+    transport = FakeTransport(fail=True)
+    queue = MailQueue(lambda: transport, workers=1)
+    queue.send("from@mail.com", "to@mail.com", "code 1234")
+    queue.join()
+    queue.stop(5)
+    assert queue.stats()["failed"] == 1
+    assert transport.closed >= 1
+
+def test_smtp_transport_reuses_connection_valid(fake_smtp):
+    """test transport logs in once for more messages"""
+    transport = SMTPTransport("localhost", 8025, "user", "pass", use_ssl=False)
+    transport.send("from@mail.com", "a@mail.com", "1")
+    transport.send("from@mail.com", "b@mail.com", "2")
+    assert len(fake_smtp.instances) == 1
+    assert fake_smtp.instances[0].logins == 1
+    assert fake_smtp.instances[0].sent == ["a@mail.com", "b@mail.com"]
+
+def test_smtp_transport_reconnect_valid(fake_smtp):
+    """test transport reconnects when the server dropped the connection"""
+    transport = SMTPTransport("localhost", 8025, use_ssl=False)
+    transport.send("from@mail.com", "a@mail.com", "1")
+    fake_smtp.instances[0].disconnect_next = True
+    transport.send("from@mail.com", "b@mail.com", "2")
+    assert len(fake_smtp.instances) == 2
+    assert fake_smtp.instances[1].sent == ["b@mail.com"]
@@ -0,0 +1,78 @@
+import pytest
+from types import SimpleNamespace
+from web import create_app
+from web.metrics import Counter, Histogram, CommandTimer, timed, mongo_duration, mongo_errors, span_duration, span_errors
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def client():
+    app = create_app({"TESTING": True, "STORAGE_BACKEND": "memory"})
+    with app.test_client() as client:
+        return client
+
+def command_event(name : str, request_id : int, **kwargs):
+    return SimpleNamespace(command_name=name, connection_id=("localhost", 27017), request_id=request_id, **kwargs)
+
+# TESTS ------------------------------------------------------
+
+def test_histogram_render_valid():
+    """test cumulative buckets, sum and count in Prometheus format"""
+    histogram = Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{route="/a"} 5.55' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+def test_counter_render_valid():
+    """test counter without and with labels"""
+    counter = Counter("test_total", "Test.", ("kind",))
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    assert 'test_total{kind="a"} 3' in counter.render()
+
+def test_timed_error_valid():
+    """test span of failing call - duration and error are recorded"""
+    @timed("test-span")
+    def fail():
+        raise OSError()
+
+    before = span_duration.count("test-span")
+    with pytest.raises(OSError):
+        fail()
+    assert span_duration.count("test-span") == before + 1
+    assert span_errors.value("test-span") == 1
+
+def test_command_timer_valid():
+    """test pymongo command events - duration per command and collection"""
+    listener = CommandTimer()
+    before = mongo_duration.count("find", "test_collection")
+    listener.started(command_event("find", 1, command={"find": "test_collection"}))
+    listener.succeeded(command_event("find", 1, duration_micros=1500))
+    listener.started(command_event("insert", 2, command={"insert": "test_collection"}))
+    listener.failed(command_event("insert", 2, duration_micros=100))
+    assert mongo_duration.count("find", "test_collection") == before + 1
+    assert mongo_errors.value("insert", "test_collection") == 1
+
+def test_metrics_route_valid(client):
+    """test /metrics contains duration of previous requests"""
+    client.get("/login")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="/login",method="GET",status="200"}' in text
+    assert "mail_queued" in text
+    assert "# TYPE mail_sent_total counter" in text
+    assert "# TYPE mail_queued gauge" in text
+
+def test_metrics_route_token_invalid():
+    """test /metrics with token configured - request without token is rejected"""
+    app = create_app({"TESTING": True, "STORAGE_BACKEND": "memory", "METRICS_TOKEN": "secret"})
+    with app.test_client() as client:
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer secret"}).status_code == 200
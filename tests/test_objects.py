@@ -1,5 +1,5 @@
 import pytest
-from web.objects import BankAccount, CurrencyBalance, TransactionList
+from web.objects import BankAccount, CurrencyBalance, TransactionList, TransactionRow
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timezone
 
@@ -69,6 +69,22 @@ def test_check_password_invalid(account : BankAccount):
     """test invalid password checking"""
     assert not account.check_password("wrong_password")
 
+def test_needs_rehash_valid(account : BankAccount):
+    """test password hashed with other method should be rehashed"""
+    account.password = BankAccount.hash_password("test", "pbkdf2:sha256:1000")
+    assert account.needs_rehash("scrypt:32768:8:1")
+    assert not account.needs_rehash("pbkdf2:sha256:1000")
+    assert account.check_password("test")
+
+def test_needs_rehash_short_method_valid(account : BankAccount):
+    """test short method names are compared with their default parameters"""
+    account.password = BankAccount.hash_password("test", "scrypt")
+    assert not account.needs_rehash("scrypt")
+    assert not account.needs_rehash("scrypt:32768:8:1")
+    account.password = BankAccount.hash_password("test", "pbkdf2:sha256")
+    assert not account.needs_rehash("pbkdf2:sha256")
+    assert account.needs_rehash("pbkdf2:sha256:1000")
+
 def test_email_invalid_setter(account : BankAccount):
     """test setting account e-mail to empty string - raises ValueError"""
     with pytest.raises(ValueError) as e_info:
@@ -112,4 +128,40 @@ def test_transaction_list_to_output_valid(tl : TransactionList):
             "date": "27.12.2023 23:55:59"
         }
     ]
-    assert valid_list == tl.to_output()
\ No newline at end of file
+    assert valid_list == tl.to_output()
+
+def test_transaction_list_iter_newest_first_valid(tl : TransactionList):
+    """test iteration yields rows newest first and keeps source list unchanged"""
+    rows = list(tl)
+    assert [row.currency_code for row in rows] == ["EUR", "CZK"]
+    assert tl.transaction_list[0]["currency-code"] == "CZK"
+    assert len(tl) == 2
+
+def test_transaction_row_getitem_valid(tl : TransactionList):
+    """test row can be read with output keys"""
+    row = next(iter(tl))
+    assert row["target-bid"] == "9999"
+    assert row["date"] == "27.12.2024 23:55:59"
+
+def test_transaction_row_slots_invalid():
+    """test row does not accept unknown attributes"""
+    row = TransactionRow("9999", "CZK", "+1.00", datetime(2023, 1, 1))
+    with pytest.raises(AttributeError) as e_info:
+        row.unknown = 1
+
+def test_transaction_row_stored_display_valid():
+    """test date formatted at write time is used"""
+    row = TransactionRow.from_entry({"target-bid": "9999", "currency-code": "CZK", "amount": "+1.00", "date": datetime(2023, 1, 1), "date-display": "stored"})
+    assert row.to_dict()["date"] == "stored"
+
+def test_transaction_list_to_output_stored_display_valid():
+    """test to_output uses stored display and formats entries without it"""
+    tl = TransactionList([
+        {"target-bid": "9999", "currency-code": "CZK", "amount": "+1.00", "date": datetime(2023, 1, 1, tzinfo=timezone.utc)},
+        {"target-bid": "9999", "currency-code": "CZK", "amount": "+2.00", "date": datetime(2023, 1, 2), "date-display": "stored"}
+    ])
+    assert [row["date"] for row in tl.to_output()] == ["stored", "01.01.2023 00:00:00"]
+
+def test_currency_balance_to_output_cached_valid(cb : CurrencyBalance):
+    """test currency balances are formatted only once"""
+    assert cb.to_output() is cb.to_output()
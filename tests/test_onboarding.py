@@ -0,0 +1,76 @@
+import pytest
+import json
+from web.onboarding import read_customers, validate_customer, onboard
+from web.repository import MemoryRepository
+from web.bids import bid_allocator
+
+# FIXTURES ---------------------------------------------------
+
+CSV = """firstname,surname,email,password
+Jan,Novak,jan@test.com,pass1
+Eva,Mala,eva@test.com,pass2
+,Empty,empty@test.com,pass3
+Petr,Bad,bad-email,pass4
+Jan,Again,jan@test.com,pass5
+"""
+
+@pytest.fixture()
+def repository(monkeypatch):
+    repository = MemoryRepository()
+    monkeypatch.setattr(bid_allocator, "repository", repository)
+    bid_allocator.reset()
+    yield repository
+    bid_allocator.reset()
+
+@pytest.fixture()
+def customers(tmp_path):
+    path = tmp_path / "customers.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+# TESTS ------------------------------------------------------
+
+def test_read_customers_jsonl_valid(tmp_path):
+    """test streaming JSONL - broken line is returned as None, processed records are skipped"""
+    path = tmp_path / "customers.jsonl"
+    path.write_text('{"email": "a@test.com"}\nnot json\n\n{"email": "b@test.com"}\n', encoding="utf-8")
+    assert [record for _, record in read_customers(str(path))] == [{"email": "a@test.com"}, None, {"email": "b@test.com"}]
+    assert [number for number, _ in read_customers(str(path), skip=2)] == [3]
+
+def test_validate_customer_invalid():
+    """test customer validation with BankAccount setters"""
+    with pytest.raises(ValueError):
+        validate_customer({"firstname": "", "surname": "a", "email": "a@test.com", "password": "p"})
+    with pytest.raises(ValueError):
+        validate_customer({"firstname": "a", "surname": "a", "email": "a@test.com"})
+    assert validate_customer({"firstname": "a", "surname": "a", "email": "a@test.com", "password": "p"}).bid == "new"
+
+def test_onboard_valid(repository, customers, tmp_path):
+    """test onboarding - valid customers get account and zero balance, invalid are reported"""
+    result = onboard(customers, "pbkdf2:sha256:1000", workers=2, batch=2, checkpoint_path=str(tmp_path / "checkpoint"), repository=repository)
+    assert (result["processed"], result["inserted"], result["skipped"], result["invalid"]) == (5, 2, 1, 2)
+    assert [number for number, _ in result["errors"]] == [3, 4]
+    account = repository.find_account(email="eva@test.com")
+    assert account["password"].startswith("pbkdf2:sha256:1000$")
+    assert repository.find_balance(account["bid"])["currency-balance"] == {"CZK": 0.0}
+
+def test_onboard_resume_valid(repository, customers, tmp_path):
+    """test onboarding continues after the last saved batch"""
+    checkpoint = tmp_path / "checkpoint"
+    onboard(customers, "pbkdf2:sha256:1000", workers=1, batch=2, checkpoint_path=str(checkpoint), repository=repository)
+    saved = json.loads(checkpoint.read_text(encoding="utf-8"))
+    saved.update({"processed": 2, "inserted": 1})
+    checkpoint.write_text(json.dumps(saved), encoding="utf-8")
+    progress = list()
+    result = onboard(customers, "pbkdf2:sha256:1000", workers=1, batch=2, checkpoint_path=str(checkpoint), repository=repository, progress=progress.append)
+    # records 3 - 5 are invalid or already inserted -> no new account
+    assert result["inserted"] == 1
+    assert result["skipped"] == 2
+    assert [p["processed"] for p in progress] == [4, 5]
+
+def test_onboard_other_checkpoint_invalid(repository, customers, tmp_path):
+    """test checkpoint of other file - raises ValueError"""
+    checkpoint = tmp_path / "checkpoint"
+    checkpoint.write_text(json.dumps({"source": "/other.csv", "processed": 1}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        onboard(customers, "pbkdf2:sha256:1000", checkpoint_path=str(checkpoint), repository=repository)
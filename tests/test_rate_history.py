@@ -0,0 +1,64 @@
+import pytest
+from web.repository import MemoryRepository
+from web.rate_history import parse_year, rates_on, rate_on, save_rates, backfill
+from datetime import datetime
+
+CNB_YEAR = """Datum|1 EUR|100 JPY
+02.01.2023|24,115|17,152
+03.01.2023|24,155|17,203
+Datum|1 EUR|100 JPY|1 USD
+04.01.2023|24,080|17,009|22,753
+"""
+
+# FIXTURES ---------------------------------------------------
+
+class FakeStorage():
+    def __init__(self):
+        self.batches = list()
+
+    def save_rate_history(self, documents):
+        self.batches.append(documents)
+
+@pytest.fixture()
+def history():
+    repository = MemoryRepository()
+    save_rates({"date": datetime(2023, 1, 5), "currency-rates": {"EUR": 24.0}}, repository)
+    save_rates({"date": datetime(2023, 1, 6), "currency-rates": {"EUR": 24.5}}, repository)
+    return repository
+
+# TESTS ------------------------------------------------------
+
+def test_parse_year_valid():
+    """test parsing yearly file with changed header"""
+    documents = parse_year(CNB_YEAR)
+    assert [d["date"] for d in documents] == [datetime(2023, 1, 2), datetime(2023, 1, 3), datetime(2023, 1, 4)]
+    assert documents[0]["currency-rates"]["JPY"] == pytest.approx(0.17152)
+    assert "USD" not in documents[0]["currency-rates"]
+    assert documents[2]["currency-rates"]["USD"] == pytest.approx(22.753)
+
+def test_rate_on_valid(history):
+    """test rate of the exact date"""
+    assert rate_on("EUR", datetime(2023, 1, 6, 15, 30), history) == 24.5
+
+def test_rate_on_weekend_valid(history):
+    """test rate of weekend - falls back to previous business day"""
+    assert rates_on(datetime(2023, 1, 8), history)["date"] == datetime(2023, 1, 6)
+
+def test_rate_on_unknown_invalid(history):
+    """test rate before the first known date and of unknown currency"""
+    assert rate_on("EUR", datetime(2022, 12, 31), history) is None
+    assert rate_on("XYZ", datetime(2023, 1, 6), history) is None
+
+def test_save_rates_replace_valid(history):
+    """test saving the same date twice keeps one document"""
+    save_rates({"date": datetime(2023, 1, 6), "currency-rates": {"EUR": 25.0}}, history)
+    assert rates_on(datetime(2023, 1, 5), history)["currency-rates"] == {"EUR": 24.0}
+    assert rate_on("EUR", datetime(2023, 1, 6), history) == 25.0
+
+def test_backfill_range_valid(tmp_path):
+    """test backfill of date range from local yearly files"""
+    (tmp_path / "2023.txt").write_text(CNB_YEAR, encoding="utf-8")
+    storage = FakeStorage()
+    saved = backfill(datetime(2023, 1, 3), datetime(2023, 1, 10), workers=2, source=f"file://{tmp_path}/{{year}}.txt", repository=storage, batch=1)
+    assert saved == 2
+    assert [len(batch) for batch in storage.batches] == [1, 1]
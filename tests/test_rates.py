@@ -0,0 +1,67 @@
+import pytest
+from web.rates import RateCache
+from datetime import datetime
+
+# FIXTURES ---------------------------------------------------
+
+class FakeStorage():
+    def __init__(self, document):
+        self.document = document
+        self.reads = 0
+
+    def get_rates(self):
+        self.reads += 1
+        return self.document
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture()
+def storage():
+    return FakeStorage({"_id": "rates", "date": datetime(2023, 4, 3), "currency-rates": {"EUR": 23.5, "USD": 21.7}})
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+@pytest.fixture()
+def cache(storage, clock):
+    return RateCache(storage.get_rates, ttl=60, clock=clock)
+
+# TESTS ------------------------------------------------------
+
+def test_rate_cache_hit_valid(cache : RateCache, storage : FakeStorage):
+    """test repeated reads inside ttl - database is read only once"""
+    cache.get()
+    cache.get()
+    assert cache.rates() == {"EUR": 23.5, "USD": 21.7}
+    assert storage.reads == 1
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_rate_cache_ttl_expired_valid(cache : RateCache, storage : FakeStorage, clock : FakeClock):
+    """test read after ttl expiration - document is reloaded from database"""
+    cache.get()
+    clock.now = 61
+    cache.get()
+    assert storage.reads == 2
+
+def test_rate_cache_invalidate_valid(cache : RateCache, storage : FakeStorage):
+    """test read after invalidation - document is reloaded from database"""
+    cache.get()
+    storage.document = {"_id": "rates", "date": datetime(2023, 4, 4), "currency-rates": {"EUR": 24.0}}
+    cache.invalidate()
+    assert cache.rates() == {"EUR": 24.0}
+    assert storage.reads == 2
+
+def test_rate_cache_missing_document_invalid(storage : FakeStorage, clock : FakeClock):
+    """test missing document - empty rates and nothing is cached"""
+    storage.document = None
+    cache = RateCache(storage.get_rates, ttl=60, clock=clock)
+    assert cache.rates() == {}
+    assert cache.rates() == {}
+    assert storage.reads == 2
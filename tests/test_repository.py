@@ -0,0 +1,95 @@
+import pytest
+import mongomock
+from web.repository import MongoRepository, MemoryRepository, create_repository, _reset_after_fork
+from datetime import datetime, timedelta
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def repository():
+    repository = MemoryRepository()
+    repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 100.0}})
+    return repository
+
+# TESTS ------------------------------------------------------
+
+def test_mongo_repository_lazy_client_valid():
+    """test client is not created before first use and is dropped in forked process"""
+    repository = MongoRepository("mongodb://localhost:1", serverSelectionTimeoutMS=1)
+    assert repository._client is None
+    client = repository.client
+    assert repository.client is client
+    _reset_after_fork()
+    assert repository._client is None
+    client.close()
+
+def test_create_repository_pool_options_valid():
+    """test pool size and timeouts from configuration are passed to the client"""
+    repository = create_repository({
+        "STORAGE_BACKEND": "mongo",
+        "MONGO_URI": "mongodb://localhost:1",
+        "MONGO_DATABASE": "test",
+        "MONGO_MAX_POOL_SIZE": 7,
+        "MONGO_MIN_POOL_SIZE": 1,
+        "MONGO_TIMEOUT_MS": 100,
+        "MONGO_SOCKET_TIMEOUT_MS": 200
+    })
+    assert repository.database == "test"
+    assert repository.client_options["maxPoolSize"] == 7
+    assert repository.client_options["serverSelectionTimeoutMS"] == 100
+    assert isinstance(create_repository({"STORAGE_BACKEND": "memory"}), MemoryRepository)
+
+def test_memory_change_balance_guard_invalid(repository):
+    """test debit guard - balance and version are not changed"""
+    assert not repository.change_balance("0001", "CZK", -200.0, minimum=200.0)
+    assert not repository.change_balance("0001", "EUR", -1.0, minimum=1.0)
+    assert repository.find_balance("0001") == {"currency-balance": {"CZK": 100.0}, "version": 0}
+
+def test_memory_run_atomic_rollback_valid(repository):
+    """test failed callback - balance and history changes are undone"""
+    def callback(db_session):
+        repository.change_balance("0001", "CZK", -10.0, minimum=10.0)
+        repository.change_balance("0001", "EUR", 5.0)
+        repository.add_entries([{"bid": "0001", "date": datetime(2023, 4, 1)}])
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        repository.run_atomic(callback)
+    assert repository.find_balance("0001") == {"currency-balance": {"CZK": 100.0}, "version": 0}
+    assert repository.history_page("0001") == []
+
+def test_memory_history_order_valid(repository):
+    """test entries inserted out of order are returned newest first"""
+    start = datetime(2023, 4, 1)
+    for minutes in (2, 0, 1):
+        repository.add_entries([{"bid": "0001", "date": start + timedelta(minutes=minutes)}])
+    page = repository.history_page("0001", limit=2)
+    assert [e["date"].minute for e in page] == [2, 1]
+    assert [e["date"].minute for e in repository.history_page("0001", (page[-1]["date"], page[-1]["_id"]))] == [0]
+
+def test_memory_idempotency_key_valid(repository):
+    """test claimed key is returned with result, released and expired keys can be claimed again"""
+    expires = datetime.utcnow() + timedelta(minutes=5)
+    assert repository.claim_key("0001:a", expires) is None
+    assert repository.claim_key("0001:a", expires)["result"] is None
+    repository.finish_key("0001:a", {"ok": True, "message": "done"})
+    assert repository.claim_key("0001:a", expires)["result"]["message"] == "done"
+    repository.release_key("0001:a")
+    assert repository.claim_key("0001:a", expires) is not None
+
+    assert repository.claim_key("0001:b", expires) is None
+    repository.release_key("0001:b")
+    assert repository.claim_key("0001:b", expires) is None
+    assert repository.claim_key("0001:c", datetime.utcnow() - timedelta(seconds=1)) is None
+    assert repository.claim_key("0001:c", expires) is None
+
+@pytest.mark.parametrize("backend", ["mongo", "memory"])
+def test_acquire_lease_valid(backend):
+    """test lease is held by one owner until it expires, owner can renew it"""
+    repository = MongoRepository(client=mongomock.MongoClient()) if backend == "mongo" else MemoryRepository()
+    now = datetime.utcnow()
+    assert repository.acquire_lease("rates", "a", now + timedelta(minutes=5))
+    assert not repository.acquire_lease("rates", "b", now + timedelta(minutes=5))
+    assert repository.acquire_lease("rates", "a", now - timedelta(minutes=1))
+    assert repository.acquire_lease("rates", "b", now + timedelta(minutes=5))
+
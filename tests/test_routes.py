@@ -1,8 +1,12 @@
 import pytest
 import pytest_timeout
+import web.routes
 from flask import session
-from web import create_app, account_db
+from web import create_app
 from web.objects import BankAccount, TransactionList, CurrencyBalance
+from web.auth import issue_challenge
+from web.rates import rate_cache
+from web.repository import get_repository
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
@@ -10,10 +14,16 @@ from datetime import datetime
 
 @pytest.fixture()
 def app():
-    app = create_app()
-    app.config.update({
+    app = create_app({
         "TESTING": True,
+        "STORAGE_BACKEND": "memory",
+        "SESSION_BACKEND": "memory",
     })
+    repository = get_repository()
+    repository.insert_account({"bid": "0001", "firstname": "test", "surname": "test", "email": "test@test.com", "password": generate_password_hash("test")})
+    repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 100.0}})
+    repository.set_rates({"date": datetime(2023, 4, 3), "currency-rates": {"EUR": 23.5, "USD": 21.7}})
+    rate_cache.invalidate()
     yield app
 
 @pytest.fixture()
@@ -34,6 +44,13 @@ def ba_test():
             ]
         }
 
+def login(client, monkeypatch, email : str = "test@test.com", password : str = "test"):
+    # whole login flow - send_code with the password, login_login with the code from the e-mail
+    codes = list()
+    monkeypatch.setattr(web.routes, "send_code", lambda email, code: codes.append(code) or True)
+    client.post("/login_send_code", data={"email_input": email, "password_input": password})
+    return client.post("/login_login", data={"email_input": email, "code_input": codes[-1]}, follow_redirects=True)
+
 # TESTS ------------------------------------------------------
     
 # login and logout
@@ -53,22 +70,69 @@ def test_login_login_page_invalid(client):
     response = client.post("/login_login", data={}, follow_redirects=True)
     assert "WELCOME TO STONKSTER" in response.get_data(as_text=True)
     
-def test_login_login_page_valid(client):
-    """test valid http post request to /login_login route with valid data - should redirect to /index route"""
+def test_login_login_page_valid(app, client):
+    """test valid http post request to /login_login route with valid challenge and code - should redirect to /index route"""
     form_data = {
         "email_input": "test@test.com",
-        "password_input": "test",
         "code_input": "1111"
     }
     
+    with app.test_request_context():
+        challenge = issue_challenge("test@test.com", "1111")
     with client.session_transaction() as session:
-        session["code"] = "1111"
+        session["challenge"] = challenge
     
     response = client.post("/login_login", data=form_data, follow_redirects=True)
     
     assert response.request.path == "/index"    
     
     
+def test_login_login_new_session_id_valid(app, client):
+    """test successful login changes session cookie - id from before login is not valid"""
+    with app.test_request_context():
+        challenge = issue_challenge("test@test.com", "1111")
+    with client.session_transaction() as session:
+        session["challenge"] = challenge
+    before = client.get_cookie("session").value
+
+    client.post("/login_login", data={"email_input": "test@test.com", "code_input": "1111"})
+
+    assert client.get_cookie("session").value != before
+    client.set_cookie("session", before)
+    assert client.get("/index", follow_redirects=True).request.path == "/login"
+
+def test_login_login_wrong_code_invalid(app, client):
+    """test invalid http post request to /login_login route with wrong code - should return login page title"""
+    form_data = {
+        "email_input": "test@test.com",
+        "code_input": "2222"
+    }
+    
+    with app.test_request_context():
+        challenge = issue_challenge("test@test.com", "1111")
+    with client.session_transaction() as session:
+        session["challenge"] = challenge
+    
+    response = client.post("/login_login", data=form_data, follow_redirects=True)
+    
+    assert "WELCOME TO STONKSTER" in response.get_data(as_text=True)
+
+def test_login_login_other_email_invalid(app, client):
+    """test invalid http post request to /login_login route with challenge of another e-mail - should return login page title"""
+    form_data = {
+        "email_input": "other@test.com",
+        "code_input": "1111"
+    }
+    
+    with app.test_request_context():
+        challenge = issue_challenge("test@test.com", "1111")
+    with client.session_transaction() as session:
+        session["challenge"] = challenge
+    
+    response = client.post("/login_login", data=form_data, follow_redirects=True)
+    
+    assert "WELCOME TO STONKSTER" in response.get_data(as_text=True)
+
 def test_login_send_code_invalid_email(client):
     """test invalid http post request to /login_send_code route without valid e-mail - should return login page title"""
     form_data = {
@@ -79,6 +143,30 @@ def test_login_send_code_invalid_email(client):
     
     assert "WELCOME TO STONKSTER" in response.get_data(as_text=True)
 
+def test_login_password_checked_once_valid(app, client, monkeypatch):
+    """test whole login flow (send_code + login_login) verifies the password hash exactly once"""
+    checked = list()
+    check_password = BankAccount.check_password
+    monkeypatch.setattr(BankAccount, "check_password", lambda self, password: checked.append(password) or check_password(self, password))
+    response = login(client, monkeypatch)
+    assert response.request.path == "/index"
+    assert checked == ["test"]
+
+def test_login_send_code_rehash_valid(app, client, monkeypatch):
+    """test password hash with other method is rewritten by the first login and not by the next one"""
+    repository = get_repository()
+    repository.update_account("0001", {"password": generate_password_hash("test", "pbkdf2:sha256:1000")})
+    updates = list()
+    update_account = repository.update_account
+    monkeypatch.setattr(repository, "update_account", lambda bid, fields: updates.append(fields) or update_account(bid, fields))
+    assert login(client, monkeypatch).request.path == "/index"
+    client.post("/logout")
+    assert login(client, monkeypatch).request.path == "/index"
+    assert len(updates) == 1
+    password_hash = repository.find_account(email="test@test.com")["password"]
+    assert password_hash.startswith(app.config["PASSWORD_HASH_METHOD"].split(":")[0] + ":")
+    assert BankAccount("test", "test", password_hash, "test@test.com", "0001").check_password("test")
+
 # index
 
 def test_get_index_page_without_session_invalid(client):
@@ -174,6 +262,22 @@ def test_send_transaction_invalid_str_amount(client, ba_test):
     
     assert flash_message == "Error in 'amount' input."
 
+@pytest.mark.parametrize("amount", ["-50", "0", "nan", "inf"])
+def test_send_transaction_not_positive_amount_invalid(client, amount):
+    """test amount which is not a finite number greater than 0 - flashed error, no balance change and no history entry"""
+    with client.session_transaction() as session:
+        session["ba"] = {"bid": "0001", "name": "test test", "currency-balance": {}}
+    form_data = {"tobid_input": "9999", "curr_input": "CZK", "amount_input": amount}
+    response = client.post("/send_transaction", data=form_data)
+
+    with client.session_transaction() as session:
+        flash_message = dict(session['_flashes']).get('message')
+
+    assert response.status_code == 302
+    assert flash_message == "Error in 'amount' input."
+    assert get_repository().find_balance("0001")["currency-balance"]["CZK"] == 100.0
+    assert list(get_repository().iter_history("0001")) == []
+
 def test_send_transaction_invalid_none_amount(client, ba_test):
     """test invalid http post request to /send_transaction route with invalid amount form input - should return flashed error message"""
     with client.session_transaction() as session:
@@ -185,8 +289,12 @@ def test_send_transaction_invalid_none_amount(client, ba_test):
         "amount_input": None
     }
     
-    with pytest.raises(TypeError) as e_info:
-        response = client.post("/send_transaction", data=form_data, follow_redirects=True)
+    response = client.post("/send_transaction", data=form_data)
+
+    with client.session_transaction() as session:
+        flash_message = dict(session['_flashes']).get('message')
+
+    assert flash_message == "Error in 'amount' input."
         
 def test_valid_send_transaction_no_primary_transfer(client, ba_test):
     """test valid http post request to /send_transaction route with no primary transfer - should return flashed informative message"""
@@ -205,4 +313,169 @@ def test_valid_send_transaction_no_primary_transfer(client, ba_test):
     with client.session_transaction() as session:
         flash_message = dict(session['_flashes']).get('message')
         
-    assert flash_message == "You do not have enough resources."
\ No newline at end of file
+    assert flash_message == "You do not have enough resources."
+
+# bulk transactions
+
+def test_bulk_transactions_without_session_invalid(client):
+    """test invalid http post request to /api/transactions/bulk route without valid session - should return 401"""
+    response = client.post("/api/transactions/bulk", json={"transfers": []})
+    assert response.status_code == 401
+
+def test_bulk_transactions_invalid_body(client, ba_test):
+    """test invalid http post request to /api/transactions/bulk route without transfers list - should return 400"""
+    with client.session_transaction() as session:
+        session["ba"] = ba_test
+    response = client.post("/api/transactions/bulk", json={"transfer": {}})
+    assert response.status_code == 400
+
+def test_bulk_transactions_invalid_items(client):
+    """test items with wrong json types or amount - per-item errors, valid item is made"""
+    with client.session_transaction() as session:
+        session["ba"] = {"bid": "0001", "name": "test test", "currency-balance": {}}
+    transfers = [
+        {"target-bid": "9999", "currency": 5, "amount": 1},
+        {"target-bid": ["x"], "currency": "CZK", "amount": 1},
+        {"target-bid": "9999", "currency": "CZK", "amount": -50},
+        {"target-bid": "9999", "currency": "CZK", "amount": 10}
+    ]
+    response = client.post("/api/transactions/bulk", json={"transfers": transfers})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["ok"] for result in results] == [False, False, False, True]
+    assert [result["message"] for result in results[:3]] == ["Error in 'currency' input.", "Error in 'to bid' input.", "Error in 'amount' input."]
+    assert get_repository().find_balance("0001")["currency-balance"]["CZK"] == 90.0
+
+# json api
+
+def test_api_balance_without_session_invalid(client):
+    """test invalid http get request to /api/balance route without valid session - should return 401"""
+    response = client.get("/api/balance")
+    assert response.status_code == 401
+
+def test_api_currencies_valid(client):
+    """test valid http get request to /api/currencies route - should return currency codes with ETag"""
+    response = client.get("/api/currencies")
+    assert response.status_code == 200
+    assert "CZK" in response.get_json()["currency-codes"]
+    assert response.headers.get("ETag") is not None
+
+def test_api_currencies_not_modified_valid(client):
+    """test conditional http get request to /api/currencies route with current ETag - should return 304"""
+    etag = client.get("/api/currencies").headers["ETag"]
+    response = client.get("/api/currencies", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+
+# idempotency
+
+def test_send_transaction_replayed_key_valid(client):
+    """test repeated submit with the same idempotency key - money is sent once and the first result is flashed again"""
+    with client.session_transaction() as session:
+        session["ba"] = {"bid": "0001", "name": "test test", "currency-balance": {}}
+    form_data = {
+        "tobid_input": "9999",
+        "curr_input": "CZK",
+        "amount_input": "10.0",
+        "idempotency_key": "test-key"
+    }
+    messages = list()
+    for _ in range(2):
+        client.post("/send_transaction", data=form_data)
+        with client.session_transaction() as session:
+            messages.append(dict(session.pop('_flashes')).get('message'))
+
+    assert messages == ["The transaction was successful."] * 2
+    assert get_repository().find_balance("0001")["currency-balance"]["CZK"] == 90.0
+
+def test_index_page_idempotency_key_valid(client, ba_test):
+    """test every rendered index page has a new idempotency key"""
+    with client.session_transaction() as session:
+        session["ba"] = ba_test
+    pages = [client.get("/index").get_data(as_text=True) for _ in range(2)]
+    keys = [page.split('name="idempotency_key" value="')[1].split('"')[0] for page in pages]
+    assert keys[0] and keys[0] != keys[1]
+
+# fragment cache
+
+def test_index_page_fragment_cache_valid(client):
+    """test repeated index page reuses fragments, a transaction changes the account fragments"""
+    from web.fragments import fragment_cache
+    with client.session_transaction() as session:
+        session["ba"] = {"bid": "0001", "name": "test test", "currency-balance": {}}
+    form_data = {"tobid_input": "9999", "curr_input": "CZK", "amount_input": "10.0"}
+    client.post("/send_transaction", data=form_data)
+    first = client.get("/index").get_data(as_text=True)
+    hits = fragment_cache.stats()["hits"]
+    assert "Balance: 90.00" in client.get("/index").get_data(as_text=True)
+    assert fragment_cache.stats()["hits"] == hits + 3
+    assert '<option value="EUR">' in first and "Balance: 90.00" in first
+
+    client.post("/send_transaction", data=form_data)
+    page = client.get("/index").get_data(as_text=True)
+    assert "Balance: 80.00" in page
+    assert page.count("-10.00 CZK") == 2
+
+def test_index_page_fragment_rate_date_valid(app, client):
+    """test sessions of the same account version refreshed with different rates get their own total"""
+    from web.routes import refresh_account_data
+
+    def refreshed_ba():
+        with app.test_request_context():
+            session["ba"] = {"bid": "0001", "name": "test test", "currency-balance": {}}
+            refresh_account_data()
+            return dict(session["ba"])
+
+    get_repository().change_balance("0001", "EUR", 1.0)
+    first = refreshed_ba()
+    get_repository().set_rates({"date": datetime(2023, 4, 4), "currency-rates": {"EUR": 24.0, "USD": 21.7}})
+    rate_cache.invalidate()
+    second = refreshed_ba()
+
+    pages = list()
+    for ba in (first, second):
+        with client.session_transaction() as client_session:
+            client_session["ba"] = ba
+        pages.append(client.get("/index").get_data(as_text=True))
+    assert "Value: 123.50 CZK" in pages[0]
+    assert "Value: 124.00 CZK" in pages[1]
+
+# export
+
+def test_export_without_session_invalid(client):
+    """test invalid http get request to /export route without valid session - should redirect to /login route"""
+    response = client.get("/export", follow_redirects=True)
+    assert response.request.path == "/login"
+
+def test_export_csv_valid(client, ba_test):
+    """test valid http get request to /export route - should stream csv attachment"""
+    with client.session_transaction() as session:
+        session["ba"] = ba_test
+    response = client.get("/export?format=csv&from=2023-01-01&currency=eur")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert "attachment" in response.headers["Content-Disposition"]
+    assert response.get_data(as_text=True).startswith("date,target-bid,currency-code,amount")
+
+def test_export_invalid_format(client, ba_test):
+    """test invalid http get request to /export route with unknown format or date - should return 400"""
+    with client.session_transaction() as session:
+        session["ba"] = ba_test
+    assert client.get("/export?format=xml").status_code == 400
+    assert client.get("/export?from=1.1.2023").status_code == 400
+
+# throttling
+
+def test_login_send_code_throttled_invalid(app, client, monkeypatch):
+    """test login requests over e-mail limit - 429 without password check"""
+    from web.throttle import throttle
+    throttle.rules["email"] = (2, 0.001)
+    checked = list()
+    monkeypatch.setattr(BankAccount, "check_password", lambda self, password: checked.append(password) or False)
+    form_data = {"email_input": "test@test.com", "password_input": "wrong"}
+    statuses = [client.post("/login_send_code", data=form_data).status_code for _ in range(3)]
+    assert statuses == [302, 302, 429]
+    assert len(checked) == 2
+    response = client.post("/login_login", data={"email_input": "test@test.com", "code_input": "1111"})
+    assert response.status_code == 429
+    assert "Too many login attempts" in response.get_data(as_text=True)
@@ -0,0 +1,115 @@
+import pytest
+from web.rates import fetch_rates, parse_rates
+from web import create_app
+from web.scheduler import RateScheduler, rate_scheduler
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Event, Thread
+from datetime import datetime
+
+CNB_DATA = """03.04.2023 #65
+země|měna|množství|kód|kurz
+EMU|euro|1|EUR|23,485
+Japonsko|jen|100|JPY|16,290
+USA|dolar|1|USD|21,580
+
+"""
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture()
+def cnb_file(tmp_path):
+    path = tmp_path / "denni_kurz.txt"
+    path.write_text(CNB_DATA, encoding="utf-8")
+    return f"file://{path}"
+
+@pytest.fixture()
+def cnb_server():
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = CNB_DATA.encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/denni_kurz.txt?date={{date}}"
+    server.shutdown()
+
+# TESTS ------------------------------------------------------
+
+def test_fetch_rates_file_valid(cnb_file):
+    """test downloading rates from local file and parsing them"""
+    d = parse_rates(fetch_rates(cnb_file))
+    assert d["date"] == datetime(2023, 4, 3)
+    assert d["currency-rates"]["EUR"] == pytest.approx(23.485)
+    assert d["currency-rates"]["JPY"] == pytest.approx(0.1629)
+
+def test_fetch_rates_stub_server_valid(cnb_server):
+    """test downloading rates from stub http server"""
+    d = parse_rates(fetch_rates(cnb_server, timeout=5))
+    assert d["date"] == datetime(2023, 4, 3)
+
+def test_scheduler_refresh_source_valid(cnb_file):
+    """test scheduler passes its source and timeout to download function"""
+    calls = []
+    scheduler = RateScheduler(download=lambda source, timeout: calls.append((source, timeout)) or True, source=cnb_file, timeout=3)
+    assert scheduler.refresh()
+    assert calls == [(cnb_file, 3)]
+
+def test_scheduler_refresh_retries_valid():
+    """test failing download is retried until it succeeds"""
+    attempts = []
+    def download(source, timeout):
+        attempts.append(source)
+        if len(attempts) < 3:
+            raise OSError("timed out")
+        return True
+    scheduler = RateScheduler(download=download, retries=3, backoff=0)
+    assert scheduler.refresh()
+    assert len(attempts) == 3
+
+def test_scheduler_refresh_retries_invalid():
+    """test download failing on every attempt - refresh returns False"""
+    def download(source, timeout):
+        raise OSError("timed out")
+    scheduler = RateScheduler(download=download, retries=2, backoff=0)
+    assert not scheduler.refresh()
+
+def test_scheduler_single_flight_valid():
+    """test concurrent refresh does not start a second download"""
+    started, release = Event(), Event()
+    def download(source, timeout):
+        started.set()
+        release.wait(5)
+        return True
+    scheduler = RateScheduler(download=download)
+    thread = Thread(target=scheduler.refresh)
+    thread.start()
+    started.wait(5)
+    assert not scheduler.refresh()
+    release.set()
+    thread.join(5)
+
+def test_scheduler_lease_invalid():
+    """test refresh without the shared lease does not download"""
+    calls = []
+    leases = iter([True, False])
+    scheduler = RateScheduler(download=lambda source, timeout: calls.append(source) or True, lease=lambda seconds: next(leases))
+    assert scheduler.refresh()
+    assert not scheduler.refresh()
+    assert len(calls) == 1
+
+def test_scheduler_start_first_request_valid(monkeypatch):
+    """test scheduler is not started by create_app (cli commands, preloading master) but by the first request"""
+    starts = []
+    monkeypatch.setattr(rate_scheduler, "start", lambda: starts.append(True))
+    app = create_app({"STORAGE_BACKEND": "memory", "ENSURE_INDEXES": False})
+    assert starts == []
+    app.test_client().get("/login")
+    assert starts == [True]
+
@@ -0,0 +1,126 @@
+import pytest
+from flask import Flask, session
+from web.sessions import MemorySessionStore, ServerSessionInterface
+from datetime import datetime, timedelta, timezone
+
+# FIXTURES ---------------------------------------------------
+
+class CountingStore(MemorySessionStore):
+    def __init__(self, maxsize : int = 10000):
+        super().__init__(maxsize)
+        self.reads = 0
+
+    def get(self, sid):
+        self.reads += 1
+        return super().get(sid)
+
+@pytest.fixture()
+def store():
+    return CountingStore()
+
+@pytest.fixture()
+def client(store):
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "test"
+    app.session_interface = ServerSessionInterface(store)
+
+    @app.route("/set")
+    def set_data():
+        session["ba"] = {"bid": "0001", "transaction-list": ["x" * 100] * 100}
+        return "ok"
+
+    @app.route("/get")
+    def get_data():
+        return session.get("ba", {}).get("bid", "none")
+
+    @app.route("/static-like")
+    def static_like():
+        return "ok"
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    @app.route("/login")
+    def login():
+        session.clear()
+        session.regenerate()
+        session["ba"] = {"bid": "0002"}
+        return "ok"
+
+    @app.route("/logout")
+    def logout():
+        session.clear()
+        session.regenerate()
+        return "ok"
+
+    with app.test_client() as client:
+        yield client
+
+# TESTS ------------------------------------------------------
+
+def test_session_cookie_keeps_only_id_valid(client):
+    """test cookie size does not depend on session data"""
+    response = client.get("/set")
+    cookie = response.headers["Set-Cookie"]
+    assert len(cookie) < 200
+    assert client.get("/get").get_data(as_text=True) == "0001"
+
+def test_session_lazy_load_valid(client, store : CountingStore):
+    """test request which does not touch session does not read session store"""
+    client.get("/set")
+    client.get("/static-like")
+    assert store.reads == 0
+    client.get("/get")
+    assert store.reads == 1
+
+def test_session_clear_valid(client, store : CountingStore):
+    """test cleared session is deleted from store"""
+    client.get("/set")
+    client.get("/clear")
+    assert client.get("/get").get_data(as_text=True) == "none"
+    assert len(store._sessions) == 0
+
+def test_session_regenerate_valid(client, store : CountingStore):
+    """test login gives new session id and the id known before login is not valid any more"""
+    client.get("/set")
+    before = client.get_cookie("session").value
+    client.get("/login")
+    after = client.get_cookie("session").value
+    assert after != before
+    assert list(store._sessions) != [before] and len(store._sessions) == 1
+    assert client.get("/get").get_data(as_text=True) == "0002"
+    # fixed id from before login
+    client.set_cookie("session", before)
+    assert client.get("/get").get_data(as_text=True) == "none"
+
+def test_session_regenerate_logout_valid(client, store : CountingStore):
+    """test logout deletes the session record and cookie"""
+    client.get("/set")
+    client.get("/logout")
+    assert client.get_cookie("session") is None
+    assert len(store._sessions) == 0
+
+def test_session_forged_cookie_invalid(client):
+    """test cookie with invalid signature starts new empty session"""
+    client.get("/set")
+    client.set_cookie("session", "forged.sid")
+    assert client.get("/get").get_data(as_text=True) == "none"
+
+def test_memory_store_expired_invalid():
+    """test expired session is not returned"""
+    store = MemorySessionStore()
+    store.save("sid", {"a": 1}, datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=1))
+    assert store.get("sid") is None
+
+def test_memory_store_lru_eviction_valid():
+    """test least recently used session is evicted when store is full"""
+    store = MemorySessionStore(maxsize=2)
+    expires = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=5)
+    store.save("a", {}, expires)
+    store.save("b", {}, expires)
+    store.get("a")
+    store.save("c", {}, expires)
+    assert store.get("b") is None
+    assert store.get("a") is not None
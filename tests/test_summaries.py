@@ -0,0 +1,86 @@
+import pytest
+import mongomock
+from web.summaries import month_of, summary_changes, record_entries, load_summaries, rebuild_summaries
+from web.history import add_entry, make_entry
+from web.transfers import deposit, debit
+from web.repository import MongoRepository, MemoryRepository
+from datetime import datetime
+
+# FIXTURES ---------------------------------------------------
+
+@pytest.fixture(params=["mongo", "memory"])
+def repository(request):
+    if request.param == "mongo":
+        repository = MongoRepository(client=mongomock.MongoClient())
+        repository.db.balance.insert_one({"bid": "0001", "currency-balance": {"CZK": 100.0}})
+    else:
+        repository = MemoryRepository()
+        repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 100.0}})
+    return repository
+
+ENTRIES = [
+    make_entry("0001", "0001", "CZK", "+10.00", datetime(2023, 3, 5)),
+    make_entry("0001", "0002", "CZK", "-2.50", datetime(2023, 3, 6)),
+    make_entry("0001", "0002", "EUR", "-1.00", datetime(2023, 4, 1)),
+    make_entry("0002", "0001", "CZK", "+3.00", datetime(2023, 4, 2))
+]
+
+# TESTS ------------------------------------------------------
+
+def test_month_of_valid():
+    """test month key of the date"""
+    assert month_of(datetime(2023, 4, 30, 23, 59)) == "2023-04"
+
+def test_summary_changes_valid():
+    """test entries are summed per account and month, outflow is positive"""
+    changes = summary_changes(ENTRIES)
+    assert changes[("0001", "2023-03")] == {"inflow": {"CZK": 10.0}, "outflow": {"CZK": 2.5}}
+    assert changes[("0001", "2023-04")] == {"inflow": {}, "outflow": {"EUR": 1.0}}
+    assert changes[("0002", "2023-04")] == {"inflow": {"CZK": 3.0}, "outflow": {}}
+
+def test_summary_changes_deltas_valid():
+    """test given balance changes are used instead of formatted amounts"""
+    entries = [make_entry("0001", "0002", "CZK", "--50.00", datetime(2023, 3, 5))]
+    assert summary_changes(entries, [-50.0]) == {("0001", "2023-03"): {"inflow": {}, "outflow": {"CZK": 50.0}}}
+
+def test_record_entries_increments_valid(repository):
+    """test summaries are incremented, newest month first"""
+    for entry in ENTRIES + ENTRIES[:1]:
+        record_entries([entry], repository)
+    assert load_summaries("0001", repository=repository) == [
+        {"month": "2023-04", "inflow": {}, "outflow": {"EUR": "1.00"}},
+        {"month": "2023-03", "inflow": {"CZK": "20.00"}, "outflow": {"CZK": "2.50"}}
+    ]
+    assert load_summaries("0001", 1, repository) == [{"month": "2023-04", "inflow": {}, "outflow": {"EUR": "1.00"}}]
+
+def test_transfers_update_summary_valid(repository):
+    """test deposit and debit add to summary of the current month"""
+    assert deposit("0001", "CZK", 5, repository)
+    assert debit("0001", "0002", "CZK", 3, repository)
+    summaries = load_summaries("0001", repository=repository)
+    assert summaries == [{"month": month_of(datetime.now()), "inflow": {"CZK": "5.00"}, "outflow": {"CZK": "3.00"}}]
+
+def test_memory_update_rollback_valid():
+    """test summary change is undone with failed atomic block"""
+    repository = MemoryRepository()
+    record_entries(ENTRIES[:1], repository)
+
+    def callback(db_session):
+        record_entries(ENTRIES, repository, db_session)
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        repository.run_atomic(callback)
+    assert repository.find_summaries("0001") == [{"bid": "0001", "month": "2023-03", "inflow": {"CZK": 10.0}, "outflow": {}}]
+    assert repository.find_summaries("0002") == []
+
+def test_rebuild_summaries_valid():
+    """test rebuild replaces summaries with sums of whole history"""
+    repository = MemoryRepository()
+    for entry in ENTRIES:
+        add_entry(entry["bid"], entry["target-bid"], entry["currency-code"], entry["amount"], entry["date"], repository=repository)
+    record_entries(ENTRIES, repository)
+    assert rebuild_summaries(repository=repository) == 3
+    assert load_summaries("0001", repository=repository)[1] == {"month": "2023-03", "inflow": {"CZK": "10.00"}, "outflow": {"CZK": "2.50"}}
+    assert rebuild_summaries("0002", repository) == 1
+    assert load_summaries("0002", repository=repository) == [{"month": "2023-04", "inflow": {"CZK": "3.00"}, "outflow": {}}]
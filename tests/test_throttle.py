@@ -0,0 +1,83 @@
+import pytest
+import mongomock
+from web.throttle import MemoryBucketStore, MongoBucketStore, Throttle, throttle_decisions
+
+# FIXTURES ---------------------------------------------------
+
+class FakeClock():
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture()
+def clock():
+    return FakeClock()
+
+@pytest.fixture(params=["mongo", "memory"])
+def store(request, clock):
+    if request.param == "mongo":
+        return MongoBucketStore(mongomock.MongoClient().db.throttle, clock)
+    return MemoryBucketStore(clock=clock)
+
+# TESTS ------------------------------------------------------
+
+def test_take_burst_valid(store):
+    """test full bucket allows burst of capacity, then rejects"""
+    assert [store.take("a", 3, 1) for _ in range(4)] == [True, True, True, False]
+    # other key has own bucket
+    assert store.take("b", 3, 1)
+
+def test_take_refill_valid(store, clock):
+    """test tokens are added with time up to capacity"""
+    for _ in range(3):
+        store.take("a", 3, 0.5)
+    assert not store.take("a", 3, 0.5)
+    clock.now += 2
+    assert store.take("a", 3, 0.5)
+    assert not store.take("a", 3, 0.5)
+    clock.now += 100
+    assert [store.take("a", 3, 0.5) for _ in range(4)] == [True, True, True, False]
+
+def test_mongo_take_conflict_valid(clock):
+    """test concurrent change of the bucket - the take is retried with new state"""
+    collection = mongomock.MongoClient().db.throttle
+    store = MongoBucketStore(collection, clock)
+    store.take("a", 2, 0.001)
+    find_one = collection.find_one
+
+    def racing_find_one(*args, **kwargs):
+        doc = find_one(*args, **kwargs)
+        # other worker takes the last token after this read
+        collection.update_one({"_id": "a"}, {"$set": {"tokens": 0.0}, "$inc": {"version": 1}})
+        collection.find_one = find_one
+        return doc
+
+    collection.find_one = racing_find_one
+    assert not store.take("a", 2, 0.001)
+    assert collection.find_one({"_id": "a"})["version"] == 1
+
+def test_memory_store_maxsize_valid(clock):
+    """test the least recently used bucket is dropped"""
+    store = MemoryBucketStore(2, clock)
+    for key in ("a", "b", "c"):
+        store.take(key, 1, 0.001)
+    assert store.take("a", 1, 0.001)
+    assert not store.take("c", 1, 0.001)
+
+def test_throttle_allow_login_valid(clock):
+    """test ip bucket is checked first, e-mail is normalized and decisions are counted"""
+    throttle = Throttle(MemoryBucketStore(clock=clock), {"ip": (2, 0.001), "email": (1, 0.001)})
+    rejected = throttle_decisions.value("email", "rejected")
+    assert throttle.allow_login("1.1.1.1", "Test@test.com")
+    assert not throttle.allow_login("1.1.1.1", " test@test.com")
+    assert throttle_decisions.value("email", "rejected") == rejected + 1
+    # ip has no tokens -> e-mail bucket is not used
+    assert not throttle.allow_login("1.1.1.1", "other@test.com")
+    assert throttle.allow_login("2.2.2.2", "other@test.com")
+
+def test_throttle_disabled_valid():
+    """test disabled throttle and scope without rule allow everything"""
+    assert all(Throttle(rules={"ip": (1, 0.001)}, enabled=False).allow("ip", "a") for _ in range(3))
+    assert all(Throttle().allow("ip", "a") for _ in range(3))
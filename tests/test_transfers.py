@@ -0,0 +1,125 @@
+import pytest
+import mongomock
+import web.transfers
+from web.conversion import ConversionEngine
+from web.repository import MongoRepository, MemoryRepository
+from web.transfers import transfer, validate_transfer, existing_bids, plan_batch, bulk_transfer
+
+# FIXTURES ---------------------------------------------------
+
+ENGINE = ConversionEngine({"currency-rates": {"EUR": 25.0}})
+
+@pytest.fixture(params=["mongo", "memory"])
+def db(request, monkeypatch):
+    monkeypatch.setattr(web.transfers, "get_engine", lambda: ENGINE)
+    if request.param == "mongo":
+        repository = MongoRepository(client=mongomock.MongoClient())
+        repository.db.balance.insert_one({"bid": "0001", "currency-balance": {"CZK": 100.0, "EUR": 2.0}})
+    else:
+        repository = MemoryRepository()
+        repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 100.0, "EUR": 2.0}})
+    return repository
+
+def make(db, *args, **kwargs):
+    return transfer(*args, **kwargs, use_transaction=False, repository=db)
+
+def balance(db, bid : str = "0001") -> dict:
+    return db.find_balance(bid)["currency-balance"]
+
+def entries(db, bid : str = "0001") -> list:
+    return db.history_page(bid)
+
+# TESTS ------------------------------------------------------
+
+def test_transfer_debit_valid(db):
+    """test sending money - balance is decreased and transaction is logged"""
+    assert make(db, "0001", "0002", "EUR", 1.5)
+    assert balance(db)["EUR"] == 0.5
+    assert entries(db)[0]["amount"] == "-1.50"
+    assert db.balance_version("0001") == 1
+
+def test_transfer_not_enough_invalid(db):
+    """test sending more money than account has - nothing is changed"""
+    assert not make(db, "0001", "0002", "EUR", 3)
+    assert balance(db)["EUR"] == 2.0
+    assert entries(db) == []
+
+def test_transfer_missing_currency_invalid(db):
+    """test sending currency which account does not have"""
+    assert not make(db, "0001", "0002", "USD", 1)
+
+def test_transfer_main_currency_valid(db):
+    """test primary transfer - not enough EUR -> exchanged amount is taken from CZK"""
+    assert make(db, "0001", "0002", "EUR", 3, use_main_currency=True)
+    assert balance(db) == {"CZK": 25.0, "EUR": 2.0}
+    assert entries(db)[0]["currency-code"] == "CZK"
+
+def test_transfer_deposit_valid(db):
+    """test inserting money into own account - new currency is created"""
+    assert make(db, "0001", "0001", "USD", 10)
+    assert balance(db)["USD"] == 10
+    assert entries(db)[0]["amount"] == "+10.00"
+
+def test_transfer_deposit_missing_account_invalid(db):
+    """test inserting money into account without balance document"""
+    assert not make(db, "0002", "0002", "USD", 10)
+
+def test_validate_transfer_valid():
+    """test valid target account and currency"""
+    assert validate_transfer("0002", "eur", {"0002"}, {"EUR": 25.0}) is None
+    assert validate_transfer("9999", "CZK", set(), {}) is None
+
+def test_validate_transfer_invalid():
+    """test error messages of invalid target account and currency"""
+    assert validate_transfer(None, "EUR", set(), {}) == "Error in 'to bid' input."
+    assert validate_transfer("1111", "EUR", set(), {}) == "Target account (1111) does not exist."
+    assert validate_transfer("0002", None, {"0002"}, {}) == "Error in 'currency' input."
+    assert validate_transfer("0002", "xyz", {"0002"}, {}) == "Inserted currency (XYZ) does not exist in database."
+
+def test_existing_bids_valid():
+    """test finding existing accounts with one query"""
+    repository = MongoRepository(client=mongomock.MongoClient())
+    repository.db.account.insert_many([{"bid": "0001"}, {"bid": "0002"}])
+    assert existing_bids(["0001", "0003", None], repository) == {"0001"}
+
+def test_plan_batch_valid():
+    """test batch planning - running balance, primary transfer and not enough resources"""
+    transfers = [
+        {"target-bid": "0002", "currency": "EUR", "amount": 1.5},
+        {"target-bid": "0002", "currency": "EUR", "amount": 1.0},
+        {"target-bid": "0002", "currency": "EUR", "amount": 1.0, "primary-transfer": True},
+        {"target-bid": "0001", "currency": "USD", "amount": 5.0}
+    ]
+    results, changes, history = plan_batch("0001", {"CZK": 30.0, "EUR": 2.0}, transfers, ENGINE)
+    assert [r["ok"] for r in results] == [True, False, True, True]
+    assert results[2]["currency-code"] == "CZK"
+    assert results[2]["amount"] == "-25.00"
+    assert results[3]["amount"] == "+5.00"
+    assert changes == [("EUR", -1.5, 1.5), ("CZK", -25.0, 25.0), ("USD", 5.0, None)]
+    assert len(history) == 3
+
+def test_bulk_transfer_memory_valid(monkeypatch):
+    """test batch in memory storage - balance and history are written together"""
+    monkeypatch.setattr(web.transfers, "get_engine", lambda: ENGINE)
+    repository = MemoryRepository()
+    repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 30.0, "EUR": 2.0}})
+    results = bulk_transfer("0001", [
+        {"target-bid": "0002", "currency": "EUR", "amount": 1.5},
+        {"target-bid": "0002", "currency": "EUR", "amount": 1.0}
+    ], repository=repository)
+    assert [r["ok"] for r in results] == [True, False]
+    assert balance(repository) == {"CZK": 30.0, "EUR": 0.5}
+    assert len(entries(repository)) == 1
+
+def test_entries_balance_version_valid(monkeypatch):
+    """test every entry gets the balance version of its change - single transfers and batch"""
+    monkeypatch.setattr(web.transfers, "get_engine", lambda: ENGINE)
+    repository = MemoryRepository()
+    repository.insert_balance({"bid": "0001", "currency-balance": {"CZK": 30.0}})
+    transfer("0001", "0001", "CZK", 5.0, repository=repository)
+    bulk_transfer("0001", [
+        {"target-bid": "0002", "currency": "CZK", "amount": 1.0},
+        {"target-bid": "0002", "currency": "CZK", "amount": 2.0}
+    ], repository=repository)
+    assert [e["version"] for e in repository.history_newer("0001", 0)] == [3, 2, 1]
+    assert repository.balance_version("0001") == 3
@@ -0,0 +1,171 @@
+from flask import Blueprint, Response, request, session, current_app, jsonify
+from .history import load_page
+from .objects import CurrencyBalance, TransactionRow
+from .rates import rate_cache
+from .routes import refresh_account_data
+from .transfers import bulk_transfer, existing_bids, validate_transfer, parse_amount
+from .repository import get_repository
+from . import main_currency
+
+api = Blueprint("api", __name__)
+
+def error(message : str, status : int):
+    """json error response
+
+    Args:
+        message (str): error message
+        status (int): http status code
+
+    Returns:
+        Response: json response
+    """
+    return jsonify({"error": message}), status
+
+def conditional(etag : str, payload):
+    """json response with ETag - 304 Not Modified if the client already has it
+
+    Args:
+        etag (str): entity tag of the data
+        payload (callable): returns json data (called only if the data changed)
+
+    Returns:
+        Response: json response or empty 304 response
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(payload())
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+def balance_version(bid : str) -> int:
+    """version counter of account (incremented on every balance change and transaction)
+
+    Args:
+        bid (str): bank account id
+
+    Returns:
+        int: version or None if the account has no balance document
+    """
+    return get_repository().balance_version(bid)
+
+# READ
+
+@api.route("/balance", methods=["GET"])
+def balance():
+    """route for account balances
+
+    Returns:
+        Response: json with formated currency balances
+    """
+    if session.get("ba", None) is None:
+        return error("Not logged in.", 401)
+    bid = session["ba"]["bid"]
+    doc = get_repository().find_balance(bid)
+    if doc is None:
+        return error("Account has no balance.", 404)
+    return conditional(f"balance-{bid}-{doc.get('version', 0)}", lambda: {
+        "bid": bid,
+        "currency-balance": CurrencyBalance(doc["currency-balance"]).to_output()
+    })
+
+@api.route("/transactions", methods=["GET"])
+def transactions():
+    """route for one page of account transactions (newest first), ?before=<cursor> for older pages
+
+    Returns:
+        Response: json with transactions and cursor of the next page
+    """
+    if session.get("ba", None) is None:
+        return error("Not logged in.", 401)
+    bid = session["ba"]["bid"]
+    cursor = request.args.get("before", None)
+    version = balance_version(bid)
+
+    def payload():
+        entries, next_cursor = load_page(bid, cursor, current_app.config["HISTORY_PAGE_SIZE"])
+        return {
+            "transactions": [TransactionRow.from_entry(entry).to_dict() for entry in entries],
+            "next-cursor": next_cursor
+        }
+
+    try:
+        return conditional(f"transactions-{bid}-{version}-{cursor or 'first'}", payload)
+    except ValueError:
+        return error("Invalid cursor.", 400)
+
+@api.route("/currencies", methods=["GET"])
+def currencies():
+    """route for currency codes of current exchange rates
+
+    Returns:
+        Response: json with rate date and currency codes
+    """
+    document = rate_cache.get()
+    if document is None:
+        return error("Exchange rates are not available.", 503)
+    return conditional(f"currencies-{document['date']:%Y%m%d}", lambda: {
+        "date": document["date"].strftime("%d.%m.%Y"),
+        "currency-codes": [main_currency] + list(document["currency-rates"].keys())
+    })
+
+# WRITE
+
+@api.route("/transactions/bulk", methods=["POST"])
+def bulk_transactions():
+    """route for sending batch of transactions
+    body: {"transfers": [{"target-bid": str, "currency": str, "amount": float, "primary-transfer": bool}, ...]}
+
+    Returns:
+        Response: json with result of every transaction (in the same order)
+    """
+    if session.get("ba", None) is None:
+        return error("Not logged in.", 401)
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("transfers", None), list):
+        return error("Body must be json object with 'transfers' list.", 400)
+    items = data["transfers"]
+    if len(items) > current_app.config["BULK_MAX_TRANSFERS"]:
+        return error(f"Batch can have at most {current_app.config['BULK_MAX_TRANSFERS']} transfers.", 413)
+
+    # validate everything with one account query and cached rates
+    rates = rate_cache.rates()
+    known_bids = existing_bids([item.get("target-bid", None) for item in items if isinstance(item, dict) and isinstance(item.get("target-bid", None), str)])
+    results = [None] * len(items)
+    valid, valid_index = list(), list()
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"ok": False, "message": "Transfer must be json object."}
+            continue
+        # other json types are reported as missing input
+        target_bid, currency = item.get("target-bid", None), item.get("currency", None)
+        target_bid = target_bid if isinstance(target_bid, str) else None
+        currency = currency if isinstance(currency, str) else None
+        message = validate_transfer(target_bid, currency, known_bids, rates)
+        amount = parse_amount(item.get("amount", None))
+        if message is None and amount is None:
+            message = "Error in 'amount' input."
+        if message is not None:
+            results[i] = {"ok": False, "message": message}
+            continue
+        valid.append({
+            "target-bid": target_bid,
+            "currency": currency.upper(),
+            "amount": amount,
+            "primary-transfer": bool(item.get("primary-transfer", False))
+        })
+        valid_index.append(i)
+
+    # apply valid transactions
+    if valid:
+        applied = bulk_transfer(session["ba"]["bid"], valid, current_app.config["DB_TRANSACTIONS"])
+        for i, result in zip(valid_index, applied):
+            results[i] = result
+        if any(result["ok"] for result in applied):
+            refresh_account_data()
+
+    for i, result in enumerate(results):
+        result["index"] = i
+    return jsonify({"results": results})
@@ -0,0 +1,68 @@
+import hashlib
+import hmac
+from flask import current_app, session
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+def _serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.secret_key, salt="login-challenge")
+
+def _code_hash(email : str, code : str) -> str:
+    return hmac.new(current_app.secret_key.encode(), f"{email}:{code}".encode(), hashlib.sha256).hexdigest()
+
+def issue_challenge(email : str, code : str) -> str:
+    """create signed login challenge after successful password verification
+
+    Args:
+        email (str): e-mail of verified account
+        code (str): 2 phase authorization code sent to the e-mail
+
+    Returns:
+        str: signed challenge token
+    """
+    return _serializer().dumps({"email": email, "code": _code_hash(email, code)})
+
+def start_challenge(email : str, code : str) -> None:
+    """save new login challenge into (server-side) session
+
+    Args:
+        email (str): e-mail of verified account
+        code (str): 2 phase authorization code sent to the e-mail
+    """
+    session["challenge"] = issue_challenge(email, code)
+    session["challenge-attempts"] = 0
+
+def verify_challenge(email : str, code : str) -> bool:
+    """check 2 phase authorization code against login challenge in session
+    challenge is removed after success, expiration or too many attempts
+
+    Args:
+        email (str): inserted e-mail
+        code (str): inserted code
+
+    Returns:
+        bool: True if the challenge belongs to the e-mail and the code matches else False
+    """
+    token = session.get("challenge", None)
+    if token is None or email is None or code is None:
+        return False
+    try:
+        data = _serializer().loads(token, max_age=current_app.config["CHALLENGE_TTL"])
+    except BadSignature:
+        # also expired signature
+        clear_challenge()
+        return False
+
+    if data["email"] == email and hmac.compare_digest(data["code"], _code_hash(email, code)):
+        clear_challenge()
+        return True
+
+    session["challenge-attempts"] = session.get("challenge-attempts", 0) + 1
+    if session["challenge-attempts"] >= current_app.config["CHALLENGE_ATTEMPTS"]:
+        clear_challenge()
+    return False
+
+def clear_challenge() -> None:
+    """remove login challenge from session
+    """
+    session.pop("challenge", None)
+    session.pop("challenge-attempts", None)
@@ -0,0 +1,70 @@
+from threading import Lock
+import os
+from .repository import get_repository
+
+# ids which are never given to an account ("9999" is the external target in send_transaction)
+RESERVED_BIDS = {9999}
+
+def format_bid(number : int) -> str:
+    """bank account id of the number - at least 4 digits, wider numbers are not cut
+
+    Args:
+        number (int): number of the account
+
+    Returns:
+        str: bank account id
+    """
+    return f"{number:04d}"
+
+class BidAllocator():
+    def __init__(self, name : str = "bid", block_size : int = 100, repository = None):
+        """hi/lo allocator of bank account ids - one atomic counter update reserves a block of ids
+        ids of unused part of a block are skipped after restart
+
+        Args:
+            name (str, optional): name of the counter. Defaults to "bid".
+            block_size (int, optional): number of ids reserved at once. Defaults to 100.
+            repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        """
+        self.name = name
+        self.block_size = block_size
+        self.repository = repository
+        self._next = 0
+        self._end = 0
+        self._lock = Lock()
+
+    def _reserve(self) -> None:
+        repository = get_repository() if self.repository is None else self.repository
+        if self._end == 0:
+            # first block of the process -> counter must be above ids created before the counter existed
+            repository.raise_counter(self.name, repository.max_bid())
+        self._next = repository.reserve_ids(self.name, self.block_size)
+        self._end = self._next + self.block_size
+
+    def allocate(self) -> str:
+        """new unique bank account id
+
+        Returns:
+            str: bank account id
+        """
+        with self._lock:
+            while True:
+                if self._next >= self._end:
+                    self._reserve()
+                number = self._next
+                self._next += 1
+                if number not in RESERVED_BIDS:
+                    return format_bid(number)
+
+    def reset(self) -> None:
+        """forget reserved block (forked process must not use ids of its parent)
+        """
+        self._next = 0
+        self._end = 0
+        self._lock = Lock()
+
+# shared allocator used for new accounts
+bid_allocator = BidAllocator()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=bid_allocator.reset)
@@ -0,0 +1,85 @@
+import click
+from flask.cli import AppGroup
+
+commands = AppGroup("bank", help="Bank maintenance commands.")
+
+def _mongo_database():
+    from .repository import get_repository, MongoRepository
+    repository = get_repository()
+    if not isinstance(repository, MongoRepository):
+        raise click.ClickException("The command needs mongo storage (STORAGE_BACKEND = \"mongo\").")
+    return repository.db
+
+@commands.command("migrate-transactions")
+@click.option("--batch", default=1000, show_default=True, help="Entries in one bulk write.")
+def migrate_transactions_command(batch : int):
+    """move transaction arrays into the history collection"""
+    from .history import migrate_transactions
+    database = _mongo_database()
+    migrated = migrate_transactions(database.transaction, database.history, batch)
+    click.echo(f"Migrated {migrated} transactions.")
+
+@commands.command("ensure-indexes")
+def ensure_indexes_command():
+    """create all declared indexes"""
+    from .indexes import ensure_indexes
+    failed = ensure_indexes(_mongo_database())
+    if failed:
+        raise click.ClickException(f"Indexes can't be created: {', '.join(failed)}")
+    click.echo("All indexes exist.")
+
+@commands.command("audit-indexes")
+def audit_indexes_command():
+    """explain every query shape and fail on collection scan"""
+    from .indexes import audit_queries
+    scans = list()
+    for name, stages in audit_queries(_mongo_database()).items():
+        click.echo(f"{name}: {' <- '.join(stages)}")
+        if "COLLSCAN" in stages:
+            scans.append(name)
+    if scans:
+        raise click.ClickException(f"Collection scan in: {', '.join(scans)}")
+
+@commands.command("backfill-rates")
+@click.option("--start", type=click.DateTime(formats=["%Y-%m-%d"]), required=True, help="First date (yyyy-mm-dd).")
+@click.option("--end", type=click.DateTime(formats=["%Y-%m-%d"]), default=None, help="Last date (yyyy-mm-dd), today if not set.")
+@click.option("--workers", default=4, show_default=True, help="Parallel downloads of yearly files.")
+def backfill_rates_command(start, end, workers : int):
+    """download historical exchange rates into rate history"""
+    from datetime import datetime
+    from .rate_history import backfill
+    saved = backfill(start, end or datetime.now(), workers)
+    click.echo(f"Saved rates of {saved} days.")
+
+@commands.command("onboard")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch", default=1000, show_default=True, help="Customers in one insert.")
+@click.option("--workers", default=None, type=int, help="Hashing processes, number of cpus if not set.")
+@click.option("--checkpoint", default=None, help="Progress file, <path>.checkpoint if not set.")
+@click.option("--restart", is_flag=True, help="Ignore saved progress and start from the first customer.")
+def onboard_command(path : str, batch : int, workers : int, checkpoint : str, restart : bool):
+    """create accounts of customers from CSV or JSONL file"""
+    import os
+    from flask import current_app
+    from .onboarding import onboard
+    checkpoint = checkpoint or f"{path}.checkpoint"
+    if restart and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    def progress(counters : dict):
+        click.echo(f"{counters['processed']} processed, {counters['inserted']} inserted, {counters['skipped']} skipped, {counters['invalid']} invalid ({counters['rate']:.0f} customers/s)")
+
+    try:
+        result = onboard(path, current_app.config["PASSWORD_HASH_METHOD"], workers, batch, checkpoint, progress=progress)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for number, message in result["errors"]:
+        click.echo(f"record {number}: {message}", err=True)
+    click.echo(f"Inserted {result['inserted']} accounts.")
+
+@commands.command("rebuild-summaries")
+@click.option("--bid", default=None, help="Rebuild only one account, all accounts if not set.")
+def rebuild_summaries_command(bid : str):
+    """compute monthly inflow/outflow summaries from whole history"""
+    from .summaries import rebuild_summaries
+    click.echo(f"Rebuilt {rebuild_summaries(bid)} monthly summaries.")
@@ -0,0 +1,99 @@
+from threading import Lock
+import numpy as np
+from .rates import rate_cache
+from . import main_currency
+
+class ConversionEngine():
+    def __init__(self, document : dict):
+        """cross-rate matrix of all currencies from one CNB exchange rate document
+
+        Args:
+            document (dict): exchange rate document - "currency-rates" (rates in main currency) and optional "date"
+        """
+        self.date = document.get("date", None)
+        self.codes = [main_currency] + sorted(code for code in document["currency-rates"] if code != main_currency)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        # value of one unit of every currency in main currency
+        unit_value = np.array([1.0] + [document["currency-rates"][code] for code in self.codes[1:]], dtype=np.float64)
+        # matrix[i, j] = units of currency j for one unit of currency i
+        self.matrix = unit_value[:, np.newaxis] / unit_value[np.newaxis, :]
+
+    def convert(self, amount : float, source : str, target : str = main_currency) -> float:
+        """convert amount between two currencies
+
+        Args:
+            amount (float): amount in source currency
+            source (str): source currency code
+            target (str, optional): target currency code. Defaults to main_currency.
+
+        Raises:
+            KeyError: if any of the currencies is not known
+
+        Returns:
+            float: amount in target currency
+        """
+        return float(amount * self.matrix[self.index[source], self.index[target]])
+
+    def to_vectors(self, balances : list) -> np.ndarray:
+        """transform balance dicts into matrix (one row per balance), unknown currencies are ignored
+
+        Args:
+            balances (list[dict]): "currency-code": amount
+
+        Returns:
+            np.ndarray: array with shape (number of balances, number of currencies)
+        """
+        vectors = np.zeros((len(balances), len(self.codes)), dtype=np.float64)
+        index = self.index
+        for row, balance in enumerate(balances):
+            for code, amount in balance.items():
+                column = index.get(code, None)
+                if column is not None:
+                    vectors[row, column] = amount
+        return vectors
+
+    def value_many(self, balances, target : str = main_currency) -> np.ndarray:
+        """value many balances in one currency with one matrix multiplication
+
+        Args:
+            balances (list[dict] | np.ndarray): balance dicts or matrix from to_vectors
+            target (str, optional): target currency code. Defaults to main_currency.
+
+        Returns:
+            np.ndarray: value of every balance
+        """
+        vectors = balances if isinstance(balances, np.ndarray) else self.to_vectors(balances)
+        return vectors @ self.matrix[:, self.index[target]]
+
+    def value(self, balance : dict, target : str = main_currency) -> float:
+        """value of multi-currency balance in one currency
+
+        Args:
+            balance (dict): "currency-code": amount
+            target (str, optional): target currency code. Defaults to main_currency.
+
+        Returns:
+            float: value in target currency
+        """
+        return float(self.value_many([balance], target)[0])
+
+_engine = None
+_engine_lock = Lock()
+
+def get_engine() -> ConversionEngine:
+    """conversion engine of current exchange rates (built once per rate date)
+
+    Returns:
+        ConversionEngine: engine (None if there are no exchange rates)
+    """
+    global _engine
+    document = rate_cache.get()
+    if document is None:
+        return None
+    engine = _engine
+    if engine is not None and engine.date == document["date"]:
+        return engine
+    with _engine_lock:
+        if _engine is None or _engine.date != document["date"]:
+            _engine = ConversionEngine(document)
+        return _engine
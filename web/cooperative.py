@@ -0,0 +1,27 @@
+import sys
+
+def is_cooperative() -> bool:
+    """check if the process runs in gevent worker (sockets, threads and locks are patched)
+
+    Returns:
+        bool: True if blocking i/o only suspends the current greenlet else False
+    """
+    monkey = sys.modules.get("gevent.monkey", None)
+    return monkey is not None and monkey.is_module_patched("socket")
+
+def run_blocking(function, *args, **kwargs):
+    """call CPU-bound function (password hashing) - in gevent worker in native thread pool, so other requests of the process continue
+    in sync worker it is called directly
+
+    Args:
+        function (callable): function
+        *args: positional arguments
+        **kwargs: keyword arguments
+
+    Returns:
+        result of the function (exceptions are raised in the caller)
+    """
+    if not is_cooperative():
+        return function(*args, **kwargs)
+    from gevent import get_hub
+    return get_hub().threadpool.apply(function, args, kwargs)
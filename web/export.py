@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import csv
+import io
+import json
+from .objects import TransactionRow
+from .repository import get_repository
+
+# columns of exported rows (the same as TransactionList.to_output)
+COLUMNS = ("date", "target-bid", "currency-code", "amount")
+
+# rows written at once
+CHUNK_SIZE = 200
+
+def parse_range(date_from : str, date_to : str) -> tuple:
+    """parse date range of export (both days are included)
+
+    Args:
+        date_from (str): first day yyyy-mm-dd or None
+        date_to (str): last day yyyy-mm-dd or None
+
+    Raises:
+        ValueError: if any date is not valid
+
+    Returns:
+        tuple: (start, end) - end is exclusive, None if not set
+    """
+    start = datetime.strptime(date_from, "%Y-%m-%d") if date_from else None
+    end = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1) if date_to else None
+    return start, end
+
+def export_rows(bid : str, start : datetime = None, end : datetime = None, currency : str = None, repository = None):
+    """formatted transactions of the account, newest first (read from database in batches)
+
+    Args:
+        bid (str): bank account id
+        start (datetime, optional): first date. Defaults to None.
+        end (datetime, optional): exclusive last date. Defaults to None.
+        currency (str, optional): currency code. Defaults to None (all currencies).
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Yields:
+        dict: formated transaction
+    """
+    repository = get_repository() if repository is None else repository
+    for entry in repository.iter_history(bid, start, end, currency):
+        yield TransactionRow.from_entry(entry).to_dict()
+
+def _chunks(rows, size : int = CHUNK_SIZE):
+    chunk = list()
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = list()
+    if chunk:
+        yield chunk
+
+def csv_stream(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # header of empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def json_stream(rows):
+    yield "["
+    separator = ""
+    for chunk in _chunks(rows):
+        yield separator + ",".join(json.dumps(row) for row in chunk)
+        separator = ","
+    yield "]"
+
+def ndjson_stream(rows):
+    for chunk in _chunks(rows):
+        yield "".join(json.dumps(row) + "\n" for row in chunk)
+
+# format -> (mimetype, file extension, writer)
+FORMATS = {
+    "csv": ("text/csv", "csv", csv_stream),
+    "json": ("application/json", "json", json_stream),
+    "ndjson": ("application/x-ndjson", "ndjson", ndjson_stream)
+}
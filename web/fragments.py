@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from threading import Lock
+from flask import render_template
+from markupsafe import Markup
+
+class FragmentCache():
+    def __init__(self, maxsize : int = 10000):
+        """in-process LRU cache of rendered template fragments
+
+        Args:
+            maxsize (int, optional): maximal number of fragments. Defaults to 10000.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._fragments = OrderedDict()
+        self._lock = Lock()
+
+    def render(self, template : str, key : tuple, **context) -> Markup:
+        """rendered fragment - from cache if the key was rendered before
+
+        Args:
+            template (str): fragment template
+            key (tuple): everything the fragment depends on (None -> rendered every time)
+            **context: template variables
+
+        Returns:
+            Markup: html of the fragment
+        """
+        if key is None:
+            return Markup(render_template(template, **context))
+        cache_key = (template, key)
+        with self._lock:
+            html = self._fragments.get(cache_key, None)
+            if html is not None:
+                self.hits += 1
+                self._fragments.move_to_end(cache_key)
+                return html
+            self.misses += 1
+        # rendered outside of the lock (the same fragment may be rendered twice)
+        html = Markup(render_template(template, **context))
+        with self._lock:
+            self._fragments[cache_key] = html
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+        return html
+
+    def clear(self) -> None:
+        """drop all fragments
+        """
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self) -> dict:
+        """cache counters
+
+        Returns:
+            dict: number of hits, misses and stored fragments
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._fragments)}
+
+# shared cache used by index page
+fragment_cache = FragmentCache()
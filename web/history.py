@@ -0,0 +1,162 @@
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from .objects import format_date
+from .repository import get_repository
+
+def make_entry(bid : str, target_bid : str, currency : str, amount : str, date : datetime = None, version : int = None) -> dict:
+    """create one history entry (not saved)
+
+    Args:
+        bid (str): bank account id
+        target_bid (str): bank account id (target)
+        currency (str): currency
+        amount (str): formatted amount with sign
+        date (datetime, optional): date of the transaction. Defaults to None (now).
+        version (int, optional): balance version written by the same balance change. Defaults to None (not set).
+
+    Returns:
+        dict: entry
+    """
+    date = datetime.now() if date is None else date
+    entry = {
+        "bid": bid,
+        "target-bid": target_bid,
+        "currency-code": currency,
+        "amount": amount,
+        "date": date,
+        # formatted once at write time
+        "date-display": format_date(date)
+    }
+    if version is not None:
+        entry["version"] = version
+    return entry
+
+def add_entry(bid : str, target_bid : str, currency : str, amount : str, date : datetime = None, repository = None, db_session = None, version : int = None) -> dict:
+    """insert one transaction into account history
+
+    Args:
+        bid (str): bank account id
+        target_bid (str): bank account id (target)
+        currency (str): currency
+        amount (str): formatted amount with sign
+        date (datetime, optional): date of the transaction. Defaults to None (now).
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        db_session (ClientSession, optional): mongo session of running transaction. Defaults to None.
+        version (int, optional): balance version written by the same balance change. Defaults to None (not set).
+
+    Returns:
+        dict: inserted entry
+    """
+    repository = get_repository() if repository is None else repository
+    entry = make_entry(bid, target_bid, currency, amount, date, version)
+    repository.add_entries([entry], db_session)
+    return entry
+
+def encode_cursor(entry : dict) -> str:
+    """create pagination cursor pointing after the entry
+
+    Args:
+        entry (dict): last entry of the page
+
+    Returns:
+        str: cursor
+    """
+    return f"{entry['date'].strftime('%Y%m%d%H%M%S%f')}-{entry['_id']}"
+
+def decode_cursor(cursor : str) -> tuple:
+    """parse pagination cursor
+
+    Args:
+        cursor (str): cursor created by encode_cursor
+
+    Raises:
+        ValueError: if the cursor is not valid
+
+    Returns:
+        tuple: (date, ObjectId)
+    """
+    try:
+        date, oid = cursor.split("-")
+        return datetime.strptime(date, "%Y%m%d%H%M%S%f"), ObjectId(oid)
+    except (InvalidId, TypeError, ValueError, AttributeError):
+        raise ValueError("Invalid cursor.")
+
+def load_page(bid : str, cursor : str = None, limit : int = 20, repository = None) -> tuple:
+    """load one page of account history, newest first (keyset pagination)
+
+    Args:
+        bid (str): bank account id
+        cursor (str, optional): cursor of the previous page. Defaults to None (first page).
+        limit (int, optional): page size. Defaults to 20.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Raises:
+        ValueError: if the cursor is not valid
+
+    Returns:
+        tuple: (list of entries newest first, cursor of the next page or None)
+    """
+    repository = get_repository() if repository is None else repository
+    before = decode_cursor(cursor) if cursor is not None else None
+    entries = repository.history_page(bid, before, limit + 1)
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = encode_cursor(entries[-1])
+    return entries, next_cursor
+
+def load_newer(bid : str, version : int, limit : int = 20, repository = None) -> list:
+    """load entries written after the balance version (high-water mark), newest first
+    versions of one account only increase and are written in the same transaction as the entry,
+    so an entry with date older than the mark (other worker, clock skew) is not skipped
+
+    Args:
+        bid (str): bank account id
+        version (int): the highest known balance version
+        limit (int, optional): maximal number of entries. Defaults to 20.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        list[dict]: entries newest first
+    """
+    repository = get_repository() if repository is None else repository
+    return repository.history_newer(bid, version, limit)
+
+def entries_version(entries : list) -> int:
+    """high-water mark of loaded entries
+
+    Args:
+        entries (list[dict]): history entries
+
+    Returns:
+        int: the highest balance version of the entries (0 for entries written before versions were stored)
+    """
+    return max((entry.get("version", 0) for entry in entries), default=0)
+
+def migrate_transactions(source, target, batch : int = 1000) -> int:
+    """move transaction arrays (one document per bid) into history collection
+    entries of a previous unfinished run are replaced, so the migration can be run again after a failure
+
+    Args:
+        source (Collection): collection with transaction arrays
+        target (Collection): history collection
+        batch (int, optional): number of entries in one insert. Defaults to 1000.
+
+    Returns:
+        int: number of migrated entries
+    """
+    migrated = 0
+    for doc in source.find({"transaction-list.0": {"$exists": True}}):
+        entries = [
+            make_entry(doc["bid"], obj["target-bid"], obj["currency-code"], obj["amount"], obj["date"])
+            for obj in doc["transaction-list"]
+        ]
+        # array entries are older than entries written by the application
+        target.delete_many({"bid": doc["bid"], "date": {"$lte": max(e["date"] for e in entries)}})
+        for i in range(0, len(entries), batch):
+            target.insert_many(entries[i:i + batch], ordered=False)
+        migrated += len(entries)
+        # array is not needed anymore
+        source.update_one({"_id": doc["_id"]}, {"$set": {"transaction-list": []}})
+    return migrated
@@ -0,0 +1,65 @@
+from datetime import timedelta
+import secrets
+from flask import request
+from .repository import get_repository
+from .sessions import _utcnow
+
+# longer keys are ignored
+MAX_KEY_LENGTH = 128
+
+def new_key() -> str:
+    """create idempotency key for a form (new key for every rendered page)
+
+    Returns:
+        str: random key
+    """
+    return secrets.token_urlsafe(16)
+
+def request_key() -> str:
+    """idempotency key of current request - "Idempotency-Key" header or hidden form field
+
+    Returns:
+        str: key or None if the request has no valid key
+    """
+    key = request.headers.get("Idempotency-Key", None) or request.form.get("idempotency_key", None)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return key
+
+def claim_key(bid : str, key : str, ttl : float, repository = None) -> dict:
+    """reserve the key for a new transaction of the account
+
+    Args:
+        bid (str): bank account id (keys of different accounts do not collide)
+        key (str): idempotency key
+        ttl (float): seconds to remember the key
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        dict: stored record of the same key ("result" is None while it is processed) or None if the key is new
+    """
+    repository = get_repository() if repository is None else repository
+    return repository.claim_key(f"{bid}:{key}", _utcnow() + timedelta(seconds=ttl))
+
+def finish_key(bid : str, key : str, result : dict, repository = None) -> None:
+    """save result of the transaction - replays of the key get it
+
+    Args:
+        bid (str): bank account id
+        key (str): idempotency key
+        result (dict): "ok" and "message"
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+    """
+    repository = get_repository() if repository is None else repository
+    repository.finish_key(f"{bid}:{key}", result)
+
+def release_key(bid : str, key : str, repository = None) -> None:
+    """forget unfinished key (the transaction failed, retry with the key is allowed)
+
+    Args:
+        bid (str): bank account id
+        key (str): idempotency key
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+    """
+    repository = get_repository() if repository is None else repository
+    repository.release_key(f"{bid}:{key}")
@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from . import exchange_id
+
+logger = logging.getLogger(__name__)
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "account": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("bid", ASCENDING)], {"unique": True})
+    ],
+    "balance": [
+        ([("bid", ASCENDING)], {"unique": True})
+    ],
+    "transaction": [
+        ([("bid", ASCENDING)], {"unique": True})
+    ],
+    "history": [
+        ([("bid", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("bid", ASCENDING), ("version", DESCENDING)], {})
+    ],
+    "rate_history": [
+        ([("date", DESCENDING)], {"unique": True})
+    ],
+    "session": [
+        ([("expires", ASCENDING)], {"expireAfterSeconds": 0})
+    ],
+    "summary": [
+        ([("bid", ASCENDING), ("month", DESCENDING)], {})
+    ],
+    "idempotency": [
+        ([("expires", ASCENDING)], {"expireAfterSeconds": 0})
+    ],
+    "throttle": [
+        ([("expires", ASCENDING)], {"expireAfterSeconds": 0})
+    ]
+}
+
+# query shapes used by routes: name -> (collection, filter, sort)
+QUERY_SHAPES = {
+    "account by email": ("account", {"email": "audit@audit.com"}, None),
+    "account by bid": ("account", {"bid": "0000"}, None),
+    "balance by bid": ("balance", {"bid": "0000"}, None),
+    "transaction by bid": ("transaction", {"bid": "0000"}, None),
+    "exchange rates": ("exchange", {"_id": exchange_id}, None),
+    "history page": ("history", {"bid": "0000"}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    "history page after cursor": ("history", {"bid": "0000", "$or": [{"date": {"$lt": datetime(2000, 1, 1)}}, {"date": datetime(2000, 1, 1), "_id": {"$lt": ObjectId("000000000000000000000000")}}]}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    "history newer than version": ("history", {"bid": "0000", "version": {"$gt": 0}}, [("version", DESCENDING)]),
+    "history export": ("history", {"bid": "0000", "date": {"$gte": datetime(2000, 1, 1), "$lt": datetime(2000, 2, 1)}, "currency-code": "CZK"}, [("date", DESCENDING), ("_id", DESCENDING)]),
+    "rates on date": ("rate_history", {"date": {"$lte": datetime(2000, 1, 1)}}, [("date", DESCENDING)]),
+    "session by id": ("session", {"_id": "audit"}, None),
+    "idempotency key": ("idempotency", {"_id": "audit"}, None),
+    "throttle bucket": ("throttle", {"_id": "audit"}, None),
+    "summaries by bid": ("summary", {"bid": "0000"}, [("month", DESCENDING)])
+}
+
+def ensure_indexes(database) -> list:
+    """create all declared indexes (existing indexes are left untouched)
+
+    Args:
+        database (Database): mongo database
+
+    Returns:
+        list[str]: names of indexes which could not be created
+    """
+    failed = list()
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                database[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate values for unique index
+                name = f"{collection}." + "_".join(key for key, _ in keys)
+                logger.error("index %s can't be created: %s", name, e)
+                failed.append(name)
+    return failed
+
+def plan_stages(plan : dict) -> list:
+    """collect stage names of query plan (recursively)
+
+    Args:
+        plan (dict): query plan from explain()
+
+    Returns:
+        list[str]: stage names
+    """
+    stages = list()
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+def audit_queries(database) -> dict:
+    """explain every query shape used by routes
+
+    Args:
+        database (Database): mongo database
+
+    Returns:
+        dict: query name -> list of stages of the winning plan
+    """
+    result = dict()
+    for name, (collection, query, sort) in QUERY_SHAPES.items():
+        cursor = database[collection].find(query).limit(1)
+        if sort is not None:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        result[name] = plan_stages(explain["queryPlanner"]["winningPlan"])
+    return result
@@ -0,0 +1,202 @@
+from queue import Queue, Full
+from threading import Lock, Thread
+import logging
+import smtplib
+from .metrics import span_duration, span_errors
+from . import ggemail, ggpass
+
+logger = logging.getLogger(__name__)
+
+class SMTPTransport():
+    def __init__(self, host : str, port : int, username : str = None, password : str = None, use_ssl : bool = True, timeout : float = 10):
+        """SMTP transport keeping one authenticated connection open
+
+        Args:
+            host (str): SMTP server host
+            port (int): SMTP server port
+            username (str, optional): login username (no login if None). Defaults to None.
+            password (str, optional): login password. Defaults to None.
+            use_ssl (bool, optional): True -> SMTP over SSL else plain SMTP (local debug server). Defaults to True.
+            timeout (float, optional): socket timeout in seconds. Defaults to 10.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._server = None
+
+    def connect(self) -> None:
+        """open and authenticate new connection
+        """
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        try:
+            with span_duration.time("smtp_connect"):
+                server = smtp_class(self.host, self.port, timeout=self.timeout)
+                if self.username is not None:
+                    server.login(self.username, self.password)
+        except Exception:
+            span_errors.inc("smtp_connect")
+            raise
+        self._server = server
+
+    def send(self, sender : str, recipient : str, message : str) -> None:
+        """send message - reconnect once if the open connection was dropped
+
+        Args:
+            sender (str): sender e-mail
+            recipient (str): recipient e-mail
+            message (str): whole message with headers
+        """
+        if self._server is None:
+            self.connect()
+        try:
+            self._server.sendmail(sender, recipient, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            self.close()
+            self.connect()
+            self._server.sendmail(sender, recipient, message)
+
+    def close(self) -> None:
+        """close the connection
+        """
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+
+class MailQueue():
+    def __init__(self, transport_factory, workers : int = 2, maxsize : int = 1000):
+        """bounded outbound mail queue with worker threads
+
+        Args:
+            transport_factory (callable): returns new transport (every worker has its own)
+            workers (int, optional): number of worker threads. Defaults to 2.
+            maxsize (int, optional): maximal number of waiting messages. Defaults to 1000.
+        """
+        self.transport_factory = transport_factory
+        self.workers = workers
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queue = Queue(maxsize)
+        self._threads = list()
+        self._lock = Lock()
+
+    def configure(self, transport_factory = None, workers : int = None, maxsize : int = None) -> None:
+        """change queue settings (used for worker threads started afterwards)
+
+        Args:
+            transport_factory (callable, optional): returns new transport. Defaults to None (unchanged).
+            workers (int, optional): number of worker threads. Defaults to None (unchanged).
+            maxsize (int, optional): maximal number of waiting messages. Defaults to None (unchanged).
+        """
+        with self._lock:
+            if transport_factory is not None:
+                self.transport_factory = transport_factory
+            if workers is not None:
+                self.workers = workers
+            if maxsize is not None:
+                self._queue.maxsize = maxsize
+
+    def send(self, sender : str, recipient : str, message : str) -> bool:
+        """put message into the queue (does not wait for sending)
+
+        Args:
+            sender (str): sender e-mail
+            recipient (str): recipient e-mail
+            message (str): whole message with headers
+
+        Returns:
+            bool: True if the message was queued else False (queue is full)
+        """
+        self.start()
+        try:
+            self._queue.put_nowait((sender, recipient, message))
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def start(self) -> None:
+        """start worker threads (does nothing if they are already running)
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = Thread(target=self._run, name=f"mail-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout : float = None) -> None:
+        """send all queued messages and stop worker threads
+
+        Args:
+            timeout (float, optional): seconds to wait for every thread. Defaults to None.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, list()
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def join(self) -> None:
+        """wait until all queued messages are processed
+        """
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """queue counters
+
+        Returns:
+            dict: number of sent, failed, dropped and waiting messages
+        """
+        with self._lock:
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "queued": self._queue.qsize()
+            }
+
+    def _run(self) -> None:
+        transport = self.transport_factory()
+        try:
+            while True:
+                item = self._queue.get()
+                try:
+                    if item is None:
+                        return
+                    # whole SMTP time including (re)connect
+                    with span_duration.time("smtp_send"):
+                        transport.send(*item)
+                    with self._lock:
+                        self.sent += 1
+                except Exception as e:
+                    span_errors.inc("smtp_send")
+                    logger.warning("sending e-mail to %s failed: %s", item[1], e)
+                    transport.close()
+                    with self._lock:
+                        self.failed += 1
+                finally:
+                    self._queue.task_done()
+        finally:
+            transport.close()
+
+def gmail_transport() -> SMTPTransport:
+    """transport to Gmail account of the application
+
+    Returns:
+        SMTPTransport: transport
+    """
+    return SMTPTransport("smtp.gmail.com", 465, ggemail, ggpass)
+
+# shared queue used by routes
+mail_queue = MailQueue(gmail_transport)
@@ -0,0 +1,241 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock
+import time
+from flask import Blueprint, Response, current_app, g, request
+from pymongo import monitoring
+
+# seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _labels(names : tuple, values : tuple) -> str:
+    pairs = [f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(names, values)]
+    return ",".join(pairs)
+
+class Counter():
+    def __init__(self, name : str, documentation : str, labelnames : tuple = ()):
+        """monotonic counter with labels
+
+        Args:
+            name (str): metric name
+            documentation (str): help text
+            labelnames (tuple, optional): label names. Defaults to ().
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = dict()
+        self._lock = Lock()
+
+    def inc(self, *labels, amount : float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.labelnames, labels)}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+class Histogram():
+    def __init__(self, name : str, documentation : str, labelnames : tuple = (), buckets : tuple = DEFAULT_BUCKETS):
+        """cumulative histogram with labels (Prometheus semantics)
+
+        Args:
+            name (str): metric name
+            documentation (str): help text
+            labelnames (tuple, optional): label names. Defaults to ().
+            buckets (tuple, optional): upper bounds in ascending order. Defaults to DEFAULT_BUCKETS.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values = dict()
+        self._lock = Lock()
+
+    def observe(self, value : float, *labels) -> None:
+        with self._lock:
+            counts = self._values.get(labels, None)
+            if counts is None:
+                counts = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            counts = self._values.get(labels, None)
+            return sum(counts[0]) if counts is not None else 0
+
+    @contextmanager
+    def time(self, *labels):
+        """measure duration of the with block (also if it raises)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._values.items()):
+                prefix = _labels(self.labelnames, labels)
+                prefix = prefix + "," if prefix else ""
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                suffix = f"{{{prefix[:-1]}}}" if prefix else ""
+                lines.append(f"{self.name}_sum{suffix} {total}")
+                lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class Registry():
+    def __init__(self):
+        """metrics of one process (every gunicorn worker has its own)
+        """
+        self.metrics = list()
+        self.collectors = list()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """register function returning current values - {name: (help, value)} for gauges, {name: (help, value, "counter")} for counters
+        """
+        self.collectors.append(function)
+        return function
+
+    def render(self) -> str:
+        """all metrics in Prometheus text format
+
+        Returns:
+            str: exposition text
+        """
+        lines = list()
+        for metric in self.metrics:
+            lines += metric.render()
+        for function in self.collectors:
+            for name, (documentation, value, *kind) in function().items():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind[0] if kind else 'gauge'}", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+request_duration = registry.register(Histogram("http_request_duration_seconds", "Duration of HTTP requests.", ("endpoint", "method", "status")))
+mongo_duration = registry.register(Histogram("mongo_command_duration_seconds", "Duration of MongoDB commands.", ("command", "collection")))
+mongo_errors = registry.register(Counter("mongo_command_errors_total", "Failed MongoDB commands.", ("command", "collection")))
+span_duration = registry.register(Histogram("span_duration_seconds", "Duration of instrumented calls (mail, CNB download, password hashing).", ("span",)))
+span_errors = registry.register(Counter("span_errors_total", "Instrumented calls which raised an exception.", ("span",)))
+
+def timed(span : str):
+    """decorator recording duration and exceptions of the function as span
+
+    Args:
+        span (str): span name
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                span_errors.inc(span)
+                raise
+            finally:
+                span_duration.observe(time.perf_counter() - start, span)
+        return wrapper
+    return decorator
+
+# MONGO
+
+class CommandTimer(monitoring.CommandListener):
+    def __init__(self):
+        """pymongo command listener recording duration of every command
+        """
+        # (connection, request id) -> collection name
+        self._started = dict()
+        self._lock = Lock()
+
+    def started(self, event) -> None:
+        collection = event.command.get(event.command_name, "")
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event) -> str:
+        with self._lock:
+            return self._started.pop((event.connection_id, event.request_id), "")
+
+    def succeeded(self, event) -> None:
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name, self._finish(event))
+
+    def failed(self, event) -> None:
+        collection = self._finish(event)
+        mongo_duration.observe(event.duration_micros / 1e6, event.command_name, collection)
+        mongo_errors.inc(event.command_name, collection)
+
+# HTTP
+
+metrics = Blueprint("metrics", __name__)
+
+def init_app(app) -> None:
+    """record duration of every request and add /metrics route
+
+    Args:
+        app (Flask): application
+    """
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_duration(response):
+        start = g.pop("request_start", None)
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            request_duration.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+        return response
+
+    app.register_blueprint(metrics)
+
+@metrics.route("/metrics", methods=["GET"])
+def metrics_page():
+    """route for metrics in Prometheus text format (METRICS_TOKEN -> bearer token is required)
+
+    Returns:
+        Response: exposition text
+    """
+    token = current_app.config.get("METRICS_TOKEN", None)
+    if token is not None and request.headers.get("Authorization", "") != f"Bearer {token}":
+        return Response("Unauthorized.\n", status=401, mimetype="text/plain")
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+@registry.collector
+def queue_and_cache_stats() -> dict:
+    from .mail import mail_queue
+    from .rates import rate_cache
+    from .fragments import fragment_cache
+    mail = mail_queue.stats()
+    cache = rate_cache.stats()
+    fragments = fragment_cache.stats()
+    return {
+        "mail_sent_total": ("Sent e-mails.", mail["sent"], "counter"),
+        "mail_failed_total": ("E-mails which could not be sent.", mail["failed"], "counter"),
+        "mail_dropped_total": ("E-mails dropped because the queue was full.", mail["dropped"], "counter"),
+        "mail_queued": ("E-mails waiting in the queue.", mail["queued"]),
+        "rate_cache_hits_total": ("Exchange rate reads served from cache.", cache["hits"], "counter"),
+        "rate_cache_misses_total": ("Exchange rate reads from storage.", cache["misses"], "counter"),
+        "fragment_cache_hits_total": ("Index page fragments served from cache.", fragments["hits"], "counter"),
+        "fragment_cache_misses_total": ("Index page fragments rendered.", fragments["misses"], "counter")
+    }
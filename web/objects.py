@@ -1,10 +1,23 @@
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime
+from functools import lru_cache
 import math
+from .bids import bid_allocator
 
-class BankAccount():
-    bid = 1
+@lru_cache(maxsize=None)
+def hash_prefix(method : str) -> str:
+    """full method of werkzeug hashes - short names are expanded with default parameters ("scrypt" -> "scrypt:32768:8:1")
+    computed once per method (one hash)
+
+    Args:
+        method (str): werkzeug hash method
+
+    Returns:
+        str: method part of the hash (before the first "$")
+    """
+    return generate_password_hash("", method).split("$", 1)[0]
 
+class BankAccount():
     def __init__(self, firstname : str, surname : str, password : str, email : str, bid : str = None):
         """bank account object
 
@@ -13,11 +26,10 @@ class BankAccount():
             surname (str): surname
             password (str): hashed password
             email (str): e-mail
-            bid (str, optional): bank account id. Defaults to None.
+            bid (str, optional): bank account id. Defaults to None (new id from bid_allocator).
         """
         if bid is None:
-            self.bid = f"{BankAccount.bid:04}"
-            BankAccount.bid += 1
+            self.bid = bid_allocator.allocate()
         else:
             self.bid = bid
         self.firstname = firstname
@@ -87,6 +99,30 @@ class BankAccount():
             bool: True if the passwords are matched else False
         """
         return check_password_hash(self.password, password)
+
+    def needs_rehash(self, method : str) -> bool:
+        """check if the password hash was made with different hash parameters
+
+        Args:
+            method (str): werkzeug hash method, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+
+        Returns:
+            bool: True if the hash should be replaced else False
+        """
+        return not self.password.startswith(f"{hash_prefix(method)}$")
+
+    @staticmethod
+    def hash_password(password : str, method : str = "scrypt") -> str:
+        """hash password
+
+        Args:
+            password (str): plain password
+            method (str, optional): werkzeug hash method with parameters. Defaults to "scrypt".
+
+        Returns:
+            str: hashed password
+        """
+        return generate_password_hash(password, method)
         
     # email
     
@@ -101,33 +137,113 @@ class BankAccount():
         else:
             raise ValueError("E-mail format is not valid.")
 
+def format_date(date : datetime) -> str:
+    """format transaction date for output
+
+    Args:
+        date (datetime): date
+
+    Returns:
+        str: date in dd.mm.yyyy hh:mm:ss format
+    """
+    # format has no time zone fields - aware dates are formatted without replace(tzinfo=None)
+    return date.strftime("%d.%m.%Y %H:%M:%S")
+
+class TransactionRow():
+    __slots__ = ("target_bid", "currency_code", "amount", "date", "_date_display")
+
+    # output keys -> attributes
+    keys = {"target-bid": "target_bid", "currency-code": "currency_code", "amount": "amount", "date": "date_display"}
+
+    def __init__(self, target_bid : str, currency_code : str, amount : str, date : datetime, date_display : str = None):
+        """one transaction of transaction list
+
+        Args:
+            target_bid (str): bank account id (target)
+            currency_code (str): currency
+            amount (str): formatted amount with sign
+            date (datetime): date of the transaction
+            date_display (str, optional): formatted date (computed on first use if None). Defaults to None.
+        """
+        self.target_bid = target_bid
+        self.currency_code = currency_code
+        self.amount = amount
+        self.date = date
+        self._date_display = date_display
+
+    @classmethod
+    def from_entry(cls, obj : dict) -> "TransactionRow":
+        """create row from database entry (uses "date-display" if it was stored at write time)
+
+        Args:
+            obj (dict): transaction entry
+
+        Returns:
+            TransactionRow: row
+        """
+        return cls(obj["target-bid"], obj["currency-code"], obj["amount"], obj["date"], obj.get("date-display", None))
+
+    @property
+    def date_display(self) -> str:
+        if self._date_display is None:
+            self._date_display = format_date(self.date)
+        return self._date_display
+
+    def __getitem__(self, key : str):
+        # rows can be used in templates the same way as output dicts
+        return getattr(self, TransactionRow.keys[key])
+
+    def to_dict(self) -> dict:
+        """transform row to output format
+
+        Returns:
+            dict: formated transaction
+        """
+        return {
+            "target-bid": self.target_bid,
+            "currency-code": self.currency_code,
+            "amount": self.amount,
+            "date": self.date_display
+        }
+
 class TransactionList():
     def __init__(self, transaction_list):
         """bank account transaction list
 
         Args:
-            transaction_list (list[dict]): list of transactions
+            transaction_list (list[dict]): list of transactions (oldest first)
         """
         self.transaction_list = transaction_list
 
+    def __len__(self) -> int:
+        return len(self.transaction_list)
+
+    def __iter__(self):
+        """iterate transactions newest first without copying the list
+
+        Yields:
+            TransactionRow: transaction
+        """
+        for obj in reversed(self.transaction_list):
+            yield TransactionRow.from_entry(obj)
+
     def to_output(self):
         """transform transaction list to specific format
 
         Returns:
             list[dict]: list with formated transactions
         """
-        mod_transaction_list = list()
-        for obj in self.transaction_list:
-            mod_transaction_list.append(
-                {
+        # dicts are built directly - entries without stored "date-display" are not slower than before TransactionRow
+        output = list()
+        for obj in reversed(self.transaction_list):
+            date_display = obj.get("date-display", None)
+            output.append({
                 "target-bid": obj["target-bid"],
                 "currency-code": obj["currency-code"],
                 "amount": obj["amount"],
-                "date": datetime.strftime(obj["date"].replace(tzinfo=None), "%d.%m.%Y %H:%M:%S")
-                }
-            )
-        mod_transaction_list.reverse()
-        return mod_transaction_list
+                "date": format_date(obj["date"]) if date_display is None else date_display
+            })
+        return output
 
 class CurrencyBalance():
     def __init__(self, currency_balance : dict):
@@ -137,14 +253,26 @@ class CurrencyBalance():
             currency_balance (dict): "currency-code": amount
         """
         self.currency_balance = currency_balance
+        self._output = None
+
+    @staticmethod
+    def format_amount(value : float) -> str:
+        """format balance rounded down to two decimal places
+
+        Args:
+            value (float): amount
+
+        Returns:
+            str: formated amount
+        """
+        return f"{math.floor(value * 100) / 100:.2f}"
 
     def to_output(self) -> dict:
-        """transform currency balances to specific format
+        """transform currency balances to specific format (computed once)
 
         Returns:
             dict: dict with formated currency balances
         """
-        mod_currency_balance = dict()
-        for key, value in self.currency_balance.items():
-            mod_currency_balance[key] = f"{math.floor(value * 100) / 100:.2f}"
-        return mod_currency_balance
\ No newline at end of file
+        if self._output is None:
+            self._output = {key: CurrencyBalance.format_amount(value) for key, value in self.currency_balance.items()}
+        return self._output
@@ -0,0 +1,156 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+import csv
+import json
+import os
+import time
+from .objects import BankAccount
+from .bids import bid_allocator
+from .repository import get_repository
+from . import main_currency
+
+FIELDS = ("firstname", "surname", "email", "password")
+
+def read_customers(path : str, skip : int = 0):
+    """stream customers from CSV (header firstname,surname,email,password[,bid]) or JSONL file
+
+    Args:
+        path (str): .csv, .jsonl or .ndjson file
+        skip (int, optional): number of records to skip (already processed). Defaults to 0.
+
+    Yields:
+        tuple: (record number starting with 1, dict) - dict is None if the line is not valid json
+    """
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if path.endswith((".jsonl", ".ndjson")):
+            records = (line for line in file if line.strip())
+            for number, line in enumerate(records, 1):
+                if number <= skip:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                yield number, record if isinstance(record, dict) else None
+        else:
+            for number, record in enumerate(csv.DictReader(file), 1):
+                if number > skip:
+                    yield number, record
+
+def validate_customer(record : dict) -> BankAccount:
+    """check customer with BankAccount setters
+
+    Args:
+        record (dict): customer - firstname, surname, email, plain password and optional bid
+
+    Raises:
+        ValueError: if any field is missing or not valid
+
+    Returns:
+        BankAccount: account with plain password (bid "new" if it is not in the record)
+    """
+    if record is None:
+        raise ValueError("Line is not valid json.")
+    missing = [field for field in FIELDS if not isinstance(record.get(field, None), str)]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}.")
+    # id is allocated only for valid customers
+    return BankAccount(record["firstname"], record["surname"], record["password"], record["email"], record.get("bid", None) or "new")
+
+def load_checkpoint(path : str, source : str) -> dict:
+    """progress of previous run of the same source file
+
+    Args:
+        path (str): checkpoint file
+        source (str): customer file
+
+    Returns:
+        dict: counters - processed, inserted, skipped, invalid (zeros if there is no checkpoint)
+    """
+    empty = {"source": os.path.abspath(source), "processed": 0, "inserted": 0, "skipped": 0, "invalid": 0}
+    if path is None or not os.path.exists(path):
+        return empty
+    with open(path, "r", encoding="utf-8") as file:
+        checkpoint = json.load(file)
+    if checkpoint.get("source", None) != empty["source"]:
+        raise ValueError(f"Checkpoint {path} belongs to other file ({checkpoint.get('source', None)}).")
+    return checkpoint
+
+def save_checkpoint(path : str, checkpoint : dict) -> None:
+    """write checkpoint atomically (replace)
+
+    Args:
+        path (str): checkpoint file
+        checkpoint (dict): counters
+    """
+    if path is None:
+        return
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+    os.replace(f"{path}.tmp", path)
+
+def onboard(path : str, method : str, workers : int = None, batch : int = 1000, checkpoint_path : str = None, repository = None, progress = None) -> dict:
+    """create accounts of all customers in the file - passwords are hashed in process pool, accounts are inserted in batches
+    customers with e-mail of existing account are skipped, so the run can be repeated
+
+    Args:
+        path (str): customer file (.csv, .jsonl or .ndjson)
+        method (str): werkzeug password hash method
+        workers (int, optional): hashing processes. Defaults to None (number of cpus).
+        batch (int, optional): customers in one insert. Defaults to 1000.
+        checkpoint_path (str, optional): file with progress, the run continues after the last saved batch. Defaults to None.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        progress (callable, optional): called with counters (and "rate" per second) after every batch. Defaults to None.
+
+    Returns:
+        dict: counters - processed, inserted, skipped (existing e-mail or id), invalid, errors (record number, message)
+    """
+    repository = get_repository() if repository is None else repository
+    checkpoint = load_checkpoint(checkpoint_path, path)
+    errors = list()
+    hash_password = partial(BankAccount.hash_password, method=method)
+    records = read_customers(path, checkpoint["processed"])
+    start, done = time.perf_counter(), 0
+
+    with ProcessPoolExecutor(workers) as pool:
+        chunksize = max(1, batch // (4 * (workers or os.cpu_count() or 1)))
+        while True:
+            chunk = list(islice(records, batch))
+            if not chunk:
+                break
+            accounts, emails = list(), set()
+            for number, record in chunk:
+                try:
+                    account = validate_customer(record)
+                    if account.email in emails:
+                        raise ValueError("Duplicate e-mail in the file.")
+                except (ValueError, TypeError) as e:
+                    checkpoint["invalid"] += 1
+                    errors.append((number, str(e)))
+                    continue
+                emails.add(account.email)
+                accounts.append(account)
+
+            hashes = pool.map(hash_password, [account.password for account in accounts], chunksize=chunksize)
+            documents = [
+                {
+                    "bid": bid_allocator.allocate() if account.bid == "new" else account.bid,
+                    "firstname": account.firstname,
+                    "surname": account.surname,
+                    "email": account.email,
+                    "password": password_hash
+                }
+                for account, password_hash in zip(accounts, hashes)
+            ]
+            inserted = repository.insert_accounts(documents, {main_currency: 0.0})
+
+            checkpoint["processed"] = chunk[-1][0]
+            checkpoint["inserted"] += inserted
+            checkpoint["skipped"] += len(documents) - inserted
+            save_checkpoint(checkpoint_path, checkpoint)
+            done += len(chunk)
+            if progress is not None:
+                progress(dict(checkpoint, rate=done / (time.perf_counter() - start)))
+
+    return dict(checkpoint, errors=errors)
@@ -0,0 +1,112 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import urllib.request
+from .repository import get_repository
+
+# CNB exchange rates of whole year, {year} is replaced with yyyy
+cnb_year_url = "https://www.cnb.cz/cs/financni-trhy/devizovy-trh/kurzy-devizoveho-trhu/kurzy-devizoveho-trhu/rok.txt?rok={year}"
+
+def save_rates(document : dict, repository = None) -> None:
+    """save exchange rates of one day (replaces existing rates of the day)
+
+    Args:
+        document (dict): exchange rate document - "date" and "currency-rates"
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+    """
+    repository = get_repository() if repository is None else repository
+    repository.save_rate_history([document])
+
+def rates_on(date : datetime, repository = None) -> dict:
+    """exchange rates valid on the date - rates of the previous business day if there are none for the date
+
+    Args:
+        date (datetime): date
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        dict: exchange rate document - "date" and "currency-rates" (None if there are no older rates)
+    """
+    repository = get_repository() if repository is None else repository
+    return repository.rates_on(datetime(date.year, date.month, date.day))
+
+def rate_on(currency : str, date : datetime, repository = None) -> float:
+    """exchange rate of currency valid on the date
+
+    Args:
+        currency (str): currency code
+        date (datetime): date
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        float: rate in main currency (None if it is not known)
+    """
+    document = rates_on(date, repository)
+    if document is None:
+        return None
+    return document["currency-rates"].get(currency, None)
+
+def parse_year(data : str) -> list:
+    """parse CNB yearly exchange rate file in one pass
+    header line ("Datum|1 AUD|100 JPY|...") can repeat when the list of currencies changes
+
+    Args:
+        data (str): content of the CNB yearly file
+
+    Returns:
+        list[dict]: exchange rate documents - "date" and "currency-rates"
+    """
+    documents = list()
+    columns = list()
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        cells = line.split('|')
+        if cells[0] == "Datum":
+            # (amount, code) of every column
+            columns = [(int(cell.split(' ')[0]), cell.split(' ')[1]) for cell in cells[1:]]
+            continue
+        rates = dict()
+        for (amount, code), cell in zip(columns, cells[1:]):
+            if cell:
+                rates[code] = float(cell.replace(',', '.')) / amount
+        documents.append({"date": datetime.strptime(cells[0], "%d.%m.%Y"), "currency-rates": rates})
+    return documents
+
+def fetch_year(year : int, source : str = cnb_year_url, timeout : float = 30) -> list:
+    """download and parse CNB yearly exchange rate file
+
+    Args:
+        year (int): year
+        source (str, optional): url of the file, {year} is replaced. Defaults to cnb_year_url.
+        timeout (float, optional): socket timeout in seconds. Defaults to 30.
+
+    Returns:
+        list[dict]: exchange rate documents
+    """
+    with urllib.request.urlopen(source.format(year=year), timeout=timeout) as response:
+        return parse_year(response.read().decode())
+
+def backfill(start : datetime, end : datetime, workers : int = 4, source : str = cnb_year_url, repository = None, batch : int = 500) -> int:
+    """download rates of date range (yearly files in parallel) and bulk save them
+
+    Args:
+        start (datetime): first date
+        end (datetime): last date
+        workers (int, optional): number of download threads. Defaults to 4.
+        source (str, optional): url of the yearly file. Defaults to cnb_year_url.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        batch (int, optional): number of days in one bulk write. Defaults to 500.
+
+    Returns:
+        int: number of saved days
+    """
+    repository = get_repository() if repository is None else repository
+    years = range(start.year, end.year + 1)
+    saved = 0
+    with ThreadPoolExecutor(workers) as pool:
+        for documents in pool.map(lambda year: fetch_year(year, source), years):
+            documents = [d for d in documents if start <= d["date"] <= end]
+            for i in range(0, len(documents), batch):
+                repository.save_rate_history(documents[i:i + batch])
+            saved += len(documents)
+    return saved
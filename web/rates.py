@@ -0,0 +1,155 @@
+from threading import Lock
+from datetime import datetime
+import urllib.request
+import time
+from .rate_history import save_rates
+from .metrics import timed
+from .repository import get_repository
+
+# CNB daily exchange rates, {date} is replaced with dd.mm.yyyy
+cnb_url = "https://www.cnb.cz/cs/financni-trhy/devizovy-trh/kurzy-devizoveho-trhu/kurzy-devizoveho-trhu/denni_kurz.txt?date={date}"
+
+class RateCache():
+    def __init__(self, load, ttl : float = 3600, clock = time.monotonic):
+        """in-process cache for the CNB exchange rate document
+
+        Args:
+            load (callable): function returning the exchange rate document from storage
+            ttl (float, optional): seconds before the cached document is reloaded. Defaults to 3600.
+            clock (callable, optional): monotonic time source. Defaults to time.monotonic.
+        """
+        self.load = load
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._document = None
+        self._expires = 0.0
+        self._lock = Lock()
+
+    def get(self) -> dict:
+        """get exchange rate document - from cache if it is still valid else from database
+
+        Returns:
+            dict: exchange rate document (None if it does not exist in database)
+        """
+        with self._lock:
+            if self._document is not None and self.clock() < self._expires:
+                self.hits += 1
+                return self._document
+            self.misses += 1
+            document = self.load()
+            if document is not None:
+                self._document = document
+                self._expires = self.clock() + self.ttl
+            return document
+
+    def rates(self) -> dict:
+        """get currency rates from exchange rate document
+
+        Returns:
+            dict: "currency-code": rate in main currency
+        """
+        document = self.get()
+        if document is None:
+            return {}
+        return document["currency-rates"]
+
+    def invalidate(self) -> None:
+        """drop cached document - next get() loads it from database
+        """
+        with self._lock:
+            self._document = None
+            self._expires = 0.0
+
+    def stats(self) -> dict:
+        """cache counters
+
+        Returns:
+            dict: number of hits, misses and saved database reads ratio
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit-ratio": self.hits / total if total else 0.0
+            }
+
+# shared cache used by routes
+rate_cache = RateCache(lambda: get_repository().get_rates())
+
+# CNB DOWNLOAD
+
+def fetch_rates(source : str = cnb_url, timeout : float = 10) -> str:
+    """download CNB exchange rate file
+
+    Args:
+        source (str, optional): url of the file, {date} is replaced with today's date. Defaults to cnb_url.
+        timeout (float, optional): socket timeout in seconds. Defaults to 10.
+
+    Returns:
+        str: content of the file
+    """
+    today = datetime.now().strftime("%d.%m.%Y")
+    url = source.format(date=today)
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read().decode()
+
+def parse_rates(data : str) -> dict:
+    """parse CNB exchange rate file
+
+    Args:
+        data (str): content of the CNB file
+
+    Returns:
+        dict: exchange rate document - "date" and "currency-rates"
+    """
+    lines = data.split('\n')
+    # date
+    date = datetime.strptime(lines[0].split(' ')[0], "%d.%m.%Y")
+
+    # result dict (document)
+    d = {
+        "date": date,
+        "currency-rates": dict()
+    }
+
+    # parse data
+    for curr in lines[2:-2]:
+        curr_data = curr.split('|')
+        curr_code = curr_data[3]
+        curr_amount = int(curr_data[2])
+        curr_rate = float(curr_data[4].replace(',','.'))
+        d["currency-rates"][curr_code] = curr_rate / curr_amount
+    return d
+
+@timed("exchange_download")
+def exchange_download(source : str = cnb_url, timeout : float = 10) -> bool:
+    """download exchange rates from CNB and save it in the database
+    if the file with the same date is in database -> do not save it
+
+    Args:
+        source (str, optional): url of the file. Defaults to cnb_url.
+        timeout (float, optional): socket timeout in seconds. Defaults to 10.
+
+    Raises:
+        OSError: if the file can't be downloaded
+
+    Returns:
+        bool: True if new rates were saved else False
+    """
+    d = parse_rates(fetch_rates(source, timeout))
+
+    # same document check (date)
+    prev_doc = rate_cache.get()
+    if prev_doc is not None and prev_doc["date"] == d["date"]:
+        return False
+
+    # send data to db
+    get_repository().set_rates(d)
+    # new rates -> drop cached document
+    rate_cache.invalidate()
+    # keep every day in rate history
+    save_rates(d)
+    return True
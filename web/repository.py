@@ -0,0 +1,686 @@
+from bisect import bisect_left, bisect_right
+from threading import Lock, RLock
+import copy
+import os
+import weakref
+from bson import ObjectId
+from pymongo import MongoClient, DESCENDING, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from .sessions import _utcnow
+from . import exchange_id
+
+class MongoRepository():
+    def __init__(self, uri : str = None, database : str = "db", client = None, **client_options):
+        """storage in MongoDB - client is created on first use and again in every forked process
+
+        Args:
+            uri (str, optional): mongo connection string. Defaults to None.
+            database (str, optional): database name. Defaults to "db".
+            client (MongoClient, optional): existing client (uri and options are not used). Defaults to None.
+            client_options: MongoClient keyword arguments (maxPoolSize, serverSelectionTimeoutMS, ...)
+        """
+        self.uri = uri
+        self.database = database
+        self.client_options = client_options
+        self._client = client
+        self._lock = Lock()
+        if client is None:
+            _fork_reset.add(self)
+
+    @property
+    def client(self) -> MongoClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = MongoClient(self.uri, **self.client_options)
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self.database]
+
+    def _after_fork(self) -> None:
+        # sockets of the parent process can't be used in child -> new client on next use
+        self._client = None
+        self._lock = Lock()
+
+    def close(self) -> None:
+        """close the client (a new one is created on next use)
+        """
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def run_atomic(self, callback, use_transaction : bool = True):
+        """run callback in mongo transaction (callback gets the session)
+
+        Args:
+            callback (callable): function called with ClientSession (or None)
+            use_transaction (bool, optional): False -> call callback without transaction (standalone mongod). Defaults to True.
+
+        Returns:
+            any: value returned by callback
+        """
+        if not use_transaction:
+            return callback(None)
+        with self.client.start_session() as db_session:
+            return db_session.with_transaction(callback)
+
+    def ensure_indexes(self) -> list:
+        """create all declared indexes
+
+        Returns:
+            list[str]: names of indexes which could not be created
+        """
+        from .indexes import ensure_indexes
+        return ensure_indexes(self.db)
+
+    # ACCOUNTS
+
+    def find_account(self, email : str = None, bid : str = None) -> dict:
+        query = {"email": email} if email is not None else {"bid": bid}
+        return self.db.account.find_one(query)
+
+    def update_account(self, bid : str, fields : dict) -> None:
+        self.db.account.update_one({"bid": bid}, {"$set": fields})
+
+    def existing_bids(self, bids : list) -> set:
+        return {doc["bid"] for doc in self.db.account.find({"bid": {"$in": list(bids)}}, {"bid": 1, "_id": 0})}
+
+    def insert_accounts(self, accounts : list, currency_balance : dict) -> int:
+        skipped = list()
+        inserted = len(accounts)
+        if accounts:
+            try:
+                self.db.account.insert_many(accounts, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details["writeErrors"]
+                # only duplicates (e.g. accounts of unfinished previous run) are expected
+                if any(error["code"] != 11000 for error in errors):
+                    raise
+                failed = {error["index"] for error in errors}
+                skipped = [accounts[i]["email"] for i in failed]
+                accounts = [account for i, account in enumerate(accounts) if i not in failed]
+                inserted = len(accounts)
+        # balance of skipped account could be missing if the previous run stopped between the writes
+        bids = [account["bid"] for account in accounts]
+        if skipped:
+            bids += [doc["bid"] for doc in self.db.account.find({"email": {"$in": skipped}}, {"bid": 1, "_id": 0})]
+        if bids:
+            self.db.balance.bulk_write([
+                UpdateOne({"bid": bid}, {"$setOnInsert": {"currency-balance": dict(currency_balance), "version": 0}}, upsert=True)
+                for bid in bids
+            ], ordered=False)
+        return inserted
+
+    # BALANCES
+
+    def find_balance(self, bid : str, db_session = None) -> dict:
+        return self.db.balance.find_one({"bid": bid}, {"currency-balance": 1, "version": 1, "_id": 0}, session=db_session)
+
+    def balance_version(self, bid : str) -> int:
+        doc = self.db.balance.find_one({"bid": bid}, {"version": 1, "_id": 0})
+        if doc is None:
+            return None
+        return doc.get("version", 0)
+
+    def change_balance(self, bid : str, currency : str, delta : float, minimum : float = None, db_session = None) -> int:
+        query = {"bid": bid}
+        if minimum is not None:
+            query[f"currency-balance.{currency}"] = {"$gte": minimum}
+        doc = self.db.balance.find_one_and_update(
+            query,
+            {"$inc": {f"currency-balance.{currency}": delta, "version": 1}},
+            projection={"version": 1},
+            return_document=ReturnDocument.AFTER,
+            session=db_session
+        )
+        # new version (at least 1) or None
+        return doc["version"] if doc is not None else None
+
+    def change_balances(self, bid : str, changes : list, db_session = None) -> int:
+        requests = list()
+        for currency, delta, minimum in changes:
+            query = {"bid": bid}
+            if minimum is not None:
+                query[f"currency-balance.{currency}"] = {"$gte": minimum}
+            requests.append(UpdateOne(query, {"$inc": {f"currency-balance.{currency}": delta, "version": 1}}))
+        if not requests:
+            return 0
+        return self.db.balance.bulk_write(requests, ordered=True, session=db_session).modified_count
+
+    # HISTORY
+
+    def add_entries(self, entries : list, db_session = None) -> None:
+        if len(entries) == 1:
+            self.db.history.insert_one(entries[0], session=db_session)
+        elif entries:
+            self.db.history.insert_many(entries, ordered=True, session=db_session)
+
+    def history_page(self, bid : str, before : tuple = None, limit : int = 20) -> list:
+        query = {"bid": bid}
+        if before is not None:
+            date, oid = before
+            query["$or"] = [{"date": {"$lt": date}}, {"date": date, "_id": {"$lt": oid}}]
+        return list(self.db.history.find(query).sort([("date", DESCENDING), ("_id", DESCENDING)]).limit(limit))
+
+    def history_newer(self, bid : str, version : int, limit : int = 20) -> list:
+        query = {"bid": bid, "version": {"$gt": version}}
+        return list(self.db.history.find(query, {"bid": 0}).sort("version", DESCENDING).limit(limit))
+
+    def iter_history(self, bid : str, start = None, end = None, currency : str = None, batch_size : int = 500):
+        query = {"bid": bid}
+        if start is not None or end is not None:
+            query["date"] = dict()
+            if start is not None:
+                query["date"]["$gte"] = start
+            if end is not None:
+                query["date"]["$lt"] = end
+        if currency is not None:
+            query["currency-code"] = currency
+        # cursor fetches one batch at a time
+        with self.db.history.find(query, {"bid": 0}).sort([("date", DESCENDING), ("_id", DESCENDING)]).batch_size(batch_size) as cursor:
+            yield from cursor
+
+    # EXCHANGE RATES
+
+    def get_rates(self) -> dict:
+        return self.db.exchange.find_one({"_id": exchange_id})
+
+    def set_rates(self, document : dict) -> None:
+        self.db.exchange.update_one({"_id": exchange_id}, {"$set": {"date": document["date"], "currency-rates": document["currency-rates"]}}, upsert=True)
+
+    def save_rate_history(self, documents : list) -> None:
+        requests = [UpdateOne({"date": d["date"]}, {"$set": {"currency-rates": d["currency-rates"]}}, upsert=True) for d in documents]
+        if requests:
+            self.db.rate_history.bulk_write(requests, ordered=False)
+
+    def rates_on(self, day) -> dict:
+        return self.db.rate_history.find_one({"date": {"$lte": day}}, {"_id": 0}, sort=[("date", DESCENDING)])
+
+    # SUMMARIES
+
+    def update_summaries(self, changes : dict, db_session = None) -> None:
+        updates = list()
+        for (bid, month), change in changes.items():
+            inc = {f"{side}.{currency}": amount for side in ("inflow", "outflow") for currency, amount in change[side].items()}
+            updates.append(({"_id": f"{bid}:{month}"}, {"$inc": inc, "$setOnInsert": {"bid": bid, "month": month}}))
+        if len(updates) == 1:
+            self.db.summary.update_one(*updates[0], upsert=True, session=db_session)
+        elif updates:
+            self.db.summary.bulk_write([UpdateOne(query, update, upsert=True) for query, update in updates], ordered=False, session=db_session)
+
+    def find_summaries(self, bid : str, limit : int = 6) -> list:
+        return list(self.db.summary.find({"bid": bid}, {"_id": 0}).sort("month", DESCENDING).limit(limit))
+
+    def rebuild_summaries(self, bid : str = None) -> int:
+        match = {} if bid is None else {"bid": bid}
+        # one row per account, month, direction and currency
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "bid": "$bid",
+                    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}},
+                    "side": {"$cond": [{"$eq": [{"$substrCP": ["$amount", 0, 1]}, "-"]}, "outflow", "inflow"]},
+                    "currency": "$currency-code"
+                },
+                "total": {"$sum": {"$toDouble": {"$ltrim": {"input": "$amount", "chars": "+-"}}}}
+            }}
+        ]
+        documents = dict()
+        for row in self.db.history.aggregate(pipeline, allowDiskUse=True):
+            key = row["_id"]
+            document = documents.setdefault((key["bid"], key["month"]), {
+                "_id": f"{key['bid']}:{key['month']}", "bid": key["bid"], "month": key["month"], "inflow": {}, "outflow": {}
+            })
+            document[key["side"]][key["currency"]] = row["total"]
+        self.db.summary.delete_many(match)
+        if documents:
+            self.db.summary.insert_many(list(documents.values()), ordered=False)
+        return len(documents)
+
+    # COUNTERS
+
+    def max_bid(self) -> int:
+        # numeric ids only, ids have different widths -> string order can't be used
+        result = list(self.db.account.aggregate([
+            {"$group": {"_id": None, "max": {"$max": {"$convert": {"input": "$bid", "to": "long", "onError": None, "onNull": None}}}}}
+        ]))
+        return (result[0]["max"] or 0) if result else 0
+
+    def raise_counter(self, name : str, value : int) -> None:
+        self.db.counter.update_one({"_id": name}, {"$max": {"value": value}}, upsert=True)
+
+    def reserve_ids(self, name : str, count : int) -> int:
+        doc = self.db.counter.find_one_and_update({"_id": name}, {"$inc": {"value": count}}, upsert=True, return_document=ReturnDocument.AFTER)
+        return doc["value"] - count + 1
+
+    # IDEMPOTENCY KEYS
+
+    def claim_key(self, key : str, expires) -> dict:
+        document = {"_id": key, "result": None, "expires": expires}
+        try:
+            self.db.idempotency.insert_one(document)
+            return None
+        except DuplicateKeyError:
+            pass
+        # expired key which was not removed by TTL monitor yet
+        if self.db.idempotency.replace_one({"_id": key, "expires": {"$lte": _utcnow()}}, document).modified_count:
+            return None
+        return self.db.idempotency.find_one({"_id": key})
+
+    def finish_key(self, key : str, result : dict) -> None:
+        self.db.idempotency.update_one({"_id": key}, {"$set": {"result": result}})
+
+    def release_key(self, key : str) -> None:
+        self.db.idempotency.delete_one({"_id": key, "result": None})
+
+    # LEASES
+
+    def acquire_lease(self, name : str, owner : str, expires) -> bool:
+        try:
+            # matches free, expired or own lease - document of other owner raises duplicate key on upsert
+            self.db.lease.update_one(
+                {"_id": name, "$or": [{"owner": owner}, {"expires": {"$lte": _utcnow()}}]},
+                {"$set": {"owner": owner, "expires": expires}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+
+    # SESSIONS
+
+    def session_store(self, maxsize : int = 10000):
+        from .sessions import MongoSessionStore
+        return MongoSessionStore(self.db.session)
+
+    def bucket_store(self, maxsize : int = 100000):
+        from .throttle import MongoBucketStore
+        return MongoBucketStore(self.db.throttle)
+
+class MemoryRepository():
+    def __init__(self):
+        """storage in process memory (single process, tests, local load tests)
+        """
+        self._accounts = dict()
+        self._emails = dict()
+        self._balances = dict()
+        # bid -> entries sorted by (date, _id)
+        self._history = dict()
+        self._history_keys = dict()
+        # bid -> versioned entries sorted by balance version
+        self._history_versions = dict()
+        self._versioned = dict()
+        self._rates = None
+        self._rate_history = list()
+        self._keys = dict()
+        self._leases = dict()
+        self._counters = dict()
+        # bid -> month -> summary
+        self._summaries = dict()
+        self._lock = RLock()
+        self._journal = None
+
+    def close(self) -> None:
+        pass
+
+    def run_atomic(self, callback, use_transaction : bool = True):
+        """run callback under repository lock - changes are undone if it raises
+
+        Args:
+            callback (callable): function called with None (no session is needed)
+            use_transaction (bool, optional): ignored, memory storage is always atomic. Defaults to True.
+
+        Returns:
+            any: value returned by callback
+        """
+        with self._lock:
+            outer, self._journal = self._journal, list()
+            try:
+                return callback(None)
+            except BaseException:
+                for undo in reversed(self._journal):
+                    undo()
+                raise
+            finally:
+                journal, self._journal = self._journal, outer
+                if outer is not None:
+                    outer.extend(journal)
+
+    def ensure_indexes(self) -> list:
+        return []
+
+    def _undo(self, action) -> None:
+        if self._journal is not None:
+            self._journal.append(action)
+
+    # ACCOUNTS
+
+    def insert_account(self, account : dict) -> None:
+        with self._lock:
+            account = copy.deepcopy(account)
+            self._accounts[account["bid"]] = account
+            self._emails[account["email"]] = account["bid"]
+
+    def find_account(self, email : str = None, bid : str = None) -> dict:
+        with self._lock:
+            if email is not None:
+                bid = self._emails.get(email, None)
+            account = self._accounts.get(bid, None)
+            return copy.deepcopy(account)
+
+    def update_account(self, bid : str, fields : dict) -> None:
+        with self._lock:
+            if bid in self._accounts:
+                self._accounts[bid].update(copy.deepcopy(fields))
+
+    def existing_bids(self, bids : list) -> set:
+        with self._lock:
+            return {bid for bid in bids if bid in self._accounts}
+
+    def insert_accounts(self, accounts : list, currency_balance : dict) -> int:
+        inserted = 0
+        with self._lock:
+            for account in accounts:
+                bid = self._emails.get(account["email"], None)
+                if bid is None and account["bid"] not in self._accounts:
+                    self.insert_account(account)
+                    bid = account["bid"]
+                    inserted += 1
+                if bid is not None and bid not in self._balances:
+                    self.insert_balance({"bid": bid, "currency-balance": dict(currency_balance), "version": 0})
+        return inserted
+
+    # BALANCES
+
+    def insert_balance(self, balance : dict) -> None:
+        with self._lock:
+            self._balances[balance["bid"]] = copy.deepcopy(balance)
+
+    def find_balance(self, bid : str, db_session = None) -> dict:
+        with self._lock:
+            balance = self._balances.get(bid, None)
+            if balance is None:
+                return None
+            return {"currency-balance": dict(balance["currency-balance"]), "version": balance.get("version", 0)}
+
+    def balance_version(self, bid : str) -> int:
+        with self._lock:
+            balance = self._balances.get(bid, None)
+            if balance is None:
+                return None
+            return balance.get("version", 0)
+
+    def change_balance(self, bid : str, currency : str, delta : float, minimum : float = None, db_session = None) -> int:
+        with self._lock:
+            balance = self._balances.get(bid, None)
+            if balance is None:
+                return None
+            currency_balance = balance["currency-balance"]
+            if minimum is not None and not (currency in currency_balance and currency_balance[currency] >= minimum):
+                return None
+            had_currency, previous, version = currency in currency_balance, currency_balance.get(currency, 0), balance.get("version", 0)
+            currency_balance[currency] = previous + delta
+            balance["version"] = version + 1
+
+            def undo():
+                if had_currency:
+                    currency_balance[currency] = previous
+                else:
+                    del currency_balance[currency]
+                balance["version"] = version
+            self._undo(undo)
+            return version + 1
+
+    def change_balances(self, bid : str, changes : list, db_session = None) -> int:
+        with self._lock:
+            return sum(self.change_balance(bid, currency, delta, minimum) is not None for currency, delta, minimum in changes)
+
+    # HISTORY
+
+    def add_entries(self, entries : list, db_session = None) -> None:
+        with self._lock:
+            for entry in entries:
+                entry.setdefault("_id", ObjectId())
+                stored = dict(entry)
+                key = (stored["date"], stored["_id"])
+                keys = self._history_keys.setdefault(stored["bid"], list())
+                history = self._history.setdefault(stored["bid"], list())
+                position = bisect_right(keys, key)
+                keys.insert(position, key)
+                history.insert(position, stored)
+
+                def undo(keys=keys, history=history, key=key):
+                    position = bisect_left(keys, key)
+                    del keys[position]
+                    del history[position]
+                self._undo(undo)
+
+                # entries of balance changes also by version
+                if "version" in stored:
+                    versions = self._history_versions.setdefault(stored["bid"], list())
+                    versioned = self._versioned.setdefault(stored["bid"], list())
+                    position = bisect_right(versions, stored["version"])
+                    versions.insert(position, stored["version"])
+                    versioned.insert(position, stored)
+
+                    def undo_version(versions=versions, versioned=versioned, stored=stored):
+                        position = bisect_left(versions, stored["version"])
+                        while versioned[position] is not stored:
+                            position += 1
+                        del versions[position]
+                        del versioned[position]
+                    self._undo(undo_version)
+
+    def history_page(self, bid : str, before : tuple = None, limit : int = 20) -> list:
+        with self._lock:
+            keys = self._history_keys.get(bid, [])
+            end = len(keys) if before is None else bisect_left(keys, tuple(before))
+            history = self._history.get(bid, [])
+            return [dict(entry) for entry in reversed(history[max(0, end - limit):end])]
+
+    def history_newer(self, bid : str, version : int, limit : int = 20) -> list:
+        with self._lock:
+            versions = self._history_versions.get(bid, [])
+            start = bisect_right(versions, version)
+            versioned = self._versioned.get(bid, [])
+            newer = versioned[max(start, len(versioned) - limit):]
+            return [{key: value for key, value in entry.items() if key != "bid"} for entry in reversed(newer)]
+
+    def iter_history(self, bid : str, start = None, end = None, currency : str = None, batch_size : int = 500):
+        before = None
+        while True:
+            # lock is held only for one batch
+            with self._lock:
+                keys = self._history_keys.get(bid, [])
+                stop = len(keys) if before is None else bisect_left(keys, before)
+                if end is not None:
+                    stop = min(stop, bisect_left(keys, (end,)))
+                first = 0 if start is None else bisect_left(keys, (start,))
+                batch = self._history.get(bid, [])[max(first, stop - batch_size):stop]
+            if not batch:
+                return
+            for entry in reversed(batch):
+                if currency is None or entry["currency-code"] == currency:
+                    yield {key: value for key, value in entry.items() if key != "bid"}
+            before = (batch[0]["date"], batch[0]["_id"])
+
+    # EXCHANGE RATES
+
+    def get_rates(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._rates)
+
+    def set_rates(self, document : dict) -> None:
+        with self._lock:
+            self._rates = {"_id": exchange_id, "date": document["date"], "currency-rates": dict(document["currency-rates"])}
+
+    def save_rate_history(self, documents : list) -> None:
+        with self._lock:
+            for d in documents:
+                dates = [doc["date"] for doc in self._rate_history]
+                position = bisect_left(dates, d["date"])
+                document = {"date": d["date"], "currency-rates": dict(d["currency-rates"])}
+                if position < len(dates) and dates[position] == d["date"]:
+                    self._rate_history[position] = document
+                else:
+                    self._rate_history.insert(position, document)
+
+    def rates_on(self, day) -> dict:
+        with self._lock:
+            position = bisect_right([doc["date"] for doc in self._rate_history], day)
+            if position == 0:
+                return None
+            return copy.deepcopy(self._rate_history[position - 1])
+
+    # SUMMARIES
+
+    def update_summaries(self, changes : dict, db_session = None) -> None:
+        with self._lock:
+            for (bid, month), change in changes.items():
+                months = self._summaries.setdefault(bid, dict())
+                previous = copy.deepcopy(months.get(month, None))
+                summary = months.setdefault(month, {"bid": bid, "month": month, "inflow": {}, "outflow": {}})
+                for side in ("inflow", "outflow"):
+                    for currency, amount in change[side].items():
+                        summary[side][currency] = summary[side].get(currency, 0.0) + amount
+
+                def undo(months=months, month=month, previous=previous):
+                    if previous is None:
+                        del months[month]
+                    else:
+                        months[month] = previous
+                self._undo(undo)
+
+    def find_summaries(self, bid : str, limit : int = 6) -> list:
+        with self._lock:
+            months = self._summaries.get(bid, {})
+            return [copy.deepcopy(months[month]) for month in sorted(months, reverse=True)[:limit]]
+
+    def rebuild_summaries(self, bid : str = None) -> int:
+        from .summaries import summary_changes
+        with self._lock:
+            bids = list(self._history) if bid is None else [bid]
+            for history_bid in bids:
+                self._summaries.pop(history_bid, None)
+            for history_bid in bids:
+                self.update_summaries(summary_changes(self._history.get(history_bid, [])))
+            return sum(len(self._summaries.get(history_bid, {})) for history_bid in bids)
+
+    # COUNTERS
+
+    def max_bid(self) -> int:
+        with self._lock:
+            return max((int(bid) for bid in self._accounts if bid.isdigit()), default=0)
+
+    def raise_counter(self, name : str, value : int) -> None:
+        with self._lock:
+            self._counters[name] = max(self._counters.get(name, 0), value)
+
+    def reserve_ids(self, name : str, count : int) -> int:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + count
+            return self._counters[name] - count + 1
+
+    # IDEMPOTENCY KEYS
+
+    def claim_key(self, key : str, expires) -> dict:
+        with self._lock:
+            document = self._keys.get(key, None)
+            if document is not None and document["expires"] > _utcnow():
+                return copy.deepcopy(document)
+            self._keys[key] = {"_id": key, "result": None, "expires": expires}
+            return None
+
+    def finish_key(self, key : str, result : dict) -> None:
+        with self._lock:
+            if key in self._keys:
+                self._keys[key]["result"] = copy.deepcopy(result)
+
+    def release_key(self, key : str) -> None:
+        with self._lock:
+            if key in self._keys and self._keys[key]["result"] is None:
+                del self._keys[key]
+
+    # LEASES
+
+    def acquire_lease(self, name : str, owner : str, expires) -> bool:
+        with self._lock:
+            document = self._leases.get(name, None)
+            if document is not None and document["owner"] != owner and document["expires"] > _utcnow():
+                return False
+            self._leases[name] = {"_id": name, "owner": owner, "expires": expires}
+            return True
+
+    # SESSIONS
+
+    def session_store(self, maxsize : int = 10000):
+        from .sessions import MemorySessionStore
+        return MemorySessionStore(maxsize)
+
+    def bucket_store(self, maxsize : int = 100000):
+        from .throttle import MemoryBucketStore
+        return MemoryBucketStore(maxsize)
+
+# repositories which have to drop their client in forked process
+_fork_reset = weakref.WeakSet()
+
+def _reset_after_fork() -> None:
+    for repository in list(_fork_reset):
+        repository._after_fork()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+_repository = None
+
+def create_repository(config : dict):
+    """create storage from app configuration
+
+    Args:
+        config (dict): configuration - STORAGE_BACKEND ("mongo" or "memory"), MONGO_URI, MONGO_DATABASE, pool options and METRICS
+
+    Returns:
+        MongoRepository | MemoryRepository: repository
+    """
+    if config["STORAGE_BACKEND"] == "memory":
+        return MemoryRepository()
+    timeout = config["MONGO_TIMEOUT_MS"]
+    options = dict(config.get("MONGO_OPTIONS", {}))
+    if config.get("METRICS", False):
+        from .metrics import CommandTimer
+        options["event_listeners"] = list(options.get("event_listeners", [])) + [CommandTimer()]
+    return MongoRepository(
+        config["MONGO_URI"],
+        config["MONGO_DATABASE"],
+        maxPoolSize=config["MONGO_MAX_POOL_SIZE"],
+        minPoolSize=config["MONGO_MIN_POOL_SIZE"],
+        serverSelectionTimeoutMS=timeout,
+        connectTimeoutMS=timeout,
+        socketTimeoutMS=config["MONGO_SOCKET_TIMEOUT_MS"],
+        **options
+    )
+
+def set_repository(repository) -> None:
+    """set storage used by the application
+
+    Args:
+        repository (MongoRepository | MemoryRepository): repository
+    """
+    global _repository
+    _repository = repository
+
+def get_repository():
+    """storage used by the application (mongo with default configuration if create_app was not called)
+
+    Returns:
+        MongoRepository | MemoryRepository: repository
+    """
+    global _repository
+    if _repository is None:
+        from . import mongo_uri
+        _repository = MongoRepository(mongo_uri)
+    return _repository
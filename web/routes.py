@@ -1,12 +1,22 @@
-from flask import Blueprint, render_template, redirect, url_for, request, session, flash, get_flashed_messages
+from flask import Blueprint, Response, render_template, redirect, url_for, request, session, flash, get_flashed_messages, current_app
 import random
-from .objects import BankAccount, TransactionList, CurrencyBalance
-from . import account_db, balance_db, transaction_db, exchange_db, ggemail, ggpass, main_currency
-import smtplib
-from datetime import datetime
+from .objects import BankAccount, TransactionRow, CurrencyBalance
+from .rates import rate_cache
+from .conversion import get_engine
+from .mail import mail_queue
+from .auth import start_challenge, verify_challenge
+from .history import load_page, load_newer, encode_cursor, entries_version
+from .transfers import transfer, existing_bids, validate_transfer, parse_amount
+from .repository import get_repository
+from .metrics import span_duration
+from .idempotency import new_key, request_key, claim_key, finish_key, release_key
+from .export import FORMATS, parse_range, export_rows
+from .summaries import load_summaries
+from .throttle import throttle
+from .fragments import fragment_cache
+from .cooperative import run_blocking
+from . import ggemail
 from email.mime.text import MIMEText
-from bson import ObjectId
-import urllib
 
 routes = Blueprint("routes", __name__)
 
@@ -31,34 +41,58 @@ def login_send_code():
     form_email = request.form.get("email_input")
     form_password = request.form.get("password_input")
 
+    # no db lookup, hashing or mail for throttled clients
+    if not throttle.allow_login(request.remote_addr, form_email):
+        return throttled()
+
     # find account in db
-    ac = account_db.find_one({"email": form_email})
+    repository = get_repository()
+    ac = repository.find_account(email=form_email)
 
     # verify account
     if ac is not None:
         ba = BankAccount(ac["firstname"], ac["surname"], ac["password"], ac["email"], ac["bid"])
-        if ba.check_password(form_password):
+        # the only password verification of login flow
+        with span_duration.time("check_password"):
+            valid = run_blocking(ba.check_password, form_password)
+        if valid:
+            method = current_app.config["PASSWORD_HASH_METHOD"]
+            if ba.needs_rehash(method):
+                with span_duration.time("hash_password"):
+                    password_hash = run_blocking(BankAccount.hash_password, form_password, method)
+                repository.update_account(ba.bid, {"password": password_hash})
             code = f"{random.randint(1111,9999)}"
-            send_code(ba.email, code)
-            session["code"] = code
+            if send_code(ba.email, code):
+                start_challenge(ba.email, code)
+            else:
+                flash("The code can't be sent now, try it again later.")
     
     return redirect(url_for("routes.login_page"))
 
-def send_code(email : str, code : str):
-    """send generated code to e-mail
+def throttled():
+    """login page of rejected login request
+
+    Returns:
+        tuple: login.html page with flash message and status 429
+    """
+    flash("Too many login attempts, try it again later.")
+    return render_template("login.html"), 429
+
+def send_code(email : str, code : str) -> bool:
+    """queue generated code to be sent to e-mail
 
     Args:
         email (str): e-mail where the code should be sended
         code (str): code
+
+    Returns:
+        bool: True if the e-mail was queued else False
     """
     msg = MIMEText(f"Here is your 2pa code: {code}")
     msg["Subject"] = "STONKSTER code authorization"
     msg["From"] = ggemail
     msg["To"] = email
-    smtp_server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-    smtp_server.login(ggemail, ggpass)
-    smtp_server.sendmail(ggemail, email, msg.as_string())
-    smtp_server.quit()
+    return mail_queue.send(ggemail, email, msg.as_string())
 
 @routes.route("/login_login", methods=["POST"])
 def login_login():
@@ -68,35 +102,30 @@ def login_login():
         str: if account exists -> redirect to routes.index else render login.html 
     """
     form_email = request.form.get("email_input")
-    form_password = request.form.get("password_input")
     form_code = request.form.get("code_input")
 
-    # find account in db
-    ac = account_db.find_one({"email": form_email})
+    if not throttle.allow_login(request.remote_addr, form_email):
+        return throttled()
 
-    # verify account
-    if ac is not None:
-        ba = BankAccount(ac["firstname"], ac["surname"], ac["password"], ac["email"], ac["bid"])
-        if ba.check_password(form_password) and form_code == session["code"]:
+    # password was verified by login_send_code -> check only the code
+    if verify_challenge(form_email, form_code):
+        ac = get_repository().find_account(email=form_email)
+        if ac is not None:
+            ba = BankAccount(ac["firstname"], ac["surname"], ac["password"], ac["email"], ac["bid"])
+            # new session id after login (no session fixation)
             session.clear()
+            session.regenerate()
 
             # bank account
             session["ba"] = {
                 "bid" : ba.bid,
                 "name": f"{ba.firstname} {ba.surname}",
-                "currency-balance": {},
-                "transaction-list": []
+                "currency-balance": {}
             }
 
             # refresh data
             refresh_account_data()
 
-            # load currencies
-            refresh_exchange_data()
-
-            # download data
-            exchange_download()
-
             return redirect(url_for("routes.index"))
     
     return redirect(url_for("routes.login_page"))
@@ -114,7 +143,41 @@ def index():
     if session.get("ba", None) == None:
         return redirect(url_for("routes.login_page"))
     else: 
-        return render_template("index.html")
+        # first page of account history is cached in session
+        cursor = request.args.get("before", None)
+        if cursor is None:
+            fragments = index_fragments(session["ba"].get("transaction-list", []), session["ba"].get("next-cursor", None), True)
+            return render_template("index.html", fragments=fragments, idempotency_key=new_key())
+        # older pages
+        try:
+            entries, next_cursor = load_page(session["ba"]["bid"], cursor, current_app.config["HISTORY_PAGE_SIZE"])
+        except ValueError:
+            return redirect(url_for("routes.index"))
+        transactions = (TransactionRow.from_entry(entry) for entry in entries)
+        return render_template("index.html", fragments=index_fragments(transactions, next_cursor, False), idempotency_key=new_key())
+
+def index_fragments(transactions, next_cursor : str, first_page : bool) -> dict:
+    """rendered parts of index page - currencies are cached per rate date, account parts per account version
+
+    Args:
+        transactions (iterable): transactions of the page
+        next_cursor (str): cursor of older page or None
+        first_page (bool): True if the transactions are the first page cached in session
+
+    Returns:
+        dict: "currcodes", "balance" and "transactions" html
+    """
+    ba = session["ba"]
+    version = ba.get("version", None)
+    rates = rate_cache.get()
+    account_key = None if version is None else (ba["bid"], version)
+    return {
+        "currcodes": fragment_cache.render("fragments/currcodes.html", (rates["date"] if rates else None,), codes=rates["currency-rates"].keys() if rates else []),
+        # total value depends on rates it was computed with
+        "balance": fragment_cache.render("fragments/balance.html", account_key + (ba.get("total-date", None),) if account_key else None, ba=ba),
+        # history can be newer than the balance read -> its high-water mark is part of the key
+        "transactions": fragment_cache.render("fragments/transactions.html", account_key + (ba.get("last-version", None),) if first_page and account_key else None, transactions=transactions, next_cursor=next_cursor)
+    }
 
 @routes.route("/send_transaction", methods=["POST"])
 def send_transaction():
@@ -124,32 +187,17 @@ def send_transaction():
         str: if any of the inserted data is None or invalid -> flash message and render index.html
         else make transition, flash message and render index.html
     """
-    # target bid
+    # target bid and currency
     form_tobid = request.form.get("tobid_input")
-    if form_tobid is None:
-        flash("Error in 'to bid' input.")
-        return redirect(url_for("routes.index"))
-    # find bid in database
-    if  account_db.find_one({"bid": form_tobid}) is None and form_tobid != "9999":
-        flash(f"Target account ({form_tobid}) does not exist.")
-        return redirect(url_for("routes.index"))
-
-    # currency
     form_curr = request.form.get("curr_input")
-    if form_curr is None:
-        flash("Error in 'currency' input.")
+    error = validate_transfer(form_tobid, form_curr, existing_bids([form_tobid]), rate_cache.rates())
+    if error is not None:
+        flash(error)
         return redirect(url_for("routes.index"))
     form_curr = form_curr.upper()
-    # check if currency exists in db
-    if exchange_db.find_one({"_id": ObjectId("6421fb6fe6e010756d82f2a1")})["currency-rates"].get(form_curr, None) is None and form_curr != main_currency:
-        flash(f"Inserted currency ({form_curr}) does not exist in database.")
-        return redirect(url_for("routes.index"))
     
-    # amount
-    try:
-        form_amount = float(request.form.get("amount_input"))
-    except ValueError:
-        form_amount = None
+    # amount (finite and greater than 0)
+    form_amount = parse_amount(request.form.get("amount_input"))
     if form_amount is None:
         flash("Error in 'amount' input.")
         return redirect(url_for("routes.index"))
@@ -157,14 +205,54 @@ def send_transaction():
     # primary transfer
     form_transfer = bool(request.form.get("trans_input"))
     
+    # repeated submit (double click, retry) -> result of the first one
+    bid = session["ba"]["bid"]
+    key = request_key()
+    if key is not None:
+        previous = claim_key(bid, key, current_app.config["IDEMPOTENCY_TTL"])
+        if previous is not None:
+            flash(previous["result"]["message"] if previous["result"] else "The transaction is being processed.")
+            return redirect(url_for("routes.index"))
+
     # make transaction via inserted currency
-    if make_transaction(session["ba"]["bid"], form_tobid, form_curr, form_amount, form_transfer):
-        flash("The transaction was successful.")
-        return redirect(url_for("routes.index"))
-        
-    flash("You do not have enough resources.")
+    try:
+        res = make_transaction(bid, form_tobid, form_curr, form_amount, form_transfer)
+    except Exception:
+        if key is not None:
+            release_key(bid, key)
+        raise
+    message = "The transaction was successful." if res else "You do not have enough resources."
+    if key is not None:
+        finish_key(bid, key, {"ok": res, "message": message})
+    flash(message)
     return redirect(url_for("routes.index"))
 
+@routes.route("/export", methods=["GET"])
+def export():
+    """route for streaming whole account history - ?format=csv|json|ndjson, from and to (yyyy-mm-dd), currency
+
+    Returns:
+        Response: streamed file (newest transactions first) or redirect to routes.login_page
+    """
+    if session.get("ba", None) is None:
+        return redirect(url_for("routes.login_page"))
+    export_format = request.args.get("format", "csv").lower()
+    if export_format not in FORMATS:
+        return f"Unknown format ({export_format}).", 400
+    try:
+        start, end = parse_range(request.args.get("from", None), request.args.get("to", None))
+    except ValueError:
+        return "Dates must be in yyyy-mm-dd format.", 400
+    currency = request.args.get("currency", None)
+    currency = currency.upper() if currency else None
+
+    # rows are read and written while the response is sent
+    bid = session["ba"]["bid"]
+    mimetype, extension, writer = FORMATS[export_format]
+    response = Response(writer(export_rows(bid, start, end, currency)), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="statement-{bid}.{extension}"'
+    return response
+
 @routes.route("/logout", methods=["POST"])
 def logout():
     """route for logout
@@ -174,68 +262,55 @@ def logout():
         str: redirect to routes.login_page
     """
     session.clear()
+    session.regenerate()
     return redirect(url_for("routes.login_page"))
 
-# CNB DOWNLOAD
-def exchange_download() -> None:
-    """download exchange rates from CNB and save it in the database
-    if the file with the same date is in database -> do not save it
-    """
-    today = datetime.now().strftime("%d.%m.%Y")
-    url = f"https://www.cnb.cz/cs/financni-trhy/devizovy-trh/kurzy-devizoveho-trhu/kurzy-devizoveho-trhu/denni_kurz.txt?date={today}"
-    try:
-        data = urllib.request.urlopen(url).read().decode()
-    except:
-        return
-    lines = data.split('\n')
-    # date
-    date = datetime.strptime(lines[0].split(' ')[0], "%d.%m.%Y")
-
-    # same document check (date)
-    prev_doc = exchange_db.find_one({"_id": ObjectId("6421fb6fe6e010756d82f2a1")})
-    if prev_doc["date"] == date:
-        return
-
-    # result dict (document)
-    d = {
-        "date": date,
-        "currency-rates": dict()
-    }
-
-    # parse data
-    for curr in lines[2:-2]:
-        curr_data = curr.split('|')
-        curr_code = curr_data[3]
-        curr_amount = int(curr_data[2])
-        curr_rate = float(curr_data[4].replace(',','.'))
-        d["currency-rates"][curr_code] = curr_rate / curr_amount
-    
-    # send data to db
-    exchange_db.update_one({"_id": ObjectId("6421fb6fe6e010756d82f2a1")}, {"$set": {"date": d["date"], "currency-rates": d["currency-rates"]}})
-
-def refresh_exchange_data():
-    """get exchange rate data from database and save it in session
-    """
-    session["curr-codes"] = list()
-    exchange = exchange_db.find_one({"_id": ObjectId("6421fb6fe6e010756d82f2a1")})["currency-rates"]
-    for key in exchange.keys():
-        session["curr-codes"].append(key)
-
 # GET DATA FROM DB
 def refresh_account_data() -> None:
-    """refresh account data - load data from database into session
+    """refresh account data - load only transactions newer than the last known one into session
+    balance is loaded only if there is a new transaction (every balance change is logged)
     """
     ba = session.get("ba", None)
     if ba is None:
         return
-    
-    balance = balance_db.find_one({"bid": ba["bid"]})
-    if balance != session["ba"]["currency-balance"] and balance:
-        session["ba"]["currency-balance"] = CurrencyBalance(balance["currency-balance"]).to_output()
-    
-    transaction = transaction_db.find_one({"bid": ba["bid"]})
-    if transaction != session["ba"]["transaction-list"] and transaction:
-        session["ba"]["transaction-list"] = TransactionList(transaction["transaction-list"]).to_output()
+    page_size = current_app.config["HISTORY_PAGE_SIZE"]
+
+    entries = None
+    if ba.get("last-version", None) is not None:
+        entries = load_newer(ba["bid"], ba["last-version"], page_size + 1)
+        if not entries:
+            return
+        # too many new entries -> load the whole first page again
+        if len(entries) > page_size:
+            entries = None
+    if entries is None:
+        entries, ba["next-cursor"] = load_page(ba["bid"], None, page_size)
+        ba["transaction-list"] = list()
+        ba["last-version"] = 0
+
+    # merge new entries into cached first page
+    if entries:
+        new_list = [dict(TransactionRow.from_entry(entry).to_dict(), cursor=encode_cursor(entry)) for entry in entries]
+        ba["last-version"] = max(ba["last-version"], entries_version(entries))
+        transaction_list = new_list + ba["transaction-list"]
+        if len(transaction_list) > page_size:
+            transaction_list = transaction_list[:page_size]
+            ba["next-cursor"] = transaction_list[-1]["cursor"]
+        ba["transaction-list"] = transaction_list
+
+    balance = get_repository().find_balance(ba["bid"])
+    if balance:
+        ba["version"] = balance.get("version", 0)
+        ba["currency-balance"] = CurrencyBalance(balance["currency-balance"]).to_output()
+        # whole balance valued in main currency
+        engine = get_engine()
+        if engine is not None:
+            ba["total-value"] = CurrencyBalance.format_amount(engine.value(balance["currency-balance"]))
+            ba["total-date"] = engine.date
+    # summaries change only together with history
+    ba["summaries"] = load_summaries(ba["bid"], current_app.config["SUMMARY_MONTHS"])
+    # nested data were changed
+    session.modified = True
 
 def make_transaction(bid : str, target_bid : str, currency : str, amount : float, use_main_currency : bool = False) -> bool:
     """accomplish transaction -> update databse
@@ -250,37 +325,8 @@ def make_transaction(bid : str, target_bid : str, currency : str, amount : float
     Returns:
         bool: if transaction is accomplished -> True else False
     """
-    res = False
-    # account balance
-    balance = balance_db.find_one({"bid": bid})
-    transaction = None
-    # insert money
-    if balance:
-        if bid == target_bid:
-            # check if account has inserted currency
-            if balance["currency-balance"].get(currency, None):
-                balance_db.update_one({"bid": bid}, {"$inc": {f"currency-balance.{currency}": amount}})
-            else:
-                balance_db.update_one({"bid": bid}, {"$set": {f"currency-balance.{currency}": amount}})
-            # add to transaction db
-            transaction_db.update_one({"bid": bid}, {"$push": {"transaction-list": {"target-bid": bid, "currency-code": currency, "amount": f"+{amount:.2f}", "date": datetime.now()}}})
-            res = True
-        # send money
-        else:
-            # check if account has inserted currency
-            if balance["currency-balance"].get(currency, None):
-                # check if selected currency has enough resources
-                if balance["currency-balance"][currency] >= amount:
-                    balance_db.update_one({"bid": bid}, {"$inc": {f"currency-balance.{currency}": -amount}})
-                    transaction_db.update_one({"bid": bid}, {"$push": {"transaction-list": {"target-bid": target_bid, "currency-code": currency, "amount": f"-{amount:.2f}", "date": datetime.now()}}})
-                    res = True
-            # use main currency 
-            if use_main_currency and not res:
-                exchanged_amount = amount * exchange_db.find_one({"_id": ObjectId("6421fb6fe6e010756d82f2a1")})["currency-rates"][currency]
-                if balance["currency-balance"][main_currency] >= exchanged_amount:
-                    balance_db.update_one({"bid": bid}, {"$inc": {f"currency-balance.{main_currency}": -exchanged_amount}})
-                    transaction_db.update_one({"bid": bid}, {"$push": {"transaction-list": {"target-bid": target_bid, "currency-code": main_currency, "amount": f"-{exchanged_amount:.2f}", "date": datetime.now()}}})
-                    res = True
+    # balance check, update and log in one atomic step
+    res = transfer(bid, target_bid, currency, amount, use_main_currency, current_app.config["DB_TRANSACTIONS"])
 
     # if changed -> refresh data
     if res:
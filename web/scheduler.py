@@ -0,0 +1,136 @@
+from datetime import timedelta
+from threading import Event, Lock, Thread
+import argparse
+import logging
+import os
+import socket
+import time
+from .rates import exchange_download, cnb_url
+from .repository import get_repository
+from .sessions import _utcnow
+
+logger = logging.getLogger(__name__)
+
+class RateScheduler():
+    def __init__(self, download = exchange_download, source : str = cnb_url, interval : float = 3600, timeout : float = 10, retries : int = 3, backoff : float = 5, lease = None):
+        """background downloader of CNB exchange rates
+
+        Args:
+            download (callable, optional): download function called with source and timeout. Defaults to exchange_download.
+            source (str, optional): url of the CNB file (file:// urls are supported). Defaults to cnb_url.
+            interval (float, optional): seconds between two refreshes. Defaults to 3600.
+            timeout (float, optional): socket timeout of one download in seconds. Defaults to 10.
+            retries (int, optional): number of attempts of one refresh. Defaults to 3.
+            backoff (float, optional): seconds between two attempts (doubled after every failure). Defaults to 5.
+            lease (callable, optional): called with seconds before every refresh, False -> other process refreshes. Defaults to None.
+        """
+        self.download = download
+        self.source = source
+        self.interval = interval
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.lease = lease
+        self._running = Lock()
+        self._starting = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    def refresh(self) -> bool:
+        """download rates with retries
+        only one refresh runs at a time - concurrent calls and calls without the lease return immediately
+
+        Returns:
+            bool: True if new rates were saved else False
+        """
+        if not self._running.acquire(blocking=False):
+            return False
+        try:
+            # lease is shorter than interval - next refresh of the holder is not blocked by its own old lease
+            if self.lease is not None and not self.lease(self.interval * 0.9):
+                logger.debug("CNB download skipped - lease is held by other process")
+                return False
+            delay = self.backoff
+            for attempt in range(1, self.retries + 1):
+                try:
+                    return self.download(self.source, self.timeout)
+                except Exception as e:
+                    logger.warning("CNB download failed (attempt %d/%d): %s", attempt, self.retries, e)
+                    if attempt == self.retries or self._stop.wait(delay):
+                        break
+                    delay *= 2
+            return False
+        finally:
+            self._running.release()
+
+    def start(self) -> None:
+        """start background thread (does nothing if it is already running)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._starting:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name="rate-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout : float = None) -> None:
+        """stop background thread
+
+        Args:
+            timeout (float, optional): seconds to wait for the thread. Defaults to None.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+def shared_lease(name : str = "rate-scheduler"):
+    """lease in the shared storage - one of all processes using the same database refreshes rates
+
+    Args:
+        name (str, optional): name of the lease. Defaults to "rate-scheduler".
+
+    Returns:
+        callable: lease function for RateScheduler
+    """
+    def lease(seconds : float) -> bool:
+        # owner is resolved on every call - workers forked from one preloaded app differ in pid
+        owner = f"{socket.gethostname()}:{os.getpid()}"
+        return get_repository().acquire_lease(name, owner, _utcnow() + timedelta(seconds=seconds))
+    return lease
+
+# shared scheduler started by the first request of every web process
+rate_scheduler = RateScheduler(lease=shared_lease())
+
+def main(argv : list = None) -> None:
+    """command line entry point - python -m web.scheduler [--once]
+    """
+    parser = argparse.ArgumentParser(description="Download CNB exchange rates on a fixed schedule.")
+    parser.add_argument("--once", action="store_true", help="refresh once and exit")
+    parser.add_argument("--source", default=cnb_url, help="url of the CNB file")
+    parser.add_argument("--interval", type=float, default=3600, help="seconds between two refreshes")
+    parser.add_argument("--timeout", type=float, default=10, help="socket timeout in seconds")
+    parser.add_argument("--retries", type=int, default=3, help="attempts of one refresh")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    scheduler = RateScheduler(source=args.source, interval=args.interval, timeout=args.timeout, retries=args.retries)
+    if args.once:
+        scheduler.refresh()
+        return
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+import copy
+import secrets
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+def _utcnow() -> datetime:
+    # naive UTC time (the same as pymongo returns)
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class MemorySessionStore():
+    def __init__(self, maxsize : int = 10000):
+        """in-memory LRU session store (single node only)
+
+        Args:
+            maxsize (int, optional): maximal number of stored sessions. Defaults to 10000.
+        """
+        self.maxsize = maxsize
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, sid : str) -> tuple:
+        """load session
+
+        Args:
+            sid (str): session id
+
+        Returns:
+            tuple: (data, expires) or None if the session does not exist or expired
+        """
+        with self._lock:
+            record = self._sessions.get(sid, None)
+            if record is None:
+                return None
+            if record[1] <= _utcnow():
+                del self._sessions[sid]
+                return None
+            self._sessions.move_to_end(sid)
+            return copy.deepcopy(record[0]), record[1]
+
+    def save(self, sid : str, data : dict, expires : datetime) -> None:
+        """save session
+
+        Args:
+            sid (str): session id
+            data (dict): session data
+            expires (datetime): expiration time (UTC)
+        """
+        with self._lock:
+            self._sessions[sid] = (copy.deepcopy(data), expires)
+            self._sessions.move_to_end(sid)
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+
+    def delete(self, sid : str) -> None:
+        """delete session
+
+        Args:
+            sid (str): session id
+        """
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+class MongoSessionStore():
+    def __init__(self, collection):
+        """session store in mongo collection - expired documents are removed by TTL index (see indexes.py)
+
+        Args:
+            collection (Collection): collection for sessions
+        """
+        self.collection = collection
+
+    def get(self, sid : str) -> tuple:
+        """load session
+
+        Args:
+            sid (str): session id
+
+        Returns:
+            tuple: (data, expires) or None if the session does not exist or expired
+        """
+        # TTL monitor runs once a minute -> filter expired documents too
+        doc = self.collection.find_one({"_id": sid, "expires": {"$gt": _utcnow()}})
+        if doc is None:
+            return None
+        return doc["data"], doc["expires"]
+
+    def save(self, sid : str, data : dict, expires : datetime) -> None:
+        """save session
+
+        Args:
+            sid (str): session id
+            data (dict): session data
+            expires (datetime): expiration time (UTC)
+        """
+        self.collection.replace_one({"_id": sid}, {"_id": sid, "data": data, "expires": expires}, upsert=True)
+
+    def delete(self, sid : str) -> None:
+        """delete session
+
+        Args:
+            sid (str): session id
+        """
+        self.collection.delete_one({"_id": sid})
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, sid : str, loader = None, new : bool = False):
+        """session with data kept in session store - data are loaded on first access
+
+        Args:
+            sid (str): session id
+            loader (callable, optional): returns (data, expires) or None. Defaults to None.
+            new (bool, optional): True if the session was just created. Defaults to False.
+        """
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(None, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.accessed = False
+        self.expires = None
+        # stored id replaced by regenerate() (deleted on save)
+        self.previous_sid = None
+        self._loader = loader
+
+    def load(self) -> None:
+        """load data from session store (only once)
+        """
+        if self._loader is None:
+            return
+        loader, self._loader = self._loader, None
+        self.accessed = True
+        record = loader()
+        if record is None:
+            self.new = True
+            return
+        data, self.expires = record
+        dict.update(self, data)
+
+    def regenerate(self) -> None:
+        """give the session new id (login, logout) - record of the old id is deleted on save, so id known before login can't be used
+        """
+        self.load()
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+        self.accessed = True
+
+    @property
+    def loaded(self) -> bool:
+        return self._loader is None
+
+def _lazy(name : str):
+    method = getattr(CallbackDict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ("__getitem__", "__contains__", "__iter__", "__len__", "__repr__", "get", "keys", "values", "items", "copy",
+              "__setitem__", "__delitem__", "setdefault", "pop", "popitem", "update", "clear"):
+    setattr(ServerSession, _name, _lazy(_name))
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store):
+        """flask session interface keeping only signed session id in the cookie
+
+        Args:
+            store (MemorySessionStore | MongoSessionStore): session store
+        """
+        self.store = store
+
+    def _signer(self, app) -> Signer:
+        return Signer(app.secret_key, salt="server-session")
+
+    def open_session(self, app, request) -> ServerSession:
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+                return ServerSession(sid, lambda: self.store.get(sid))
+            except BadSignature:
+                pass
+        return ServerSession(secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session : ServerSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        # data were not touched in this request -> nothing to save
+        if not session.loaded:
+            return
+
+        # regenerated id -> old record is not valid any more
+        if session.previous_sid is not None:
+            self.store.delete(session.previous_sid)
+
+        # empty session -> delete it
+        if not session:
+            if session.modified and (not session.new or session.previous_sid is not None):
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        lifetime = app.permanent_session_lifetime
+        now = _utcnow()
+        # sliding expiration - extend session when more than half of lifetime passed
+        refresh = session.expires is None or session.expires - now < lifetime / 2
+        if not session.modified and not refresh:
+            return
+
+        expires = now + lifetime
+        self.store.save(session.sid, dict(session), expires)
+        if session.new or refresh:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app)
+            )
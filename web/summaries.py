@@ -0,0 +1,92 @@
+from datetime import datetime
+from .objects import CurrencyBalance
+from .repository import get_repository
+
+def month_of(date : datetime) -> str:
+    """month of the date
+
+    Args:
+        date (datetime): date
+
+    Returns:
+        str: yyyy-mm
+    """
+    return date.strftime("%Y-%m")
+
+def entry_delta(entry : dict) -> float:
+    """signed amount of stored history entry (sign is the first character, as in rebuild pipeline)
+
+    Args:
+        entry (dict): history entry
+
+    Returns:
+        float: amount, negative for outflow
+    """
+    value = float(entry["amount"].lstrip("+-"))
+    return -value if entry["amount"].startswith("-") else value
+
+def summary_changes(entries : list, deltas : list = None) -> dict:
+    """sum history entries per account and month
+
+    Args:
+        entries (list[dict]): history entries - "bid", "currency-code", "date"
+        deltas (list[float], optional): signed amount of every entry. Defaults to None (parsed from "amount" of entries).
+
+    Returns:
+        dict: (bid, month) -> {"inflow": {currency: amount}, "outflow": {currency: amount}}
+    """
+    deltas = [entry_delta(entry) for entry in entries] if deltas is None else deltas
+    changes = dict()
+    for entry, amount in zip(entries, deltas):
+        change = changes.setdefault((entry["bid"], month_of(entry["date"])), {"inflow": {}, "outflow": {}})
+        side = change["inflow"] if amount >= 0 else change["outflow"]
+        side[entry["currency-code"]] = side.get(entry["currency-code"], 0.0) + abs(amount)
+    return changes
+
+def record_entries(entries : list, repository = None, db_session = None, deltas : list = None) -> None:
+    """add new history entries to monthly summaries (one $inc per account and month)
+
+    Args:
+        entries (list[dict]): new history entries
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        db_session (ClientSession, optional): mongo session of running transaction. Defaults to None.
+        deltas (list[float], optional): signed amount of every entry (the balance change). Defaults to None (parsed from entries).
+    """
+    if not entries:
+        return
+    repository = get_repository() if repository is None else repository
+    repository.update_summaries(summary_changes(entries, deltas), db_session)
+
+def load_summaries(bid : str, months : int = 6, repository = None) -> list:
+    """formatted summaries of the last months (reads summary documents only)
+
+    Args:
+        bid (str): bank account id
+        months (int, optional): number of months. Defaults to 6.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        list[dict]: "month", "inflow" and "outflow" ("currency-code": formated amount), newest month first
+    """
+    repository = get_repository() if repository is None else repository
+    return [
+        {
+            "month": doc["month"],
+            "inflow": CurrencyBalance(doc.get("inflow", {})).to_output(),
+            "outflow": CurrencyBalance(doc.get("outflow", {})).to_output()
+        }
+        for doc in repository.find_summaries(bid, months)
+    ]
+
+def rebuild_summaries(bid : str = None, repository = None) -> int:
+    """compute summaries from whole history again (replaces existing summaries)
+
+    Args:
+        bid (str, optional): bank account id. Defaults to None (all accounts).
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        int: number of summary documents
+    """
+    repository = get_repository() if repository is None else repository
+    return repository.rebuild_summaries(bid)
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from datetime import timedelta
+from threading import Lock
+import time
+from pymongo.errors import DuplicateKeyError
+from .metrics import registry, Counter
+from .sessions import _utcnow
+
+throttle_decisions = registry.register(Counter("throttle_decisions_total", "Requests checked by token buckets.", ("scope", "result")))
+
+class MemoryBucketStore():
+    def __init__(self, maxsize : int = 100000, clock = time.monotonic):
+        """in-memory LRU store of token buckets (single node only)
+
+        Args:
+            maxsize (int, optional): maximal number of buckets, the least recently used bucket is dropped (= full). Defaults to 100000.
+            clock (callable, optional): time in seconds. Defaults to time.monotonic.
+        """
+        self.maxsize = maxsize
+        self.clock = clock
+        # key -> (tokens, updated)
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def take(self, key : str, capacity : float, rate : float, cost : float = 1) -> bool:
+        """take tokens from the bucket (bucket of new key is full)
+
+        Args:
+            key (str): bucket key
+            capacity (float): maximal number of tokens (burst)
+            rate (float): tokens added per second
+            cost (float, optional): tokens taken. Defaults to 1.
+
+        Returns:
+            bool: True if there were enough tokens else False (nothing is taken)
+        """
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return allowed
+
+class MongoBucketStore():
+    def __init__(self, collection, clock = time.time, retries : int = 5):
+        """token buckets in mongo collection shared by all workers - full buckets are removed by TTL index (see indexes.py)
+
+        Args:
+            collection (Collection): collection for buckets
+            clock (callable, optional): wall clock time in seconds (the same on all nodes). Defaults to time.time.
+            retries (int, optional): attempts if other worker changed the bucket at the same time. Defaults to 5.
+        """
+        self.collection = collection
+        self.clock = clock
+        self.retries = retries
+
+    def take(self, key : str, capacity : float, rate : float, cost : float = 1) -> bool:
+        """take tokens from the bucket (compare-and-set on bucket version)
+
+        Args:
+            key (str): bucket key
+            capacity (float): maximal number of tokens (burst)
+            rate (float): tokens added per second
+            cost (float, optional): tokens taken. Defaults to 1.
+
+        Returns:
+            bool: True if there were enough tokens else False (also if the bucket is still contended after all retries)
+        """
+        for _ in range(self.retries):
+            now = self.clock()
+            doc = self.collection.find_one({"_id": key})
+            if doc is None:
+                tokens, updated, version = capacity, now, None
+            else:
+                tokens, updated, version = doc["tokens"], doc["updated"], doc["version"]
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            if tokens < cost:
+                return False
+            tokens -= cost
+            fields = {
+                "tokens": tokens,
+                "updated": max(now, updated),
+                # bucket is full again -> the document can be removed
+                "expires": _utcnow() + timedelta(seconds=(capacity - tokens) / rate)
+            }
+            if version is None:
+                try:
+                    self.collection.insert_one(dict(fields, _id=key, version=0))
+                    return True
+                except DuplicateKeyError:
+                    continue
+            result = self.collection.update_one({"_id": key, "version": version}, {"$set": fields, "$inc": {"version": 1}})
+            if result.modified_count:
+                return True
+        return False
+
+class Throttle():
+    def __init__(self, store = None, rules : dict = None, enabled : bool = True):
+        """token bucket limits of login routes
+
+        Args:
+            store (MemoryBucketStore | MongoBucketStore, optional): bucket store. Defaults to None (MemoryBucketStore).
+            rules (dict, optional): scope -> (capacity, tokens per second). Defaults to None (no limits).
+            enabled (bool, optional): False -> every request is allowed. Defaults to True.
+        """
+        self.configure(store, rules, enabled)
+
+    def configure(self, store = None, rules : dict = None, enabled : bool = True) -> None:
+        """set store and limits (buckets of previous store are forgotten)
+        """
+        self.store = MemoryBucketStore() if store is None else store
+        self.rules = dict() if rules is None else dict(rules)
+        self.enabled = enabled
+
+    def allow(self, scope : str, key : str) -> bool:
+        """take one token from bucket of the key
+
+        Args:
+            scope (str): limit name, e.g. "ip" or "email"
+            key (str): client ip, e-mail, ...
+
+        Returns:
+            bool: True if the request can continue else False
+        """
+        rule = self.rules.get(scope, None)
+        if not self.enabled or rule is None:
+            return True
+        allowed = self.store.take(f"{scope}:{key}", *rule)
+        throttle_decisions.inc(scope, "allowed" if allowed else "rejected")
+        return allowed
+
+    def allow_login(self, ip : str, email : str) -> bool:
+        """check both buckets of login request (ip first - rejected ip does not use tokens of the e-mail)
+
+        Args:
+            ip (str): client ip
+            email (str): e-mail from the form
+
+        Returns:
+            bool: True if the request can continue else False
+        """
+        return self.allow("ip", ip or "") and self.allow("email", (email or "").strip().lower())
+
+# shared limiter of login routes (configured by create_app)
+throttle = Throttle()
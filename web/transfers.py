@@ -0,0 +1,224 @@
+import math
+from .history import add_entry, make_entry
+from .summaries import record_entries
+from .conversion import ConversionEngine, get_engine
+from .repository import get_repository
+from . import main_currency
+
+class BatchConflict(Exception):
+    """balance changed between planning and applying a batch"""
+
+def deposit(bid : str, currency : str, amount : float, repository = None, db_session = None) -> bool:
+    """add money to account and log it
+
+    Args:
+        bid (str): bank account id
+        currency (str): currency
+        amount (float): amount
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        db_session (ClientSession, optional): mongo session of running transaction. Defaults to None.
+
+    Returns:
+        bool: True if the account exists else False
+    """
+    repository = get_repository() if repository is None else repository
+    version = repository.change_balance(bid, currency, amount, db_session=db_session)
+    if version is None:
+        return False
+    entry = add_entry(bid, bid, currency, f"+{amount:.2f}", repository=repository, db_session=db_session, version=version)
+    record_entries([entry], repository, db_session, [amount])
+    return True
+
+def debit(bid : str, target_bid : str, currency : str, amount : float, repository = None, db_session = None) -> bool:
+    """take money from account if it has enough resources (one conditional update) and log it
+
+    Args:
+        bid (str): bank account id (sending)
+        target_bid (str): bank account id (target)
+        currency (str): currency
+        amount (float): amount
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+        db_session (ClientSession, optional): mongo session of running transaction. Defaults to None.
+
+    Returns:
+        bool: True if the money was taken else False
+    """
+    repository = get_repository() if repository is None else repository
+    version = repository.change_balance(bid, currency, -amount, minimum=amount, db_session=db_session)
+    if version is None:
+        return False
+    entry = add_entry(bid, target_bid, currency, f"-{amount:.2f}", repository=repository, db_session=db_session, version=version)
+    record_entries([entry], repository, db_session, [-amount])
+    return True
+
+def transfer(bid : str, target_bid : str, currency : str, amount : float, use_main_currency : bool = False, use_transaction : bool = True, repository = None) -> bool:
+    """accomplish transaction - balance check, update and log are atomic
+
+    Args:
+        bid (str): bank account id (sending)
+        target_bid (str): bank account id (target)
+        currency (str): currency
+        amount (float): amount
+        use_main_currency (bool, optional): True -> if not enough resources in inserted currency -> use main currency (exchanged). Defaults to False.
+        use_transaction (bool, optional): write balance and log in one mongo transaction. Defaults to True.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        bool: if transaction is accomplished -> True else False
+    """
+    repository = get_repository() if repository is None else repository
+
+    def callback(db_session) -> bool:
+        # insert money
+        if bid == target_bid:
+            return deposit(bid, currency, amount, repository, db_session)
+        # send money
+        if debit(bid, target_bid, currency, amount, repository, db_session):
+            return True
+        # use main currency
+        if use_main_currency and currency != main_currency:
+            exchanged_amount = get_engine().convert(amount, currency, main_currency)
+            return debit(bid, target_bid, main_currency, exchanged_amount, repository, db_session)
+        return False
+
+    return repository.run_atomic(callback, use_transaction)
+
+# VALIDATION
+
+def existing_bids(bids : list, repository = None) -> set:
+    """find which bank account ids exist (one query)
+
+    Args:
+        bids (list[str]): bank account ids
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        set[str]: existing bank account ids
+    """
+    bids = list({bid for bid in bids if bid is not None})
+    if not bids:
+        return set()
+    repository = get_repository() if repository is None else repository
+    return repository.existing_bids(bids)
+
+def parse_amount(value) -> float:
+    """amount of transaction from form or json
+
+    Args:
+        value (str | float): inserted amount
+
+    Returns:
+        float: amount or None if it is not a finite number greater than 0
+    """
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(amount) or amount <= 0:
+        return None
+    return amount
+
+def validate_transfer(target_bid : str, currency : str, known_bids : set, rates : dict) -> str:
+    """check target account and currency of transaction
+
+    Args:
+        target_bid (str): bank account id (target)
+        currency (str): currency
+        known_bids (set[str]): existing bank account ids
+        rates (dict): exchange rates
+
+    Returns:
+        str: error message or None if the transaction is valid
+    """
+    if target_bid is None:
+        return "Error in 'to bid' input."
+    if target_bid not in known_bids and target_bid != "9999":
+        return f"Target account ({target_bid}) does not exist."
+    if currency is None:
+        return "Error in 'currency' input."
+    currency = currency.upper()
+    if rates.get(currency, None) is None and currency != main_currency:
+        return f"Inserted currency ({currency}) does not exist in database."
+    return None
+
+# BATCH
+
+def plan_batch(bid : str, currency_balance : dict, transfers : list, engine : ConversionEngine) -> tuple:
+    """decide which transactions of batch can be made (the same rules as transfer)
+
+    Args:
+        bid (str): bank account id (sending)
+        currency_balance (dict): current balances of the account
+        transfers (list[dict]): validated transactions - "target-bid", "currency", "amount", "primary-transfer"
+        engine (ConversionEngine): conversion engine of current exchange rates
+
+    Returns:
+        tuple: (results, balance changes - (currency, delta, minimum), history entries)
+    """
+    balance = dict(currency_balance)
+    results, changes, entries = list(), list(), list()
+
+    def apply(currency : str, amount : float, target_bid : str, sign : str):
+        delta = amount if sign == "+" else -amount
+        balance[currency] = balance.get(currency, 0) + delta
+        # debit is guarded by the balance at write time
+        changes.append((currency, delta, amount if sign == "-" else None))
+        entries.append(make_entry(bid, target_bid, currency, f"{sign}{amount:.2f}"))
+        return {"ok": True, "currency-code": currency, "amount": f"{sign}{amount:.2f}", "message": "The transaction was successful."}
+
+    for item in transfers:
+        target_bid, currency, amount = item["target-bid"], item["currency"], item["amount"]
+        # insert money
+        if target_bid == bid:
+            results.append(apply(currency, amount, bid, "+"))
+        # send money
+        elif balance.get(currency, None) and balance[currency] >= amount:
+            results.append(apply(currency, amount, target_bid, "-"))
+        # use main currency
+        elif item.get("primary-transfer", False) and currency != main_currency and balance.get(main_currency, 0) >= engine.convert(amount, currency):
+            results.append(apply(main_currency, engine.convert(amount, currency), target_bid, "-"))
+        else:
+            results.append({"ok": False, "message": "You do not have enough resources."})
+    return results, changes, entries
+
+def bulk_transfer(bid : str, transfers : list, use_transaction : bool = True, repository = None) -> list:
+    """accomplish batch of validated transactions with two bulk writes in one transaction
+
+    Args:
+        bid (str): bank account id (sending)
+        transfers (list[dict]): validated transactions - "target-bid", "currency", "amount", "primary-transfer"
+        use_transaction (bool, optional): False -> transactions are made one by one. Defaults to True.
+        repository (MongoRepository | MemoryRepository, optional): storage. Defaults to None (get_repository()).
+
+    Returns:
+        list[dict]: result of every transaction - "ok", "message" (and "currency-code", "amount" of the written entry in batch mode)
+    """
+    repository = get_repository() if repository is None else repository
+    # partial bulk write can't be rolled back without transaction
+    if not use_transaction:
+        return [
+            {"ok": True, "message": "The transaction was successful."}
+            if transfer(bid, item["target-bid"], item["currency"], item["amount"], item.get("primary-transfer", False), False, repository)
+            else {"ok": False, "message": "You do not have enough resources."}
+            for item in transfers
+        ]
+
+    def callback(db_session) -> list:
+        doc = repository.find_balance(bid, db_session)
+        if doc is None:
+            return [{"ok": False, "message": "You do not have enough resources."} for _ in transfers]
+        results, changes, entries = plan_batch(bid, doc["currency-balance"], transfers, get_engine())
+        if changes:
+            if repository.change_balances(bid, changes, db_session) != len(changes):
+                raise BatchConflict()
+            # every change incremented the version read in this transaction by one
+            for i, entry in enumerate(entries, 1):
+                entry["version"] = doc.get("version", 0) + i
+            repository.add_entries(entries, db_session)
+            record_entries(entries, repository, db_session, [delta for _, delta, _ in changes])
+        return results
+
+    try:
+        return repository.run_atomic(callback, True)
+    except BatchConflict:
+        return [{"ok": False, "message": "The balance was changed during the batch, try it again."} for _ in transfers]